@@ -39,24 +39,32 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'TurniejKarate.middleware.InstrumentationMiddleware',
     'django.middleware.security.SecurityMiddleware',
-    'django.contrib.sessions.middleware.SessionMiddleware',
+    # Sesja, CSRF, logowanie i komunikaty są pomijane na stronach publicznych (PUBLIC_URL_PREFIX)
+    'TurniejKarate.middleware.PublicSkippingSessionMiddleware',
     'django.middleware.common.CommonMiddleware',
-    'django.middleware.csrf.CsrfViewMiddleware',
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
-    'django.contrib.messages.middleware.MessageMiddleware',
+    'TurniejKarate.middleware.PublicSkippingCsrfViewMiddleware',
+    'TurniejKarate.middleware.PublicSkippingAuthenticationMiddleware',
+    'TurniejKarate.middleware.PublicSkippingMessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
 
 ROOT_URLCONF = 'ProjektKoncowy.urls'
 
+TEMPLATE_LOADERS = [
+    'django.template.loaders.filesystem.Loader',
+    'django.template.loaders.app_directories.Loader',
+]
+
+# Poza trybem DEBUG skompilowane szablony są trzymane w pamięci procesu
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'TurniejKarate.template_backends.InstrumentedDjangoTemplates',
         'DIRS': [BASE_DIR / 'templates']
         ,
-        'APP_DIRS': True,
         'OPTIONS': {
+            'loaders': TEMPLATE_LOADERS if DEBUG else [('django.template.loaders.cached.Loader', TEMPLATE_LOADERS)],
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
@@ -126,4 +134,42 @@ LOGIN_REDIRECT_URL = '/athletes/'  # Po zalogowaniu użytkownik trafi na stronę
 
 LOGIN_URL = '/login/' # Ustalamy ścieżkę do logowania
 
-LOGOUT_REDIRECT_URL = '/'
\ No newline at end of file
+LOGOUT_REDIRECT_URL = '/'
+
+# Metryki żądań i zapytań SQL (endpoint /metrics)
+
+METRICS_ENABLED = True
+
+METRICS_ALLOWED_IPS = ['127.0.0.1', '::1']
+
+SLOW_REQUEST_THRESHOLD = 0.5  # Sekundy
+
+SLOW_REQUEST_LOG = None  # np. BASE_DIR / 'slow_requests.log' - zapis wolnych żądań wraz z zapytaniami SQL
+
+# Pamięć podręczna tabel słownikowych (kategorie wagowe, kluby). Unieważnianie między procesami
+# wymaga wspólnego cache w CACHES (np. Redis lub Memcached); domyślny LocMemCache działa w jednym procesie.
+
+REFERENCE_CACHE_CHECK_INTERVAL = 1.0  # Sekundy między sprawdzeniami wspólnej wersji
+
+# Fragmenty listy wyników w cache (klucze zawierają wersję turnieju i znacznik dywizji, więc
+# nieaktualne wpisy po prostu wygasają). None = bez limitu czasu.
+
+RESULTS_FRAGMENT_TIMEOUT = 24 * 60 * 60
+
+# Minimalna przerwa zawodnika między zaplanowanymi walkami (wykrywanie konfliktów harmonogramu)
+
+SCHEDULE_MIN_REST_MINUTES = 10
+
+# Katalog archiwów ZIP z listami startowymi, identyfikatorami i dyplomami (manage.py generate_documents, run_jobs)
+
+DOCUMENTS_ROOT = BASE_DIR / 'documents'
+
+# Strony publiczne dla kibiców: bez sesji i logowania, z nagłówkami dla cache pośredniczących.
+# Zmiany wyników wysyłają sygnał public_cache_purged z kluczami Surrogate-Key - odbiornik
+# wdrożenia przekazuje je do CDN lub Varnisha.
+
+PUBLIC_URL_PREFIX = '/public/'
+
+PUBLIC_CACHE_MAX_AGE = 5  # Sekundy w przeglądarce (jej nie da się wyczyścić)
+
+PUBLIC_CACHE_S_MAXAGE = 24 * 60 * 60  # Sekundy w cache pośredniczącym (czyszczonym po kluczach)
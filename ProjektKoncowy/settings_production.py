@@ -0,0 +1,85 @@
+"""
+Ustawienia produkcyjne: DJANGO_SETTINGS_MODULE=ProjektKoncowy.settings_production
+
+Rozszerzają ProjektKoncowy/settings.py o trwałe (lub pulowane) połączenia z
+bazą ze sprawdzaniem ich stanu, sesje bez zapytania do bazy przy każdym
+żądaniu, wspólny cache i pamięć podręczną skompilowanych szablonów.
+Wartości zależne od wdrożenia pochodzą ze zmiennych środowiskowych.
+"""
+
+import os
+
+from .settings import *  # noqa: F401,F403
+from .settings import DATABASES, TEMPLATE_LOADERS, TEMPLATES
+
+DEBUG = False
+
+SECRET_KEY = os.environ['DJANGO_SECRET_KEY']
+
+ALLOWED_HOSTS = [host for host in os.environ.get('DJANGO_ALLOWED_HOSTS', '').split(',') if host]
+
+# Baza danych
+
+DATABASES = {
+    'default': {
+        **DATABASES['default'],
+        'ENGINE': os.environ.get('DJANGO_DB_ENGINE', DATABASES['default']['ENGINE']),
+        'NAME': os.environ.get('DJANGO_DB_NAME', DATABASES['default']['NAME']),
+        'USER': os.environ.get('DJANGO_DB_USER', DATABASES['default']['USER']),
+        'PASSWORD': os.environ.get('DJANGO_DB_PASSWORD', DATABASES['default']['PASSWORD']),
+        'HOST': os.environ.get('DJANGO_DB_HOST', DATABASES['default']['HOST']),
+        'PORT': os.environ.get('DJANGO_DB_PORT', DATABASES['default']['PORT']),
+        # Połączenie żyje między żądaniami zamiast być otwierane od nowa przy każdym z nich
+        'CONN_MAX_AGE': int(os.environ.get('DJANGO_CONN_MAX_AGE', 300)),
+        # Przed ponownym użyciem połączenie jest sprawdzane, więc restart bazy nie kończy się błędem 500
+        'CONN_HEALTH_CHECKS': True,
+    }
+}
+
+if os.environ.get('DJANGO_DB_POOL'):
+    # Pula połączeń psycopg 3 (pakiet psycopg[pool]); wyklucza się z CONN_MAX_AGE
+    DATABASES['default']['CONN_MAX_AGE'] = 0
+    DATABASES['default']['OPTIONS'] = {
+        'pool': {
+            'min_size': int(os.environ.get('DJANGO_DB_POOL_MIN', 2)),
+            'max_size': int(os.environ.get('DJANGO_DB_POOL_MAX', 10)),
+            'timeout': 10,
+        },
+    }
+
+# Cache i sesje
+
+REDIS_URL = os.environ.get('DJANGO_REDIS_URL')
+
+if REDIS_URL:
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+            'LOCATION': REDIS_URL,
+        }
+    }
+    # Sesja czytana z cache; baza jest dotykana tylko przy zapisie sesji lub po jej wygaśnięciu z cache
+    SESSION_ENGINE = 'django.contrib.sessions.backends.cached_db'
+else:
+    # Bez wspólnego cache każdy proces ma własny LocMemCache - sesje trzymamy więc w podpisanym ciasteczku
+    CACHES = {
+        'default': {
+            'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        }
+    }
+    SESSION_ENGINE = 'django.contrib.sessions.backends.signed_cookies'
+
+SESSION_COOKIE_SECURE = os.environ.get('DJANGO_SECURE_COOKIES', '1') == '1'
+CSRF_COOKIE_SECURE = SESSION_COOKIE_SECURE
+
+# Szablony: settings.py wybiera loadery przy DEBUG = True, więc pamięć podręczną włączamy tutaj
+
+TEMPLATES = [
+    {
+        **TEMPLATES[0],
+        'OPTIONS': {
+            **TEMPLATES[0]['OPTIONS'],
+            'loaders': [('django.template.loaders.cached.Loader', TEMPLATE_LOADERS)],
+        },
+    },
+]
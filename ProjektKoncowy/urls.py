@@ -28,12 +28,44 @@ from TurniejKarate.views import (
     RoundCreateView,
     RoundListView,
     add_round,
-    add_athletes_to_tournament
+    add_athletes_to_tournament,
+    clone_tournament_view,
+    weigh_in,
+    pairing_suggestions,
+    add_pool,
+    add_bracket,
+    bracket_detail,
+    division_bracket_view,
+    pool_detail,
+    kata_scores,
+    round_head_to_head,
+    undo_round,
+    round_start,
+    round_end,
+    round_schedule,
+    schedule_conflicts,
+    tournament_dashboard,
+    tournament_dashboard_data,
+    metrics,
+    club_medals,
+    athlete_leaderboard,
+    rating_leaderboard_view,
+    job_status,
+    tournament_documents,
+    tournament_documents_archive,
+    public_tournament_list,
+    public_tournament_detail,
 )
 
 urlpatterns = [
     path('admin/', admin.site.urls),
     path('', HomeView.as_view(), name='home'),  # Strona główna
+    path('metrics', metrics, name='metrics'),  # Metryki dla Prometheusa
+    path('jobs/<int:job_id>/', job_status, name='job_status'),  # Postęp zadania w tle
+
+    # Strony publiczne dla kibiców (PUBLIC_URL_PREFIX): bez sesji, z nagłówkami cache
+    path('public/tournaments/', public_tournament_list, name='public_tournament_list'),
+    path('public/tournaments/<int:tournament_id>/', public_tournament_detail, name='public_tournament_detail'),
 
     # Ścieżki dla logowania i wylogowywania
     path('login/', auth_views.LoginView.as_view(template_name='registration/login.html'), name='login'),
@@ -54,7 +86,42 @@ urlpatterns = [
     path('rounds/add/', RoundCreateView.as_view(), name='round_create'),  # Dodanie rundy
     path('add-round/', add_round, name='add_round'),  # Formularz dodawania rundy
     path('rounds/', RoundListView.as_view(), name='round_list'),  # Lista rund
+    path('rounds/kata-scores/', kata_scores, name='kata_scores'),  # Oceny sędziów kata dla całego wylotu
+    path('rounds/<int:round_id>/head-to-head/', round_head_to_head, name='round_head_to_head'),  # Poprzednie spotkania
+    path('rounds/<int:round_id>/undo/', undo_round, name='undo_round'),  # Cofnięcie wyniku
+    path('rounds/<int:round_id>/start/', round_start, name='round_start'),  # Początek walki na macie
+    path('rounds/<int:round_id>/end/', round_end, name='round_end'),  # Koniec walki
+    path('rounds/<int:round_id>/schedule/', round_schedule, name='round_schedule'),  # Planowany czas walki
     path('tournament/<int:tournament_id>/add-athletes/', add_athletes_to_tournament,
          # Przypisanie zawodników do turnieju
          name='add_athletes_to_tournament'),
+    path('tournament/<int:tournament_id>/weigh-in/', weigh_in, name='weigh_in'),  # Stanowisko ważenia
+    path('tournament/<int:tournament_id>/pairings/', pairing_suggestions, name='pairing_suggestions'),  # Propozycje par
+    path('tournament/<int:tournament_id>/dashboard/', tournament_dashboard, name='tournament_dashboard'),  # Panel mat
+    path('tournament/<int:tournament_id>/conflicts/', schedule_conflicts, name='schedule_conflicts'),  # Kolizje harmonogramu
+    path('tournament/<int:tournament_id>/documents/', tournament_documents,
+         name='tournament_documents'),  # Listy startowe, identyfikatory i dyplomy
+    path('tournament/<int:tournament_id>/documents/<str:kind>.zip', tournament_documents_archive,
+         name='tournament_documents_archive'),
+    path('tournament/<int:tournament_id>/dashboard/data/', tournament_dashboard_data,
+         name='tournament_dashboard_data'),
+    path('tournament/<int:tournament_id>/clone/', clone_tournament_view,
+         # Nowa edycja turnieju z tymi samymi zgłoszeniami
+         name='clone_tournament'),
+
+    # Ścieżki dla grup (system każdy z każdym)
+    path('tournament/<int:tournament_id>/pools/add/', add_pool, name='add_pool'),  # Utworzenie grupy z terminarzem
+    path('pools/<int:pool_id>/', pool_detail, name='pool_detail'),  # Terminarz, wyniki i tabela grupy
+
+    # Rankingi publiczne z zagregowanych tabel
+    path('leaderboards/clubs/', club_medals, name='club_medals'),  # Tabela medalowa klubów
+    path('leaderboards/athletes/<int:season>/', athlete_leaderboard, name='athlete_leaderboard'),  # Bilans sezonu
+    path('leaderboards/ratings/', rating_leaderboard_view, name='rating_leaderboard'),  # Ranking Elo do rozstawień
+
+    # Ścieżki dla drabinek (eliminacje, repasaż, podwójna eliminacja)
+    path('tournament/<int:tournament_id>/brackets/add/', add_bracket, name='add_bracket'),  # Utworzenie drabinki dywizji
+    path('brackets/<int:bracket_id>/', bracket_detail, name='bracket_detail'),  # Walki i wyniki drabinki
+    path('tournament/<int:tournament_id>/divisions/<str:division_key>/bracket.<str:fmt>', division_bracket_view,
+         # Drabinka dywizji do wydruku i na ekrany (svg, pdf)
+         name='division_bracket'),
 ]
@@ -1,16 +1,121 @@
 from django.contrib import admin
-from .models import Club, Athlete, Tournament, Round, WeightCategory
+from django.template.response import TemplateResponse
+from django.urls import reverse
+from .audit import audit_tournament, count_violations
+from .dedupe import merge_athletes
+from .deletion import BACKGROUND_THRESHOLD, count_rows, delete_athlete, delete_in_batches, schedule_deletion
+from .models import Club, Athlete, Tournament, Round, WeightCategory, JudgeScore, DuplicateCandidate, AgeBand, BeltGroup, Bracket, BackgroundJob
+
+
+@admin.action(description="Usuń wybrane paczkami (duże usunięcia w tle)")
+def delete_batched(modeladmin, request, queryset):
+    # Zamiast kaskady w jednej transakcji: krótkie transakcje po BATCH_SIZE wierszy
+    if count_rows(queryset) > BACKGROUND_THRESHOLD:
+        job = schedule_deletion(queryset)
+        url = reverse('job_status', args=[job.id])
+        modeladmin.message_user(request, f"Usuwanie zlecone w tle (zadanie {job.id}, postęp: {url}).")
+    else:
+        deleted = delete_in_batches(queryset)
+        modeladmin.message_user(request, f"Usunięto wierszy: {deleted}.")
+
+
+class BatchDeleteAdmin(admin.ModelAdmin):
+    actions = [delete_batched]
+
+    def get_actions(self, request):
+        # Domyślne delete_selected ładuje całą kaskadę do pamięci
+        actions = super().get_actions(request)
+        actions.pop('delete_selected', None)
+        return actions
+
+    def delete_model(self, request, obj):
+        delete_in_batches(type(obj)._base_manager.filter(pk=obj.pk))
 
 class AthleteAdmin(admin.ModelAdmin):
-    list_display = ('first_name', 'last_name', 'age', 'weight', 'gender', 'belt_level', 'karate_style', 'club')
+    list_display = ('first_name', 'last_name', 'age', 'weight', 'gender', 'belt_level', 'karate_style', 'club', 'deleted_at')
+    list_filter = (('deleted_at', admin.EmptyFieldListFilter),)
     search_fields = ['first_name', 'last_name', 'club__name']
 
-class TournamentAdmin(admin.ModelAdmin):
+    def delete_model(self, request, obj):
+        delete_athlete(obj)
+
+    def delete_queryset(self, request, queryset):
+        for athlete in queryset:
+            delete_athlete(athlete)
+
+class ClubAdmin(BatchDeleteAdmin):
+    search_fields = ['name']
+
+class TournamentAdmin(BatchDeleteAdmin):
     list_display = ('name', 'type', 'date')
     search_fields = ['name']
+    actions = [delete_batched, 'audit']
+
+    @admin.action(description="Audytuj wybrane turnieje")
+    def audit(self, request, queryset):
+        reports = []
+        for tournament in queryset:
+            report = audit_tournament(tournament)
+            for section in report:
+                for violation in section['violations']:
+                    obj = violation['object']
+                    violation['url'] = reverse(
+                        f'admin:{obj._meta.app_label}_{obj._meta.model_name}_change', args=[obj.pk]
+                    ) if obj is not None else None
+            reports.append({
+                'tournament': tournament,
+                'report': report,
+                'violations': count_violations(report),
+            })
+        return TemplateResponse(request, 'admin/TurniejKarate/tournament/audit.html', {
+            **self.admin_site.each_context(request),
+            'title': "Audyt turnieju",
+            'reports': reports,
+        })
+
+class DuplicateCandidateAdmin(admin.ModelAdmin):
+    list_display = ('athlete', 'athlete_details', 'duplicate', 'duplicate_details', 'score', 'status')
+    list_filter = ('status',)
+    list_select_related = ('athlete__club', 'duplicate__club')
+    ordering = ('-score',)
+    actions = ['merge', 'reject']
+
+    @admin.display(description="Athlete details")
+    def athlete_details(self, obj):
+        return f"{obj.athlete.age}, {obj.athlete.gender}, {obj.athlete.club.name}"
+
+    @admin.display(description="Duplicate details")
+    def duplicate_details(self, obj):
+        return f"{obj.duplicate.age}, {obj.duplicate.gender}, {obj.duplicate.club.name}"
+
+    @admin.action(description="Scal wybrane pary")
+    def merge(self, request, queryset):
+        merged = 0
+        for candidate in queryset.filter(status='PENDING').select_related('athlete', 'duplicate'):
+            # Duplikat mógł zostać już usunięty przy scalaniu wcześniejszej pary
+            if Athlete.objects.filter(id__in=[candidate.athlete_id, candidate.duplicate_id]).count() == 2:
+                merge_athletes(candidate.athlete, candidate.duplicate)
+                merged += 1
+        self.message_user(request, f"Scalono par: {merged}.")
+
+    @admin.action(description="Odrzuć wybrane pary")
+    def reject(self, request, queryset):
+        rejected = queryset.update(status='REJECTED')
+        self.message_user(request, f"Odrzucono par: {rejected}.")
+
+class BackgroundJobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'kind', 'status', 'progress', 'total', 'created_at', 'finished_at')
+    list_filter = ('status', 'kind')
+    readonly_fields = ('kind', 'params', 'status', 'progress', 'total', 'error', 'started_at', 'finished_at')
 
-admin.site.register(Club)
+admin.site.register(Club, ClubAdmin)
 admin.site.register(Athlete, AthleteAdmin)
 admin.site.register(Tournament, TournamentAdmin)
 admin.site.register(Round)
 admin.site.register(WeightCategory)
+admin.site.register(JudgeScore)
+admin.site.register(DuplicateCandidate, DuplicateCandidateAdmin)
+admin.site.register(AgeBand)
+admin.site.register(BeltGroup)
+admin.site.register(Bracket)
+admin.site.register(BackgroundJob, BackgroundJobAdmin)
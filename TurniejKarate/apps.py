@@ -4,3 +4,9 @@ from django.apps import AppConfig
 class TurniejkarateConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'TurniejKarate'
+
+    def ready(self):
+        # Rejestracja odbiorców sygnałów (indeksy i agregaty aktualizowane przy wynikach)
+        from . import receivers  # noqa: F401
+        # Rejestracja funkcji zadań w tle (jobs.HANDLERS)
+        from . import deletion, documents  # noqa: F401
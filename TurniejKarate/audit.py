@@ -0,0 +1,157 @@
+from django.db.models import Count, Exists, F, OuterRef, Q, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from .divisions import division_label
+from .models import Athlete, Placement, Registration, Round
+
+
+def _athlete_name(athlete):
+    return f"{athlete.first_name} {athlete.last_name} (#{athlete.id})"
+
+
+def _round_label(round_instance):
+    return (
+        f"Runda {round_instance.round_number} (#{round_instance.id}): "
+        f"{_athlete_name(round_instance.athlete1)} vs {_athlete_name(round_instance.athlete2)}"
+    )
+
+
+def _lost_before(athlete_field):
+    """Czy zawodnik z pola `athlete_field` przegrał wcześniejszą walkę pucharową tego turnieju"""
+    athlete = OuterRef(athlete_field)
+    return Exists(
+        Round.objects.filter(
+            tournament=OuterRef('tournament'),
+            round_number__lt=OuterRef('round_number'),
+            winner__isnull=False,
+            pool__isnull=True,
+            bracket__isnull=True,
+        ).filter(
+            Q(athlete1=athlete) | Q(athlete2=athlete)
+        ).exclude(winner=athlete)
+    )
+
+
+def audit_tournament(tournament):
+    """
+    Sprawdza spójność całego turnieju kilkoma zapytaniami zbiorczymi.
+
+    Zwraca listę sekcji raportu: słowniki z kluczem, tytułem i listą naruszeń
+    (`object` - obiekt do poprawy, `message` - opis dla organizatora).
+    Reguły odpowiadają walidacji `Round.clean` i `Athlete.clean`, której nie
+    przechodzą zapisy z panelu administracyjnego ani zmiany zbiorcze.
+    """
+    rounds = Round.objects.filter(tournament=tournament).select_related('athlete1', 'athlete2', 'winner')
+    participants = Athlete.objects.filter(
+        Q(tournaments=tournament)
+        | Q(rounds_as_athlete1__tournament=tournament)
+        | Q(rounds_as_athlete2__tournament=tournament)
+    ).distinct()
+
+    cross_gender = rounds.exclude(athlete1__gender=F('athlete2__gender'))
+
+    category_mismatch = rounds.filter(
+        Q(athlete1__weight_category__isnull=True, athlete2__weight_category__isnull=False)
+        | Q(athlete1__weight_category__isnull=False, athlete2__weight_category__isnull=True)
+        | (
+            Q(athlete1__weight_category__isnull=False, athlete2__weight_category__isnull=False)
+            & ~Q(athlete1__weight_category=F('athlete2__weight_category'))
+        )
+    )
+
+    invalid_winner = rounds.filter(winner__isnull=False).exclude(
+        Q(winner=F('athlete1')) | Q(winner=F('athlete2'))
+    )
+
+    out_of_range = Athlete.objects.filter(
+        id__in=participants.values('id'),
+    ).filter(
+        Q(weight__lt=F('weight_category__min_weight')) | Q(weight__gt=F('weight_category__max_weight'))
+    ).select_related('weight_category')
+
+    after_elimination = rounds.alias(
+        athlete1_lost=_lost_before('athlete1'),
+        athlete2_lost=_lost_before('athlete2'),
+    ).filter(Q(athlete1_lost=True) | Q(athlete2_lost=True))
+
+    # Miejsca z Placement tego turnieju (Athlete.place to tylko ostatni turniej zawodnika), w obrębie dywizji:
+    # dywizja z ostatniej walki zawodnika, a bez walk - ze zgłoszenia.
+    # Dwa brązowe medale (repasaże) są dozwolone, pozostałe miejsca muszą być unikalne
+    athlete_division = Coalesce(
+        Subquery(Round.objects.filter(
+            Q(athlete1=OuterRef('athlete')) | Q(athlete2=OuterRef('athlete')), tournament=OuterRef('tournament'),
+        ).order_by('-id').values('division_key')[:1]),
+        Subquery(Registration.objects.filter(
+            athlete=OuterRef('athlete'), tournament=OuterRef('tournament'),
+        ).values('division_key')[:1]),
+        Value(''),
+    )
+    duplicate_places = Placement.objects.filter(tournament=tournament).annotate(
+        division_key=athlete_division,
+    ).values('division_key', 'place').annotate(
+        athletes=Count('id'),
+    ).filter(athletes__gt=1).exclude(place=3, athletes=2).order_by('division_key', 'place')
+
+    return [
+        {
+            'key': 'cross_gender',
+            'title': "Walki zawodników różnej płci",
+            'violations': [
+                {'object': r, 'message': _round_label(r)} for r in cross_gender
+            ],
+        },
+        {
+            'key': 'category_mismatch',
+            'title': "Walki zawodników z różnych kategorii wagowych",
+            'violations': [
+                {'object': r, 'message': _round_label(r)} for r in category_mismatch
+            ],
+        },
+        {
+            'key': 'invalid_winner',
+            'title': "Zwycięzca spoza pary zawodników",
+            'violations': [
+                {'object': r, 'message': f"{_round_label(r)}, zwycięzca: {_athlete_name(r.winner)}"}
+                for r in invalid_winner
+            ],
+        },
+        {
+            'key': 'out_of_range',
+            'title': "Waga poza zakresem kategorii",
+            'violations': [
+                {
+                    'object': athlete,
+                    'message': (
+                        f"{_athlete_name(athlete)}: {athlete.weight}kg, kategoria {athlete.weight_category.name} "
+                        f"({athlete.weight_category.min_weight}kg - {athlete.weight_category.max_weight}kg)"
+                    ),
+                }
+                for athlete in out_of_range
+            ],
+        },
+        {
+            'key': 'after_elimination',
+            'title': "Walki po odpadnięciu z turnieju",
+            'violations': [
+                {'object': r, 'message': _round_label(r)} for r in after_elimination
+            ],
+        },
+        {
+            'key': 'duplicate_places',
+            'title': "Powtórzone miejsca w dywizji",
+            'violations': [
+                {
+                    'object': None,
+                    'message': (
+                        f"{division_label(row['division_key'])}: "
+                        f"miejsce {row['place']} ma {row['athletes']} zawodników"
+                    ),
+                }
+                for row in duplicate_places
+            ],
+        },
+    ]
+
+
+def count_violations(report):
+    return sum(len(section['violations']) for section in report)
@@ -0,0 +1,209 @@
+from collections import Counter
+
+from django.db import transaction
+
+from .models import BoutEvent, DivisionSnapshot, Registration, Round
+
+SNAPSHOT_INTERVAL = 500  # Po tylu nowych zdarzeniach dywizji zapisujemy kolejną migawkę
+EVENT_FIELDS = ('id', 'round_id', 'athlete1_id', 'athlete2_id', 'winner_id', 'previous_winner_id', 'eliminating')
+
+
+def _event(round_instance, previous_winner_id, deleted=False):
+    winner_id = round_instance.winner_id
+    if previous_winner_id is None:
+        kind = 'RECORDED'
+    elif winner_id is None:
+        kind = 'WITHDRAWN'
+    else:
+        kind = 'CORRECTED'
+    return BoutEvent(
+        kind=kind,
+        round=None if deleted else round_instance,
+        tournament_id=round_instance.tournament_id,
+        division_key=round_instance.division_key,
+        athlete1_id=round_instance.athlete1_id,
+        athlete2_id=round_instance.athlete2_id,
+        winner_id=winner_id,
+        previous_winner_id=previous_winner_id,
+        eliminating=round_instance.pool_id is None and round_instance.bracket_id is None,
+    )
+
+
+def append_event(round_instance, previous_winner_id, deleted=False):
+    """
+    Dopisuje do dziennika zmianę wyniku rundy (zapis, korekta lub wycofanie).
+    Wycofanie wyniku usuwanej rundy (`deleted`) nie wskazuje już na rundę.
+    """
+    event = _event(round_instance, previous_winner_id, deleted)
+    event.save()
+    return event
+
+
+def append_events(rounds, previous_winners, using='default'):
+    """
+    Zdarzenia dla wyników zapisanych zbiorczo z pominięciem `Round.save`
+    (import migawki); `previous_winners` to {id rundy: poprzedni zwycięzca}.
+    """
+    return BoutEvent.objects.using(using).bulk_create(
+        [_event(round_instance, previous_winners.get(round_instance.id)) for round_instance in rounds],
+        batch_size=1000,
+    )
+
+
+def _loser(athlete1_id, athlete2_id, winner_id):
+    return athlete2_id if winner_id == athlete1_id else athlete1_id
+
+
+class Standings:
+    """Projekcja dziennika dla dywizji: bilans walk, odpadnięci i aktualne wyniki rund"""
+
+    def __init__(self, wins=None, losses=None, eliminated=None, results=None, last_event_id=0):
+        self.wins = Counter(wins or {})
+        self.losses = Counter(losses or {})
+        self.eliminated = set(eliminated or ())
+        self.results = dict(results or {})
+        self.last_event_id = last_event_id
+
+    def apply(self, event_id, round_id, athlete1_id, athlete2_id, winner_id, previous_winner_id, eliminating):
+        # Korekta i wycofanie najpierw odwracają poprzedni wynik, więc wszystkie rodzaje zdarzeń składają się tak samo
+        if previous_winner_id is not None:
+            previous_loser_id = _loser(athlete1_id, athlete2_id, previous_winner_id)
+            self.wins[previous_winner_id] -= 1
+            self.losses[previous_loser_id] -= 1
+            if eliminating:
+                self.eliminated.discard(previous_loser_id)
+        if winner_id is not None:
+            loser_id = _loser(athlete1_id, athlete2_id, winner_id)
+            self.wins[winner_id] += 1
+            self.losses[loser_id] += 1
+            if eliminating:
+                self.eliminated.add(loser_id)
+            self.results[round_id] = winner_id
+        else:
+            self.results.pop(round_id, None)
+        self.last_event_id = event_id
+
+    def to_state(self):
+        # Klucze JSON są tekstem - zamiana na liczby w from_state
+        return {
+            'wins': {str(athlete_id): count for athlete_id, count in self.wins.items() if count},
+            'losses': {str(athlete_id): count for athlete_id, count in self.losses.items() if count},
+            'eliminated': sorted(self.eliminated),
+            'results': {str(round_id): winner_id for round_id, winner_id in self.results.items()},
+        }
+
+    @classmethod
+    def from_state(cls, state, last_event_id):
+        return cls(
+            wins={int(athlete_id): count for athlete_id, count in state.get('wins', {}).items()},
+            losses={int(athlete_id): count for athlete_id, count in state.get('losses', {}).items()},
+            eliminated=state.get('eliminated', ()),
+            results={int(round_id): winner_id for round_id, winner_id in state.get('results', {}).items()},
+            last_event_id=last_event_id,
+        )
+
+
+def division_standings(tournament_id, division_key):
+    """
+    Aktualny stan dywizji: ostatnia migawka plus zdarzenia po niej.
+
+    Dwa zapytania niezależnie od długości dziennika; gdy od migawki
+    przybyło `SNAPSHOT_INTERVAL` zdarzeń, zapisywana jest nowa.
+    """
+    snapshot = DivisionSnapshot.objects.filter(
+        tournament_id=tournament_id, division_key=division_key,
+    ).order_by('-last_event_id').first()
+    standings = Standings.from_state(snapshot.state, snapshot.last_event_id) if snapshot else Standings()
+
+    events = BoutEvent.objects.filter(
+        tournament_id=tournament_id, division_key=division_key, id__gt=standings.last_event_id,
+    ).order_by('id').values_list(*EVENT_FIELDS)
+    applied = 0
+    for event in events.iterator(chunk_size=5000):
+        standings.apply(*event)
+        applied += 1
+
+    if applied >= SNAPSHOT_INTERVAL:
+        DivisionSnapshot.objects.create(
+            tournament_id=tournament_id, division_key=division_key,
+            last_event_id=standings.last_event_id, state=standings.to_state(),
+        )
+    return standings
+
+
+def replay(events=None):
+    """
+    Odtwarza stan wszystkich dywizji z pełnego dziennika, bez migawek.
+
+    Zdarzenia są czytane strumieniowo jako krotki i składane w pamięci,
+    więc 100 tys. zdarzeń to kilka sekund. Zwraca {(turniej, dywizja): Standings}.
+    """
+    if events is None:
+        events = BoutEvent.objects.order_by('id').values_list('tournament_id', 'division_key', *EVENT_FIELDS)
+    divisions = {}
+    for tournament_id, division_key, *event in events.iterator(chunk_size=5000):
+        standings = divisions.get((tournament_id, division_key))
+        if standings is None:
+            standings = divisions[(tournament_id, division_key)] = Standings()
+        standings.apply(*event)
+    return divisions
+
+
+@transaction.atomic
+def snapshot_all():
+    """Zapisuje migawki wszystkich dywizji z pełnego odtworzenia dziennika"""
+    divisions = replay()
+    DivisionSnapshot.objects.bulk_create([
+        DivisionSnapshot(
+            tournament_id=tournament_id, division_key=division_key,
+            last_event_id=standings.last_event_id, state=standings.to_state(),
+        )
+        for (tournament_id, division_key), standings in divisions.items()
+    ], batch_size=1000)
+    return len(divisions)
+
+
+def check_projections():
+    """
+    Porównuje stan odtworzony z dziennika z tabelami: zwycięzcami rund
+    i zgłoszeniami (odpadnięty zawodnik nie może być nadal zgłoszony).
+    Zwraca listę opisów niezgodności. Zdarzenia usuniętych rund (bez
+    `round_id`) są pomijane - nie ma już czego z nimi porównać.
+    """
+    divisions = replay(BoutEvent.objects.filter(round__isnull=False).order_by('id').values_list(
+        'tournament_id', 'division_key', *EVENT_FIELDS,
+    ))
+    problems = []
+
+    logged = {}
+    eliminated = set()
+    for (tournament_id, _), standings in divisions.items():
+        logged.update(standings.results)
+        eliminated.update((tournament_id, athlete_id) for athlete_id in standings.eliminated)
+
+    decided = Round.objects.filter(winner__isnull=False).values_list('id', 'winner_id')
+    for round_id, winner_id in decided.iterator(chunk_size=5000):
+        logged_winner = logged.pop(round_id, None)
+        if logged_winner != winner_id:
+            problems.append(f"Runda #{round_id}: zwycięzca {winner_id}, w dzienniku {logged_winner}.")
+    for round_id, logged_winner in logged.items():
+        problems.append(f"Runda #{round_id}: brak wyniku, w dzienniku zwycięzca {logged_winner}.")
+
+    registered = Registration.objects.filter(
+        tournament_id__in={tournament_id for tournament_id, _ in eliminated},
+    ).values_list('tournament_id', 'athlete_id')
+    for tournament_id, athlete_id in registered.iterator(chunk_size=5000):
+        if (tournament_id, athlete_id) in eliminated:
+            problems.append(f"Turniej #{tournament_id}: zawodnik #{athlete_id} odpadł, a nadal jest zgłoszony.")
+    return problems
+
+
+def undo_result(round_instance):
+    """
+    Cofa wynik rundy. Zmiana przechodzi przez `Round.save`, więc
+    odwracane są tylko projekcje zależne od tej walki: zgłoszenie i miejsce
+    przegranego, indeks spotkań i drabinka; w dzienniku zostaje zdarzenie
+    wycofania.
+    """
+    round_instance.winner = None
+    round_instance.save()
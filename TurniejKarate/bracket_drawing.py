@@ -0,0 +1,189 @@
+"""
+Rysowanie drabinek (SVG i PDF) z gotowego układu.
+
+Moduł nie korzysta z Django ani z bazy danych, więc funkcje `render` można
+bez przygotowań wywoływać w procesach potomnych puli.
+"""
+import unicodedata
+from html import escape
+
+BOX_WIDTH = 220
+BOX_HEIGHT = 44
+COLUMN_GAP = 40
+ROW_PITCH = BOX_HEIGHT + 16
+MARGIN = 20
+HEADER = 30
+
+WINNERS_SECTION = 1  # Numer sekcji zwycięzców w kolejności BracketNode.SECTIONS
+
+CONTENT_TYPES = {
+    'svg': 'image/svg+xml',
+    'pdf': 'application/pdf',
+}
+
+
+def winner_slot(row):
+    """1 lub 2 - która pozycja walki wygrała (None przed rozstrzygnięciem)"""
+    if row['winner_id'] is None:
+        return None
+    if row['winner_id'] == row['athlete1_id']:
+        return 1
+    return 2 if row['winner_id'] == row['athlete2_id'] else None
+
+
+def layout(title, rows):
+    """
+    Współrzędne drabinki policzone w jednym przejściu po rundach.
+
+    Sekcje drabinki są układane jedna pod drugą, a etapy sekcji to kolejne
+    kolumny. W sekcji zwycięzców walka etapu s na pozycji p leży na środku
+    swoich dwóch poprzedniczek, więc jej wysokość wynika wprost z
+    (p + 0.5) * 2^(s-1); w pozostałych walki kolumny stoją jedna pod drugą.
+    Linie do kolejnych walk są łączone po przejściu, słownikiem węzłów.
+    Wynik to zwykły słownik - da się go przekazać do innego procesu.
+    """
+    columns = {}
+    width = 1
+    section_top = HEADER + MARGIN
+    section_bottom = section_top
+    current_section = None
+    rows_in_column = {}
+    boxes = []
+    centers = {}
+    links = []
+
+    for row in rows:
+        section = row['section_rank']
+        if section != current_section:
+            current_section = section
+            section_top = section_bottom + (ROW_PITCH // 2 if boxes else 0)
+            columns = {}
+            rows_in_column = {}
+        column = columns.setdefault(row['stage'], len(columns))
+        width = max(width, len(columns))
+        if row['node_id'] is not None and section == WINNERS_SECTION:
+            slot = (row['position'] + 0.5) * 2 ** (row['stage'] - 1)
+        else:
+            slot = rows_in_column.get(column, 0) + 0.5
+        rows_in_column[column] = rows_in_column.get(column, 0) + 1
+
+        x = MARGIN + column * (BOX_WIDTH + COLUMN_GAP)
+        y = section_top + slot * ROW_PITCH - BOX_HEIGHT / 2
+        section_bottom = max(section_bottom, y + BOX_HEIGHT)
+        boxes.append({
+            'x': x,
+            'y': y,
+            'names': (row['athlete1_name'] or '-', row['athlete2_name'] or '-'),
+            'winner': winner_slot(row),
+        })
+        if row['node_id'] is not None:
+            centers[row['node_id']] = (x, y + BOX_HEIGHT / 2)
+            if row['winner_to_id'] is not None:
+                links.append((x + BOX_WIDTH, y + BOX_HEIGHT / 2, row['winner_to_id']))
+
+    lines = [(x1, y1, *centers[target]) for x1, y1, target in links if target in centers]
+    return {
+        'title': title,
+        'width': MARGIN * 2 + width * (BOX_WIDTH + COLUMN_GAP) - COLUMN_GAP,
+        'height': section_bottom + MARGIN,
+        'boxes': boxes,
+        'lines': lines,
+    }
+
+
+def render_svg(layout):
+    parts = [
+        f'<svg xmlns="http://www.w3.org/2000/svg" width="{layout["width"]:g}" height="{layout["height"]:g}" '
+        f'viewBox="0 0 {layout["width"]:g} {layout["height"]:g}" font-family="sans-serif" font-size="11">',
+        f'<text x="{MARGIN}" y="{MARGIN + 4}" font-size="14" font-weight="bold">{escape(layout["title"])}</text>',
+    ]
+    for x1, y1, x2, y2 in layout['lines']:
+        middle = (x1 + x2) / 2
+        parts.append(
+            f'<polyline points="{x1:g},{y1:g} {middle:g},{y1:g} {middle:g},{y2:g} {x2:g},{y2:g}" '
+            f'fill="none" stroke="#888"/>'
+        )
+    for box in layout['boxes']:
+        x, y = box['x'], box['y']
+        middle = y + BOX_HEIGHT / 2
+        parts.append(f'<rect x="{x:g}" y="{y:g}" width="{BOX_WIDTH}" height="{BOX_HEIGHT}" fill="#fff" stroke="#333"/>')
+        parts.append(f'<line x1="{x:g}" y1="{middle:g}" x2="{x + BOX_WIDTH:g}" y2="{middle:g}" stroke="#ccc"/>')
+        for slot, name in enumerate(box['names'], start=1):
+            weight = ' font-weight="bold"' if box['winner'] == slot else ''
+            baseline = y + (slot - 0.5) * BOX_HEIGHT / 2 + 4
+            parts.append(f'<text x="{x + 6:g}" y="{baseline:g}"{weight}>{escape(name)}</text>')
+    parts.append('</svg>')
+    return '\n'.join(parts).encode('utf-8')
+
+
+def pdf_text(value):
+    # Standardowa czcionka Helvetica zna tylko WinAnsi - polskie znaki zamieniamy na łacińskie odpowiedniki
+    value = unicodedata.normalize('NFKD', value.replace('ł', 'l').replace('Ł', 'L'))
+    value = ''.join(char for char in value if not unicodedata.combining(char))
+    value = value.encode('cp1252', 'replace').decode('cp1252')
+    return value.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)')
+
+
+def render_pdf(layout):
+    """Jednostronicowy PDF 1.4 z liniami i tekstem - bez zewnętrznych bibliotek"""
+    height = layout['height']
+    commands = [f'BT /F2 14 Tf {MARGIN} {height - MARGIN - 4:g} Td ({pdf_text(layout["title"])}) Tj ET', '0.53 G']
+    for x1, y1, x2, y2 in layout['lines']:
+        middle = (x1 + x2) / 2
+        y1, y2 = height - y1, height - y2
+        commands.append(f'{x1:g} {y1:g} m {middle:g} {y1:g} l {middle:g} {y2:g} l {x2:g} {y2:g} l S')
+    commands.append('0.2 G')
+    for box in layout['boxes']:
+        x, y = box['x'], box['y']
+        commands.append(f'{x:g} {height - y - BOX_HEIGHT:g} {BOX_WIDTH} {BOX_HEIGHT} re S')
+        middle = height - y - BOX_HEIGHT / 2
+        commands.append(f'{x:g} {middle:g} m {x + BOX_WIDTH:g} {middle:g} l S')
+        for slot, name in enumerate(box['names'], start=1):
+            font = 'F2' if box['winner'] == slot else 'F1'
+            baseline = height - (y + (slot - 0.5) * BOX_HEIGHT / 2 + 4)
+            commands.append(f'BT /{font} 9 Tf {x + 6:g} {baseline:g} Td ({pdf_text(name)}) Tj ET')
+    return pdf_document([(layout['width'], height, '\n'.join(commands))])
+
+
+def pdf_document(pages):
+    """
+    PDF 1.4 z listy stron (szerokość, wysokość, polecenia rysowania) -
+    czcionki Helvetica i Helvetica-Bold jako /F1 i /F2, bez zewnętrznych bibliotek.
+    """
+    objects = [
+        b'<< /Type /Catalog /Pages 2 0 R >>',
+        None,  # Drzewo stron - uzupełniane, gdy znane są numery obiektów stron
+        b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>',
+        b'<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica-Bold /Encoding /WinAnsiEncoding >>',
+    ]
+    kids = []
+    for width, height, commands in pages:
+        content = commands.encode('cp1252')
+        objects.append(b'<< /Length %d >>\nstream\n' % len(content) + content + b'\nendstream')
+        objects.append((
+            f'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {width:g} {height:g}] '
+            f'/Resources << /Font << /F1 3 0 R /F2 4 0 R >> >> /Contents {len(objects)} 0 R >>'
+        ).encode())
+        kids.append(f'{len(objects)} 0 R')
+    objects[1] = f'<< /Type /Pages /Kids [{" ".join(kids)}] /Count {len(kids)} >>'.encode()
+
+    output = bytearray(b'%PDF-1.4\n')
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(output))
+        output += b'%d 0 obj\n' % number + body + b'\nendobj\n'
+    xref = len(output)
+    output += b'xref\n0 %d\n0000000000 65535 f \n' % (len(objects) + 1)
+    output += b''.join(b'%010d 00000 n \n' % offset for offset in offsets)
+    output += b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (len(objects) + 1, xref)
+    return bytes(output)
+
+
+RENDERERS = {
+    'svg': render_svg,
+    'pdf': render_pdf,
+}
+
+
+def render(layout, fmt):
+    return RENDERERS[fmt](layout)
@@ -0,0 +1,93 @@
+from concurrent.futures import ProcessPoolExecutor
+from itertools import groupby
+
+from django.core.cache import cache
+from django.db.models import Case, F, IntegerField, Value, When
+from django.db.models.functions import Coalesce
+
+from .bracket_drawing import layout, render
+from .divisions import division_label
+from .fragments import division_stamps
+from .models import BracketNode, Round
+
+FORMATS = ('svg', 'pdf')
+
+CACHE_PREFIX = 'TurniejKarate:bracket'
+CACHE_TIMEOUT = 7 * 24 * 60 * 60
+
+
+def bracket_rows(tournament, division_keys):
+    """
+    Rundy dywizji w kolejności rysowania - jedno zapytanie dla wielu dywizji.
+
+    Walki drabinki są porządkowane po sekcji, etapie i pozycji węzła,
+    pozostałe (lista rund, grupy) tworzą kolumny według numeru rundy.
+    """
+    section_rank = Case(
+        *[
+            When(bracket_node__section=section, then=Value(index))
+            for index, (section, _) in enumerate(BracketNode.SECTIONS, start=1)
+        ],
+        default=Value(0),
+        output_field=IntegerField(),
+    )
+    return Round.objects.filter(tournament=tournament, division_key__in=division_keys).annotate(
+        section_rank=section_rank,
+        stage=Coalesce('bracket_node__stage', 'round_number', output_field=IntegerField()),
+        position=Coalesce('bracket_node__position', 'id', output_field=IntegerField()),
+    ).order_by('division_key', 'section_rank', 'stage', 'position').values(
+        'id', 'division_key', 'section_rank', 'stage', 'position',
+        'athlete1_id', 'athlete2_id', 'winner_id',
+        athlete1_name=F('athlete1__display_name'),
+        athlete2_name=F('athlete2__display_name'),
+        node_id=F('bracket_node__id'),
+        winner_to_id=F('bracket_node__winner_to_id'),
+    )
+
+
+def _cache_key(tournament, division_key, stamp, fmt):
+    return f'{CACHE_PREFIX}:{fmt}:{tournament.id}:{division_key}:{stamp}'
+
+
+def division_bracket(tournament, division_key, fmt):
+    """
+    Drabinka dywizji w formacie `fmt` (svg lub pdf) albo None dla pustej dywizji.
+
+    Wynik jest trzymany w cache pod znacznikiem dywizji, więc jest rysowany
+    ponownie dopiero po zmianie którejś z jej rund.
+    """
+    stamp = division_stamps(tournament).get(division_key)
+    if stamp is None:
+        return None
+    key = _cache_key(tournament, division_key, stamp, fmt)
+    output = cache.get(key)
+    if output is None:
+        output = render(layout(division_label(division_key), bracket_rows(tournament, [division_key])), fmt)
+        cache.set(key, output, CACHE_TIMEOUT)
+    return output
+
+
+def render_all(tournament, fmt, workers=None):
+    """
+    Drabinki wszystkich dywizji turnieju: {klucz dywizji: dane pliku}.
+
+    Dywizje z cache są zwracane od razu. Dla pozostałych rundy są pobierane
+    jednym zapytaniem, układ liczony w procesie głównym, a rysowanie - czysto
+    obliczeniowe, bez bazy danych - odbywa się w puli procesów.
+    """
+    stamps = division_stamps(tournament)
+    keys = {division_key: _cache_key(tournament, division_key, stamp, fmt) for division_key, stamp in stamps.items()}
+    found = cache.get_many(list(keys.values()))
+    outputs = {division_key: found[key] for division_key, key in keys.items() if key in found}
+
+    missing = [division_key for division_key in sorted(stamps) if division_key not in outputs]
+    layouts = {
+        division_key: layout(division_label(division_key), list(rows))
+        for division_key, rows in groupby(bracket_rows(tournament, missing), key=lambda row: row['division_key'])
+    }
+    if layouts:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            rendered = dict(zip(layouts, executor.map(render, layouts.values(), [fmt] * len(layouts))))
+        cache.set_many({keys[division_key]: output for division_key, output in rendered.items()}, CACHE_TIMEOUT)
+        outputs.update(rendered)
+    return outputs
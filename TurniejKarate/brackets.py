@@ -0,0 +1,271 @@
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Case, IntegerField, Value, When
+
+from .models import Athlete, Bracket, BracketNode, Round
+from .placements import set_places
+
+
+def seed_order(size):
+    """Kolejność rozstawienia w pierwszej rundzie: 1 i 2 w przeciwnych połówkach, wolne losy dla najwyżej rozstawionych"""
+    order = [1]
+    while len(order) < size:
+        mirror = len(order) * 2 + 1
+        order = [seed for top in order for seed in (top, mirror - top)]
+    return order
+
+
+def _depth(bracket):
+    return bracket.size.bit_length() - 1
+
+
+def _losers_stage_bouts(size, stage):
+    return size >> ((stage + 1) // 2 + 1)
+
+
+def _winners_left_after_losers_stage(size, stage):
+    # Etapy nieparzyste 2j-1 kończą się po rundzie j drabinki zwycięzców, parzyste 2j po rundzie j+1
+    return size >> ((stage + 1) // 2 if stage % 2 else stage // 2 + 1)
+
+
+def _create(nodes):
+    # bulk_create zwraca klucze główne (PostgreSQL, SQLite 3.35+), potrzebne do powiązań winner_to/loser_to
+    return {(node.section, node.stage, node.position): node for node in BracketNode.objects.bulk_create(nodes)}
+
+
+@transaction.atomic
+def build_bracket(tournament, division_key, kind='SINGLE', athletes=None):
+    """
+    Tworzy drabinkę dywizji: pojedyncza eliminacja, z repasażem lub podwójna eliminacja.
+
+    Wszystkie węzły są zapisywane od razu (po jednym `bulk_create` na rundę),
+    a każdy zna swój węzeł docelowy dla zwycięzcy i przegranego. Dzięki temu
+    wynik walki przesuwa zawodników tylko do sąsiednich węzłów, bez
+    przeliczania całej drabinki. Rundy (`Round`) powstają, gdy obaj
+    zawodnicy węzła są znani.
+    """
+    if athletes is None:
+        athletes = Athlete.objects.filter(
+            registration__tournament=tournament, registration__division_key=division_key,
+        ).order_by('id')
+    athletes = list(athletes)
+    if len(athletes) < 2:
+        raise ValidationError("Drabinka wymaga co najmniej dwóch zawodników.")
+
+    size = 1 << (len(athletes) - 1).bit_length()
+    depth = size.bit_length() - 1
+    double = kind == 'DOUBLE' and depth >= 2
+    bracket = Bracket.objects.create(tournament=tournament, division_key=division_key, kind=kind, size=size)
+    created = {}
+
+    if double:
+        created.update(_create([BracketNode(
+            bracket=bracket, section='FINAL', stage=1, position=0, pending=2, winner_place=1, loser_place=2,
+        )]))
+        last_stage = 2 * depth - 2
+        for stage in range(last_stage, 0, -1):
+            bouts = _losers_stage_bouts(size, stage)
+            nodes = []
+            for position in range(bouts):
+                node = BracketNode(
+                    bracket=bracket, section='LOSERS', stage=stage, position=position, pending=2,
+                    loser_place=_winners_left_after_losers_stage(size, stage) + bouts + 1,
+                )
+                if stage == last_stage:
+                    node.winner_to, node.winner_slot = created[('FINAL', 1, 0)], 2
+                elif stage % 2:
+                    node.winner_to, node.winner_slot = created[('LOSERS', stage + 1, position)], 1
+                else:
+                    node.winner_to = created[('LOSERS', stage + 1, position // 2)]
+                    node.winner_slot = position % 2 + 1
+                nodes.append(node)
+            created.update(_create(nodes))
+
+    seeds = seed_order(size)
+    for stage in range(depth, 0, -1):
+        bouts = size >> stage
+        nodes = []
+        for position in range(bouts):
+            node = BracketNode(bracket=bracket, section='WINNERS', stage=stage, position=position, pending=2)
+            if stage < depth:
+                node.winner_to = created[('WINNERS', stage + 1, position // 2)]
+                node.winner_slot = position % 2 + 1
+            elif double:
+                node.winner_to, node.winner_slot = created[('FINAL', 1, 0)], 1
+            else:
+                node.winner_place = 1
+
+            if not double:
+                # Przy repasażu przegrani półfinałów czekają na walki o brąz
+                if not (kind == 'REPECHAGE' and stage == depth - 1):
+                    node.loser_place = bouts + 1
+            elif stage == 1:
+                node.loser_to, node.loser_slot = created[('LOSERS', 1, position // 2)], position % 2 + 1
+            else:
+                # Przegrani trafiają w odwróconej kolejności, aby ograniczyć powtórki walk
+                node.loser_to, node.loser_slot = created[('LOSERS', 2 * (stage - 1), bouts - 1 - position)], 2
+
+            if stage == 1:
+                first, second = seeds[2 * position], seeds[2 * position + 1]
+                node.athlete1 = athletes[first - 1] if first <= len(athletes) else None
+                node.athlete2 = athletes[second - 1] if second <= len(athletes) else None
+                node.pending = 0
+            nodes.append(node)
+        created.update(_create(nodes))
+
+    for position in range(size // 2):
+        _start(created[('WINNERS', 1, position)])
+    return bracket
+
+
+def _start(node):
+    """Węzeł zna już obie pozycje: tworzy walkę albo przepuszcza zawodnika bez walki"""
+    if node.athlete1_id and node.athlete2_id:
+        node.round = Round.objects.create(
+            tournament_id=node.bracket.tournament_id,
+            bracket_id=node.bracket_id,
+            athlete1_id=node.athlete1_id,
+            athlete2_id=node.athlete2_id,
+            round_number=node.stage,
+            division_key=node.bracket.division_key,
+        )
+        node.save(update_fields=['round'])
+    else:
+        # Wolny los: jedyny zawodnik przechodzi dalej, dalsze węzły dostają pustą pozycję
+        _finish(node, node.athlete1_id or node.athlete2_id, None)
+
+
+def _deliver(node_id, slot, athlete_id):
+    node = BracketNode.objects.select_for_update().select_related('bracket').get(pk=node_id)
+    setattr(node, f'athlete{slot}_id', athlete_id)
+    node.pending -= 1
+    node.save(update_fields=[f'athlete{slot}', 'pending'])
+    if node.pending == 0:
+        _start(node)
+
+
+def _route(node, target_id, slot, athlete_id, place):
+    if target_id is not None:
+        _deliver(target_id, slot, athlete_id)
+    elif athlete_id is not None and place is not None:
+        set_places(node.bracket.tournament_id, {athlete_id: place})
+
+
+def _finish(node, winner_id, loser_id):
+    node.winner_id = winner_id
+    node.decided = True
+    node.save(update_fields=['winner', 'decided'])
+    _route(node, node.winner_to_id, node.winner_slot, winner_id, node.winner_place)
+    _route(node, node.loser_to_id, node.loser_slot, loser_id, node.loser_place)
+    if _is_repechage_semifinal(node):
+        _build_repechage(node)
+
+
+def _is_repechage_semifinal(node):
+    bracket = node.bracket
+    return bracket.kind == 'REPECHAGE' and node.section == 'WINNERS' and node.stage == _depth(bracket) - 1
+
+
+def _build_repechage(semifinal):
+    """
+    Repasaż połówki drabinki: walczą zawodnicy przegrani z finalistą, od
+    najwcześniejszej rundy. Zwycięzca ostatniej walki zdobywa brązowy medal.
+    """
+    finalist_id = semifinal.winner_id
+    if finalist_id is None:
+        return
+    wins = BracketNode.objects.filter(
+        bracket_id=semifinal.bracket_id, section='WINNERS', winner_id=finalist_id, round__isnull=False,
+    ).order_by('stage')
+    losers = [node.athlete2_id if node.athlete1_id == finalist_id else node.athlete1_id for node in wins]
+    if not losers:
+        return
+    if len(losers) == 1:
+        set_places(semifinal.bracket.tournament_id, {losers[0]: 3})
+        return
+
+    created = {}
+    last_stage = len(losers) - 1
+    for stage in range(last_stage, 0, -1):
+        node = BracketNode(
+            bracket_id=semifinal.bracket_id, section='REPECHAGE', stage=stage, position=semifinal.position,
+            athlete2_id=losers[stage], pending=1, loser_place=7,
+        )
+        if stage == last_stage:
+            node.winner_place, node.loser_place = 3, 5
+        else:
+            node.winner_to, node.winner_slot = created[stage + 1], 1
+        if stage == 1:
+            node.athlete1_id, node.pending = losers[0], 0
+        node.save()
+        created[stage] = node
+    created[1].bracket = semifinal.bracket
+    _start(created[1])
+
+
+def _retract(node):
+    """Cofa skutki wcześniejszego wyniku węzła, o ile kolejne walki nie zostały jeszcze rozstrzygnięte"""
+    targets = [(node.winner_to_id, node.winner_slot), (node.loser_to_id, node.loser_slot)]
+    downstream = {
+        target.pk: target
+        for target in BracketNode.objects.select_for_update().filter(pk__in=[target for target, _ in targets if target])
+    }
+    repechage = []
+    if _is_repechage_semifinal(node):
+        repechage = list(BracketNode.objects.select_for_update().filter(
+            bracket_id=node.bracket_id, section='REPECHAGE', position=node.position,
+        ))
+    if any(target.decided for target in [*downstream.values(), *repechage]):
+        raise ValidationError("Nie można zmienić wyniku - kolejne walki w drabince zostały już rozstrzygnięte.")
+
+    for target_id, slot in targets:
+        if target_id is None:
+            continue
+        target = downstream[target_id]
+        if target.round_id is not None:
+            Round.objects.filter(pk=target.round_id).delete()
+            target.round = None
+        setattr(target, f'athlete{slot}_id', None)
+        target.pending += 1
+        target.save(update_fields=[f'athlete{slot}', 'pending', 'round'])
+
+    if repechage:
+        Round.objects.filter(bracket_node__in=repechage).delete()
+        BracketNode.objects.filter(pk__in=[chain_node.pk for chain_node in repechage]).delete()
+
+    # Miejsca przyznane przez ten węzeł przestają obowiązywać
+    placed = [athlete_id for athlete_id in (node.athlete1_id, node.athlete2_id) if athlete_id]
+    set_places(node.bracket.tournament_id, dict.fromkeys(placed))
+    node.winner = None
+    node.decided = False
+    node.save(update_fields=['winner', 'decided'])
+
+
+@transaction.atomic
+def record_result(round_instance):
+    """
+    Przenosi wynik walki do drabinki: aktualizuje tylko węzły zwycięzcy
+    i przegranego (oraz ewentualne walkowery za nimi), czyli O(głębokość)
+    zapisów niezależnie od wielkości dywizji. Korekta lub cofnięcie wyniku
+    najpierw wycofuje jego skutki.
+    """
+    node = BracketNode.objects.select_for_update().select_related('bracket').filter(round=round_instance).first()
+    if node is None:
+        return
+    if node.decided:
+        _retract(node)
+    winner_id = round_instance.winner_id
+    if winner_id is not None:
+        loser_id = round_instance.athlete2_id if winner_id == round_instance.athlete1_id else round_instance.athlete1_id
+        _finish(node, winner_id, loser_id)
+
+
+def bracket_nodes(bracket):
+    """Węzły drabinki w kolejności wyświetlania, z zawodnikami i walkami - jedno zapytanie"""
+    section_order = Case(
+        *[When(section=section, then=Value(index)) for index, (section, _) in enumerate(BracketNode.SECTIONS)],
+        output_field=IntegerField(),
+    )
+    return bracket.nodes.select_related('athlete1', 'athlete2', 'winner', 'round').order_by(
+        section_order, 'stage', 'position',
+    )
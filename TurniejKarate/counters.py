@@ -0,0 +1,213 @@
+import contextvars
+from collections import Counter
+from contextlib import contextmanager
+
+from django.db import connections
+from django.db.models import Case, Count, Exists, F, OuterRef, When
+
+from .models import DivisionCounter, Registration, Round, Tournament
+
+FIELDS = ('athletes_registered', 'athletes_remaining', 'bouts_decided')
+
+_eliminating = contextvars.ContextVar('eliminating', default=False)
+
+
+@contextmanager
+def elimination():
+    """
+    Zmiany zgłoszeń w tym bloku to odpadnięcie zawodnika (lub jego powrót
+    po korekcie wyniku): zmieniają tylko liczbę pozostałych, nie zgłoszonych.
+    """
+    token = _eliminating.set(True)
+    try:
+        yield
+    finally:
+        _eliminating.reset(token)
+
+
+def _change(groups, fields, using='default'):
+    """Dodaje {(id turnieju, klucz dywizji): n} do podanych liczników - UPDATE z F(), bez czytania wierszy"""
+    groups = {group: amount for group, amount in groups.items() if amount}
+    totals = Counter()
+    for (tournament_id, _), amount in groups.items():
+        totals[tournament_id] += amount
+    for tournament_id, amount in totals.items():
+        if amount:
+            Tournament.objects.using(using).filter(pk=tournament_id).update(
+                **{field: F(field) + amount for field in fields},
+            )
+    for (tournament_id, key), amount in groups.items():
+        counter = DivisionCounter.objects.using(using).filter(tournament_id=tournament_id, division_key=key)
+        update = {field: F(field) + amount for field in fields}
+        if not counter.update(**update) and amount > 0:
+            # Pierwszy wpis dywizji; ignore_conflicts - wiersz mógł właśnie dodać inny proces.
+            # Ujemnych zmian bez wiersza nie zapisujemy (np. kaskada przy usuwaniu turnieju)
+            DivisionCounter.objects.using(using).bulk_create(
+                [DivisionCounter(tournament_id=tournament_id, division_key=key)], ignore_conflicts=True,
+            )
+            counter.update(**update)
+
+
+def _registration_fields():
+    return ('athletes_remaining',) if _eliminating.get() else ('athletes_registered', 'athletes_remaining')
+
+
+def registrations_added(registrations):
+    """Nowe zgłoszenia (już z kluczami dywizji) - jedno zgrupowane zapytanie i UPDATE na dywizję"""
+    groups = {
+        (row['tournament_id'], row['division_key']): row['count']
+        for row in registrations.values('tournament_id', 'division_key').annotate(count=Count('id')).order_by()
+    }
+    _change(groups, _registration_fields(), using=registrations.db)
+
+
+def registration_removed(registration):
+    _change({(registration.tournament_id, registration.division_key): -1}, _registration_fields())
+
+
+def result_changed(round_instance, previous_winner_id):
+    if (previous_winner_id is None) != (round_instance.winner_id is None):
+        amount = 1 if previous_winner_id is None else -1
+        _change({(round_instance.tournament_id, round_instance.division_key): amount}, ('bouts_decided',))
+
+
+def round_deleted(round_instance):
+    if round_instance.winner_id is not None:
+        _change({(round_instance.tournament_id, round_instance.division_key): -1}, ('bouts_decided',))
+
+
+def _division_counts(registrations):
+    return {
+        (row['tournament_id'], row['division_key']): row['count']
+        for row in registrations.values('tournament_id', 'division_key').annotate(count=Count('id')).order_by()
+    }
+
+
+@contextmanager
+def division_keys_changing(registrations):
+    """
+    Zgłoszenia `registrations` zmieniają w tym bloku klucze dywizji (ważenie,
+    przeklasyfikowanie): liczniki dywizji przenoszą je z dawnych dywizji do
+    nowych na podstawie dwóch zgrupowanych zapytań - bez przeliczania turnieju.
+    """
+    before = _division_counts(registrations)
+    yield
+    after = _division_counts(registrations)
+    _change(
+        {group: after.get(group, 0) - before.get(group, 0) for group in set(before) | set(after)},
+        ('athletes_registered', 'athletes_remaining'),
+        using=registrations.db,
+    )
+
+
+def remaining(tournament_id, division_key=None):
+    """Liczba zawodników wciąż w turnieju (albo w jego dywizji) - odczyt jednej kolumny jednego wiersza"""
+    if division_key is None:
+        counters = Tournament.objects.filter(pk=tournament_id)
+    else:
+        counters = DivisionCounter.objects.filter(tournament_id=tournament_id, division_key=division_key)
+    return counters.values_list('athletes_remaining', flat=True).first() or 0
+
+
+def count_copied_registrations(tournament, copied, using='default'):
+    """
+    Liczniki nowego turnieju (bez walk), którego zgłoszenia wstawiono z
+    pominięciem sygnałów: dywizje jednym INSERT ... SELECT z GROUP BY.
+    """
+    Tournament.objects.using(using).filter(pk=tournament.pk).update(
+        athletes_registered=copied, athletes_remaining=copied,
+    )
+    connection = connections[using]
+    quote = connection.ops.quote_name
+    registration = Registration._meta
+    counter = DivisionCounter._meta
+    tournament_column = quote(registration.get_field('tournament').column)
+    division_column = quote(registration.get_field('division_key').column)
+    columns = ', '.join(quote(counter.get_field(name).column) for name in ('tournament', 'division_key', *FIELDS))
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {quote(counter.db_table)} ({columns}) "
+            f"SELECT {tournament_column}, {division_column}, COUNT(*), COUNT(*), 0 "
+            f"FROM {quote(registration.db_table)} WHERE {tournament_column} = %s "
+            f"GROUP BY {tournament_column}, {division_column}",
+            [tournament.pk],
+        )
+
+
+def expected_counts(tournament_ids, using='default'):
+    """
+    Liczniki policzone od zera: {(id turnieju, klucz dywizji): [zgłoszeni, pozostali, rozstrzygnięte]}.
+    Zgłoszeni to pozostali plus przegrani walk pucharowych, których nie ma już w turnieju.
+    """
+    counts = {}
+
+    def add(tournament_id, key, index, amount=1):
+        counts.setdefault((tournament_id, key), [0, 0, 0])[index] += amount
+
+    registered = Registration.objects.using(using).filter(tournament_id__in=tournament_ids).values(
+        'tournament_id', 'division_key',
+    ).annotate(count=Count('id')).order_by()
+    for row in registered:
+        add(row['tournament_id'], row['division_key'], 0, row['count'])
+        add(row['tournament_id'], row['division_key'], 1, row['count'])
+
+    rounds = Round.objects.using(using).filter(tournament_id__in=tournament_ids)
+    eliminated = rounds.filter(pool__isnull=True, bracket__isnull=True, winner__isnull=False).annotate(
+        loser=Case(When(winner_id=F('athlete1_id'), then=F('athlete2_id')), default=F('athlete1_id')),
+    ).exclude(Exists(Registration.objects.using(using).filter(
+        tournament_id=OuterRef('tournament_id'), athlete_id=OuterRef('loser'),
+    ))).values_list('tournament_id', 'loser', 'division_key').distinct()
+    seen = set()
+    for tournament_id, loser, key in eliminated.iterator():
+        if (tournament_id, loser) not in seen:
+            seen.add((tournament_id, loser))
+            add(tournament_id, key, 0)
+
+    decided = rounds.filter(winner__isnull=False).values('tournament_id', 'division_key').annotate(
+        count=Count('id'),
+    ).order_by()
+    for row in decided:
+        add(row['tournament_id'], row['division_key'], 2, row['count'])
+    return counts
+
+
+def reconcile(tournament_ids=None, using='default'):
+    """
+    Przelicza liczniki od zera i poprawia tylko te, które się rozjechały.
+    Zwraca liczbę poprawionych wierszy (turniejów i dywizji).
+    """
+    tournaments = Tournament.objects.using(using).order_by('pk')
+    if tournament_ids is not None:
+        tournaments = tournaments.filter(pk__in=list(tournament_ids))
+    ids = list(tournaments.values_list('pk', flat=True))
+    counts = expected_counts(ids, using=using)
+
+    totals = {tournament_id: [0, 0, 0] for tournament_id in ids}
+    for (tournament_id, _), values in counts.items():
+        totals[tournament_id] = [total + value for total, value in zip(totals[tournament_id], values)]
+
+    fixed = []
+    for tournament in tournaments.only('pk', *FIELDS):
+        if [getattr(tournament, field) for field in FIELDS] != totals[tournament.pk]:
+            for field, value in zip(FIELDS, totals[tournament.pk]):
+                setattr(tournament, field, value)
+            fixed.append(tournament)
+    Tournament.objects.using(using).bulk_update(fixed, FIELDS)
+
+    existing = {
+        (counter.tournament_id, counter.division_key): counter
+        for counter in DivisionCounter.objects.using(using).filter(tournament_id__in=ids)
+    }
+    changed, created = [], []
+    for group in set(existing) | set(counts):
+        values = counts.get(group, [0, 0, 0])
+        counter = existing.get(group)
+        if counter is None:
+            created.append(DivisionCounter(tournament_id=group[0], division_key=group[1], **dict(zip(FIELDS, values))))
+        elif [getattr(counter, field) for field in FIELDS] != values:
+            for field, value in zip(FIELDS, values):
+                setattr(counter, field, value)
+            changed.append(counter)
+    DivisionCounter.objects.using(using).bulk_create(created)
+    DivisionCounter.objects.using(using).bulk_update(changed, FIELDS)
+    return len(fixed) + len(changed) + len(created)
@@ -0,0 +1,133 @@
+import unicodedata
+from difflib import SequenceMatcher
+
+from django.db import transaction
+from django.db.models import Q
+
+from . import counters, eligibility, head_to_head, leaderboards, ratings
+from .fragments import touch_athlete
+from .models import (
+    Athlete, BoutEvent, BracketNode, DuplicateCandidate, JudgeScore, Placement, Pool, Registration, Round, Tournament,
+)
+
+PREFIX_LENGTH = 3
+AGE_TOLERANCE = 1
+DEFAULT_THRESHOLD = 0.85
+
+
+def normalize(text):
+    """Małe litery, bez polskich znaków i znaków niealfabetycznych"""
+    text = text.replace('ł', 'l').replace('Ł', 'L')
+    decomposed = unicodedata.normalize('NFKD', text)
+    return ''.join(char for char in decomposed if char.isalnum()).lower()
+
+
+def block_key(last_name, club_id, gender):
+    return normalize(last_name)[:PREFIX_LENGTH], club_id, gender
+
+
+def similarity(first, second):
+    """Podobieństwo dwóch zawodników z bloku w skali 0-1"""
+    first_name = SequenceMatcher(None, first['first_name'], second['first_name']).ratio()
+    last_name = SequenceMatcher(None, first['last_name'], second['last_name']).ratio()
+    score = 0.4 * first_name + 0.6 * last_name
+    if first['age'] != second['age']:
+        score -= 0.05
+    return score
+
+
+def find_duplicates(threshold=DEFAULT_THRESHOLD):
+    """
+    Wyszukuje prawdopodobne duplikaty zawodników.
+
+    Zawodnicy są dzieleni na bloki (prefiks nazwiska, klub, płeć), a pary są
+    porównywane tylko wewnątrz bloku i tylko przy różnicy wieku do jednego roku,
+    więc koszt zależy od wielkości bloków, a nie od kwadratu liczby zawodników.
+    Zwraca listę krotek (id starszego rekordu, id duplikatu, podobieństwo).
+    """
+    blocks = {}
+    rows = Athlete.objects.values_list('id', 'first_name', 'last_name', 'age', 'club_id', 'gender')
+    for athlete_id, first_name, last_name, age, club_id, gender in rows.iterator(chunk_size=5000):
+        blocks.setdefault(block_key(last_name, club_id, gender), []).append({
+            'id': athlete_id,
+            'first_name': normalize(first_name),
+            'last_name': normalize(last_name),
+            'age': age,
+        })
+
+    pairs = []
+    for members in blocks.values():
+        if len(members) < 2:
+            continue
+        members.sort(key=lambda member: member['age'])
+        for index, first in enumerate(members):
+            for second in members[index + 1:]:
+                # Lista jest posortowana po wieku, więc dalsze elementy też są za starzy
+                if second['age'] - first['age'] > AGE_TOLERANCE:
+                    break
+                score = similarity(first, second)
+                if score >= threshold:
+                    keep, duplicate = sorted((first['id'], second['id']))
+                    pairs.append((keep, duplicate, score))
+    return pairs
+
+
+def store_candidates(pairs, batch_size=1000):
+    """Zapisuje nowe pary do przeglądu; pary już odrzucone nie wracają"""
+    candidates = [
+        DuplicateCandidate(athlete_id=keep, duplicate_id=duplicate, score=score)
+        for keep, duplicate, score in pairs
+    ]
+    DuplicateCandidate.objects.bulk_create(candidates, batch_size=batch_size, ignore_conflicts=True)
+    return len(candidates)
+
+
+def _repoint_m2m(through, owner_field, keep, duplicate):
+    """Przenosi wiersze tabeli pośredniej z duplikatu na zachowany rekord bez tworzenia powtórzeń"""
+    already_linked = through.objects.filter(athlete=keep).values(owner_field)
+    through.objects.filter(athlete=duplicate, **{f'{owner_field}__in': already_linked}).delete()
+    through.objects.filter(athlete=duplicate).update(athlete=keep)
+
+
+@transaction.atomic
+def merge_athletes(keep, duplicate):
+    """Scala duplikat z zachowanym zawodnikiem: przepina walki, oceny i zgłoszenia, po czym usuwa duplikat"""
+    if keep.pk == duplicate.pk:
+        raise ValueError("Nie można scalić zawodnika z samym sobą.")
+
+    # Walki obu rekordów ze sobą stałyby się walkami zawodnika z samym sobą; usunięcie cofa ich wyniki w projekcjach
+    for round_instance in Round.objects.filter(
+        Q(athlete1=keep, athlete2=duplicate) | Q(athlete1=duplicate, athlete2=keep),
+    ):
+        round_instance.delete()
+
+    Round.objects.filter(athlete1=duplicate).update(athlete1=keep)
+    Round.objects.filter(athlete2=duplicate).update(athlete2=keep)
+    Round.objects.filter(winner=duplicate).update(winner=keep)
+    JudgeScore.objects.filter(athlete=duplicate).update(athlete=keep)
+    for field in ('athlete1', 'athlete2', 'winner'):
+        BracketNode.objects.filter(**{field: duplicate}).update(**{field: keep})
+    for field in ('athlete1', 'athlete2', 'winner', 'previous_winner'):
+        BoutEvent.objects.filter(**{field: duplicate}).update(**{field: keep})
+
+    _repoint_m2m(Tournament.athletes.through, 'tournament', keep, duplicate)
+    _repoint_m2m(Pool.athletes.through, 'pool', keep, duplicate)
+    _repoint_m2m(Placement, 'tournament', keep, duplicate)
+    touch_athlete(keep)
+    tournament_ids = list(Registration.objects.filter(athlete=keep).values_list('tournament_id', flat=True))
+    eligibility.invalidate(tournament_ids)
+
+    if keep.place is None and duplicate.place is not None:
+        keep.place = duplicate.place
+        keep.save(update_fields=['place'])
+    ratings.merge_ratings(keep.pk, duplicate.pk)
+    duplicate.delete()
+
+    # Spotkania i medale duplikatu należą teraz do zachowanego rekordu; medale zmieniają tylko kluby obu rekordów
+    head_to_head.rebuild(athlete_ids=[keep.pk])
+    leaderboards.rebuild_season_stats(athlete_ids=[keep.pk])
+    leaderboards.rebuild_club_medals(club_ids={keep.club_id, duplicate.club_id})
+    # Przepięte walki zmieniają listę wyeliminowanych w turniejach zawodnika
+    counters.reconcile(set(tournament_ids) | set(
+        Round.objects.filter(Q(athlete1=keep) | Q(athlete2=keep)).values_list('tournament_id', flat=True),
+    ))
@@ -0,0 +1,103 @@
+from django.apps import apps
+from django.db import models, transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from . import jobs
+from .models import Athlete, JudgeScore, Placement, Round
+
+BATCH_SIZE = 500
+# Usunięcia z większą liczbą zależnych wierszy idą do zadania w tle
+BACKGROUND_THRESHOLD = 2000
+
+
+def deletion_plan(queryset, path=()):
+    """
+    Zapytania do usunięcia w kolejności: najpierw wiersze zależne (CASCADE),
+    na końcu sam `queryset`. Zapytania zależnych są podzapytaniami po
+    kluczach rodziców, więc nic nie jest ładowane do pamięci z góry.
+    """
+    model = queryset.model
+    for relation in model._meta.get_fields(include_hidden=True):
+        if not (relation.auto_created and not relation.concrete and (relation.one_to_many or relation.one_to_one)):
+            continue
+        if relation.on_delete is not models.CASCADE or relation.related_model in path:
+            continue
+        children = relation.related_model._base_manager.filter(**{
+            f'{relation.field.name}__in': queryset.values(relation.field.target_field.attname),
+        })
+        yield from deletion_plan(children, path + (model,))
+    yield queryset
+
+
+def count_rows(queryset):
+    """Górne oszacowanie liczby usuwanych wierszy (walka obu usuwanych zawodników liczy się dwa razy)"""
+    return sum(step.count() for step in deletion_plan(queryset))
+
+
+def delete_in_batches(queryset, batch_size=BATCH_SIZE, progress=None):
+    """
+    Usuwa `queryset` razem z zależnymi wierszami paczkami po `batch_size`
+    kluczy, każda paczka w osobnej krótkiej transakcji. Pamięć zależy od
+    rozmiaru paczki, a nie od liczby usuwanych wierszy; sygnały usuwania
+    działają jak przy zwykłym `delete()`. Przerwane usuwanie można
+    wznowić - kolejne wywołanie zaczyna od tego, co zostało.
+    """
+    deleted = 0
+    for step in deletion_plan(queryset):
+        manager = step.model._base_manager
+        while True:
+            with transaction.atomic():
+                pks = list(step.values_list('pk', flat=True)[:batch_size])
+                if not pks:
+                    break
+                manager.filter(pk__in=pks).delete()
+            deleted += len(pks)
+            if progress is not None:
+                progress(len(pks))
+    return deleted
+
+
+def schedule_deletion(queryset):
+    """Zleca usunięcie wierszy `queryset` w tle; zwraca zadanie (postęp w `BackgroundJob.progress`)"""
+    return jobs.enqueue(
+        'DELETE', model=queryset.model._meta.label, pks=list(queryset.values_list('pk', flat=True)),
+    )
+
+
+@jobs.handler('DELETE')
+def run_deletion(job):
+    queryset = apps.get_model(job.params['model'])._base_manager.filter(pk__in=job.params['pks'])
+    jobs.set_total(job, job.progress + count_rows(queryset))
+    delete_in_batches(queryset, progress=lambda done: jobs.report_progress(job, done))
+    jobs.set_total(job, job.progress)
+
+
+def has_history(athlete):
+    return (
+        Round.objects.filter(Q(athlete1=athlete) | Q(athlete2=athlete)).exists()
+        or Placement.objects.filter(athlete=athlete).exists()
+        or JudgeScore.objects.filter(athlete=athlete).exists()
+    )
+
+
+@transaction.atomic
+def soft_delete_athlete(athlete):
+    """Ukrywa zawodnika i wycofuje go z nadchodzących turniejów; walki i wyniki zostają"""
+    athlete.deleted_at = timezone.now()
+    athlete.save(update_fields=['deleted_at'])
+    upcoming = list(athlete.tournaments.filter(date__gte=timezone.localdate()).values_list('pk', flat=True))
+    if upcoming:
+        athlete.tournaments.remove(*upcoming)
+
+
+def delete_athlete(athlete):
+    """
+    Zawodnik z historią jest tylko ukrywany ('soft'), bez historii usuwany
+    od razu ('deleted'). Zwraca sposób usunięcia.
+    """
+    if has_history(athlete):
+        soft_delete_athlete(athlete)
+        return 'soft'
+    delete_in_batches(Athlete.objects.filter(pk=athlete.pk))
+    return 'deleted'
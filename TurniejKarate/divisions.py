@@ -0,0 +1,141 @@
+from itertools import groupby
+
+from django.db.models import Case, CharField, F, IntegerField, OuterRef, Subquery, Value, When
+from django.db.models.functions import Cast, Coalesce, Concat
+
+from . import http_cache
+from .models import AgeBand, Athlete, BeltGroup, Registration, Round, Tournament
+from .reference import reference_data
+
+BELT_RANKS = {code: rank for rank, (code, _) in enumerate(Athlete.BELT_LEVELS, start=1)}
+GENDER_LABELS = dict(Athlete.GENDER_CHOICES)
+
+
+def build_key(gender, age_band_id, belt_group_id, weight_category_id):
+    """Klucz dywizji: płeć-przedział wieku-grupa pasów-kategoria wagowa (0 = brak)"""
+    return f"{gender}-{age_band_id or 0}-{belt_group_id or 0}-{weight_category_id or 0}"
+
+
+def parse_key(key):
+    gender, age_band_id, belt_group_id, weight_category_id = key.split('-')
+    return gender, int(age_band_id), int(belt_group_id), int(weight_category_id)
+
+
+def age_band_for(age):
+    # Ta sama kolejność co w division_key_expression: min_age, id
+    for age_band in reference_data.age_bands():
+        if age_band.min_age <= age <= age_band.max_age:
+            return age_band
+    return None
+
+
+def belt_group_for(belt_level):
+    rank = BELT_RANKS.get(belt_level)
+    for belt_group in reference_data.belt_groups():
+        if rank is not None and belt_group.min_belt <= rank <= belt_group.max_belt:
+            return belt_group
+    return None
+
+
+def division_key(athlete):
+    """Klucz dywizji zawodnika policzony w pamięci z danych słownikowych"""
+    age_band = age_band_for(athlete.age)
+    belt_group = belt_group_for(athlete.belt_level)
+    return build_key(
+        athlete.gender,
+        age_band.id if age_band else None,
+        belt_group.id if belt_group else None,
+        athlete.weight_category_id,
+    )
+
+
+def division_key_expression(athlete_field='athlete_id'):
+    """Ten sam klucz co `division_key`, ale jako wyrażenie SQL dla zbiorczego UPDATE"""
+    belt_rank = Case(
+        *[When(belt_level=code, then=Value(rank)) for code, rank in BELT_RANKS.items()],
+        output_field=IntegerField(),
+    )
+    age_band = AgeBand.objects.filter(
+        min_age__lte=OuterRef('age'), max_age__gte=OuterRef('age'),
+    ).order_by('min_age', 'id').values('id')[:1]
+    belt_group = BeltGroup.objects.filter(
+        min_belt__lte=OuterRef('belt_rank'), max_belt__gte=OuterRef('belt_rank'),
+    ).order_by('min_belt', 'id').values('id')[:1]
+
+    def part(expression):
+        return Coalesce(Cast(expression, CharField()), Value('0'))
+
+    key = Athlete.objects.filter(pk=OuterRef(athlete_field)).annotate(belt_rank=belt_rank).annotate(
+        division=Concat(
+            'gender', Value('-'),
+            part(Subquery(age_band)), Value('-'),
+            part(Subquery(belt_group)), Value('-'),
+            part('weight_category_id'),
+            output_field=CharField(),
+        ),
+    ).values('division')[:1]
+    return Subquery(key, output_field=CharField())
+
+
+def refresh_division_keys(queryset, athlete_field='athlete_id'):
+    """Przelicza klucze dywizji zgłoszeń (lub rund) jednym zapytaniem UPDATE"""
+    updated = queryset.update(division_key=division_key_expression(athlete_field))
+    # Zmienia się skład dywizji, więc zapamiętane wyniki turniejów są nieaktualne
+    tournaments = Tournament.objects.using(queryset.db).filter(pk__in=queryset.values('tournament_id'))
+    tournaments.update(version=F('version') + 1)
+    http_cache.purge_tournaments(tournaments.values_list('pk', flat=True))
+    return updated
+
+
+def division_key_for_round(round_instance):
+    """Runda dziedziczy klucz ze zgłoszenia zawodnika 1 (liczonego przy zgłoszeniu i ważeniu)"""
+    key = Registration.objects.filter(
+        tournament_id=round_instance.tournament_id, athlete_id=round_instance.athlete1_id,
+    ).values_list('division_key', flat=True).first()
+    return key or division_key(round_instance.athlete1)
+
+
+def division_label(key):
+    if not key:
+        return "Brak dywizji"
+    gender, age_band_id, belt_group_id, weight_category_id = parse_key(key)
+    age_band = reference_data.age_band(age_band_id)
+    belt_group = reference_data.belt_group(belt_group_id)
+    category = reference_data.category(weight_category_id)
+    return ", ".join([
+        GENDER_LABELS.get(gender, gender),
+        age_band.name if age_band else "Każdy wiek",
+        belt_group.name if belt_group else "Każdy pas",
+        str(category) if category else "Brak kategorii",
+    ])
+
+
+def tournament_divisions(tournament_ids):
+    """
+    Dywizje turniejów z ich zawodnikami.
+
+    Zgłoszenia i uczestnicy rund są pobierani jednym zapytaniem UNION
+    posortowanym po (turniej, klucz dywizji), więc grupowanie sprowadza się
+    do przejścia po uporządkowanym wyniku. Zwraca {id turnieju: [dywizje]}.
+    """
+    tournament_ids = list(tournament_ids)
+    registered = Registration.objects.filter(tournament_id__in=tournament_ids).values_list(
+        'tournament_id', 'division_key', 'athlete_id',
+    )
+    as_athlete1 = Round.objects.filter(tournament_id__in=tournament_ids).values_list(
+        'tournament_id', 'division_key', 'athlete1_id',
+    )
+    as_athlete2 = Round.objects.filter(tournament_id__in=tournament_ids).values_list(
+        'tournament_id', 'division_key', 'athlete2_id',
+    )
+    rows = list(registered.union(as_athlete1, as_athlete2).order_by('tournament_id', 'division_key'))
+    athletes = Athlete.objects.in_bulk({athlete_id for _, _, athlete_id in rows})
+
+    result = {tournament_id: [] for tournament_id in tournament_ids}
+    for (tournament_id, key), members in groupby(rows, key=lambda row: (row[0], row[1])):
+        result[tournament_id].append({
+            'key': key,
+            'label': division_label(key),
+            'athletes': [athletes[athlete_id] for _, _, athlete_id in members],
+        })
+    return result
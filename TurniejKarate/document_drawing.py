@@ -0,0 +1,81 @@
+"""
+Dokumenty zawodników (listy startowe, identyfikatory, dyplomy) jako PDF.
+
+Jak bracket_drawing - bez Django i bazy danych: dokument powstaje z
+gotowego słownika, więc `render_document` można wywoływać w puli procesów.
+"""
+from .bracket_drawing import pdf_document, pdf_text
+
+A4 = (595, 842)
+A4_LANDSCAPE = (842, 595)
+BADGE = (298, 420)  # A6
+MARGIN = 50
+LINE_HEIGHT = 16
+LINES_PER_PAGE = 44
+
+
+def _text(x, y, value, size=11, bold=False):
+    return f'BT /{"F2" if bold else "F1"} {size} Tf {x:g} {y:g} Td ({pdf_text(value)}) Tj ET'
+
+
+def _centered(width, y, value, size=11, bold=False):
+    # Przybliżona szerokość Helvetiki (0.5 em na znak) - wystarcza do wyśrodkowania nagłówków
+    x = max((width - len(value) * size * 0.5) / 2, 10)
+    return _text(x, y, value, size, bold)
+
+
+def start_list(document):
+    """Lista startowa dywizji: numer, zawodnik, klub - kolejne strony co LINES_PER_PAGE wierszy"""
+    width, height = A4
+    entries = document['athletes'] or [('-', '')]
+    pages = []
+    for first in range(0, len(entries), LINES_PER_PAGE):
+        commands = [
+            _text(MARGIN, height - MARGIN, document['tournament'], 14, bold=True),
+            _text(MARGIN, height - MARGIN - 20, f"Lista startowa: {document['division']}", 11),
+        ]
+        y = height - MARGIN - 50
+        for number, (name, club) in enumerate(entries[first:first + LINES_PER_PAGE], start=first + 1):
+            commands.append(_text(MARGIN, y, f"{number}. {name}", 10))
+            commands.append(_text(width - MARGIN - 160, y, club, 10))
+            y -= LINE_HEIGHT
+        pages.append((width, height, '\n'.join(commands)))
+    return pdf_document(pages)
+
+
+def badge(document):
+    width, height = BADGE
+    commands = [
+        f'0.2 G 10 10 {width - 20} {height - 20} re S',
+        _centered(width, height - 50, document['tournament'], 12, bold=True),
+        _centered(width, height - 170, document['first_name'], 20, bold=True),
+        _centered(width, height - 200, document['last_name'], 20, bold=True),
+        _centered(width, height - 240, document['club'], 11),
+        _centered(width, 60, document['division'], 9),
+    ]
+    return pdf_document([(width, height, '\n'.join(commands))])
+
+
+def certificate(document):
+    width, height = A4_LANDSCAPE
+    commands = [
+        f'0.2 G 20 20 {width - 40} {height - 40} re S',
+        _centered(width, height - 110, "DYPLOM", 36, bold=True),
+        _centered(width, height - 170, "dla", 14),
+        _centered(width, height - 220, document['name'], 26, bold=True),
+        _centered(width, height - 270, f"za zajęcie {document['place']}. miejsca", 18),
+        _centered(width, height - 305, document['division'], 12),
+        _centered(width, height - 360, f"{document['tournament']}, {document['date']}", 14),
+    ]
+    return pdf_document([(width, height, '\n'.join(commands))])
+
+
+RENDERERS = {
+    'start_lists': start_list,
+    'badges': badge,
+    'certificates': certificate,
+}
+
+
+def render_document(kind, document):
+    return RENDERERS[kind](document)
@@ -0,0 +1,160 @@
+import logging
+import os
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from itertools import groupby, islice
+from pathlib import Path
+
+from django.conf import settings
+from django.db.models import OuterRef, Q, Subquery
+from django.utils.text import slugify
+
+from . import jobs
+from .divisions import division_label
+from .document_drawing import RENDERERS, render_document
+from .models import BackgroundJob, Placement, Registration, Round, Tournament
+
+logger = logging.getLogger(__name__)
+
+KINDS = tuple(RENDERERS)
+CHUNK_SIZE = 200  # Dokumenty renderowane naraz i dopisywane do archiwum jedną paczką
+ITERATOR_CHUNK = 2000
+
+
+def archive_path(tournament, kind):
+    return Path(settings.DOCUMENTS_ROOT) / f'tournament-{tournament.id}-{kind}.zip'
+
+
+def _start_lists(tournament):
+    rows = Registration.objects.filter(tournament=tournament).order_by(
+        'division_key', 'athlete__last_name', 'athlete__first_name', 'athlete_id',
+    ).values_list('division_key', 'athlete__first_name', 'athlete__last_name', 'athlete__club__name')
+    for key, members in groupby(rows.iterator(chunk_size=ITERATOR_CHUNK), key=lambda row: row[0]):
+        yield f"start-lists/{key or 'brak-dywizji'}.pdf", {
+            'tournament': tournament.name,
+            'division': division_label(key),
+            'athletes': [(f"{first_name} {last_name}", club) for _, first_name, last_name, club in members],
+        }
+
+
+def _badges(tournament):
+    rows = Registration.objects.filter(tournament=tournament).order_by('athlete_id').values_list(
+        'athlete_id', 'athlete__first_name', 'athlete__last_name', 'athlete__club__name', 'division_key',
+    )
+    for athlete_id, first_name, last_name, club, key in rows.iterator(chunk_size=ITERATOR_CHUNK):
+        yield f"badges/{athlete_id}-{slugify(f'{last_name} {first_name}')}.pdf", {
+            'tournament': tournament.name,
+            'first_name': first_name,
+            'last_name': last_name,
+            'club': club,
+            'division': division_label(key),
+        }
+
+
+def _certificates(tournament):
+    # Miejsca z Placement - Athlete.place przechowuje tylko miejsce z ostatniego turnieju zawodnika
+    division = Round.objects.filter(
+        Q(athlete1=OuterRef('athlete')) | Q(athlete2=OuterRef('athlete')), tournament=OuterRef('tournament'),
+    ).order_by('-id').values('division_key')[:1]
+    rows = Placement.objects.filter(tournament=tournament).annotate(division_key=Subquery(division)).order_by(
+        'place', 'athlete_id',
+    ).values_list('athlete_id', 'place', 'athlete__first_name', 'athlete__last_name', 'division_key')
+    for athlete_id, place, first_name, last_name, key in rows.iterator(chunk_size=ITERATOR_CHUNK):
+        yield f"certificates/{place:03d}-{athlete_id}-{slugify(f'{last_name} {first_name}')}.pdf", {
+            'tournament': tournament.name,
+            'date': str(tournament.date),
+            'name': f"{first_name} {last_name}",
+            'place': place,
+            'division': division_label(key) if key else '',
+        }
+
+
+SOURCES = {
+    'start_lists': _start_lists,
+    'badges': _badges,
+    'certificates': _certificates,
+}
+
+
+def documents(tournament, kind):
+    """(nazwa pliku w archiwum, dane dokumentu) w stałej kolejności, czytane strumieniowo przez iterator()"""
+    return SOURCES[kind](tournament)
+
+
+def count_documents(tournament, kind):
+    if kind == 'start_lists':
+        return Registration.objects.filter(tournament=tournament).values('division_key').distinct().count()
+    if kind == 'badges':
+        return Registration.objects.filter(tournament=tournament).count()
+    return Placement.objects.filter(tournament=tournament).count()
+
+
+def _written(partial):
+    """Nazwy plików w niedokończonym archiwum - od nich generowanie jest wznawiane"""
+    if not partial.exists():
+        return set()
+    try:
+        with zipfile.ZipFile(partial) as archive:
+            return set(archive.namelist())
+    except zipfile.BadZipFile:
+        # Przerwane w trakcie dopisywania paczki (bez katalogu centralnego) - zaczynamy od nowa
+        logger.warning("Uszkodzone archiwum %s - generowanie od początku", partial)
+        partial.unlink()
+        return set()
+
+
+def generate(tournament, kind, path=None, workers=None, progress=None):
+    """
+    Zapisuje dokumenty `kind` turnieju do jednego pliku ZIP.
+
+    Dokumenty są pobierane strumieniowo, rysowane paczkami po CHUNK_SIZE w
+    puli procesów i dopisywane do archiwum `.part`, które po każdej paczce
+    jest zamykane - w pamięci jest najwyżej jedna paczka. Przerwane
+    generowanie wznawia się od plików, które są już w archiwum; gotowe
+    archiwum zastępuje poprzednie dopiero na końcu. Zwraca ścieżkę pliku.
+    """
+    path = Path(path or archive_path(tournament, kind))
+    path.parent.mkdir(parents=True, exist_ok=True)
+    partial = path.with_name(path.name + '.part')
+    done = _written(partial)
+    if done and progress is not None:
+        progress(len(done))
+
+    pending = (item for item in documents(tournament, kind) if item[0] not in done)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        while True:
+            chunk = list(islice(pending, CHUNK_SIZE))
+            if not chunk:
+                break
+            rendered = executor.map(render_document, [kind] * len(chunk), [document for _, document in chunk])
+            with zipfile.ZipFile(partial, 'a', compression=zipfile.ZIP_DEFLATED) as archive:
+                for (name, _), output in zip(chunk, rendered):
+                    archive.writestr(name, output)
+            if progress is not None:
+                progress(len(chunk))
+
+    if not partial.exists():
+        # Brak dokumentów - puste archiwum
+        zipfile.ZipFile(partial, 'w').close()
+    os.replace(partial, path)
+    return path
+
+
+def schedule_documents(tournament, kind):
+    """Zleca generowanie w tle; zadanie już czekające lub trwające nie jest dublowane"""
+    pending = BackgroundJob.objects.filter(
+        kind='DOCUMENTS', status__in=['QUEUED', 'RUNNING'],
+        params__tournament_id=tournament.id, params__document_kind=kind,
+    ).first()
+    return pending or jobs.enqueue('DOCUMENTS', tournament_id=tournament.id, document_kind=kind)
+
+
+@jobs.handler('DOCUMENTS')
+def run_documents(job):
+    tournament = Tournament.objects.get(pk=job.params['tournament_id'])
+    kind = job.params['document_kind']
+    # Przy wznowieniu postęp liczy się od nowa: najpierw pliki już zapisane w archiwum
+    BackgroundJob.objects.filter(pk=job.pk).update(progress=0)
+    job.progress = 0
+    jobs.set_total(job, count_documents(tournament, kind))
+    generate(tournament, kind, progress=lambda done: jobs.report_progress(job, done))
@@ -0,0 +1,177 @@
+import threading
+import uuid
+
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import Athlete, Registration
+
+VERSION_KEY = 'TurniejKarate:eligibility-version:{}'
+
+
+class EligibilityMatrix:
+    """
+    Zawodnicy turnieju, którzy mogą jeszcze walczyć, jako zbiory bitów.
+
+    Każdy zgłoszony zawodnik dostaje numer bitu; dla każdej pary (płeć,
+    kategoria wagowa) trzymamy maskę jej zawodników, a osobna maska
+    `active` mówi, kto nadal jest zgłoszony. Przeciwnicy zawodnika to jedna
+    operacja AND, a odpadnięcie zawodnika zeruje jeden bit.
+    """
+
+    def __init__(self, rows):
+        self._bits = {}
+        self._ids = []
+        self._groups = {}
+        self._group_of = {}
+        self.active = 0
+        for athlete_id, gender, weight_category_id in rows:
+            self.add(athlete_id, gender, weight_category_id)
+
+    def add(self, athlete_id, gender, weight_category_id):
+        bit = self._bits.get(athlete_id)
+        if bit is None:
+            bit = self._bits[athlete_id] = len(self._ids)
+            self._ids.append(athlete_id)
+        group = (gender, weight_category_id)
+        previous = self._group_of.get(athlete_id)
+        if previous is not None and previous != group:
+            self._groups[previous] &= ~(1 << bit)
+        self._group_of[athlete_id] = group
+        self._groups[group] = self._groups.get(group, 0) | (1 << bit)
+        self.active |= 1 << bit
+
+    def remove(self, athlete_id):
+        bit = self._bits.get(athlete_id)
+        if bit is not None:
+            self.active &= ~(1 << bit)
+
+    def _members(self, mask):
+        members = []
+        while mask:
+            low = mask & -mask
+            members.append(self._ids[low.bit_length() - 1])
+            mask ^= low
+        return members
+
+    def is_active(self, athlete_id):
+        bit = self._bits.get(athlete_id)
+        return bit is not None and bool(self.active >> bit & 1)
+
+    def athlete_ids(self):
+        return self._members(self.active)
+
+    def opponents(self, athlete_id):
+        """Aktywni zawodnicy tej samej płci i kategorii wagowej (bez samego zawodnika)"""
+        if not self.is_active(athlete_id):
+            return []
+        mask = self._groups[self._group_of[athlete_id]] & self.active & ~(1 << self._bits[athlete_id])
+        return self._members(mask)
+
+    def can_fight(self, athlete1_id, athlete2_id):
+        return (
+            athlete1_id != athlete2_id
+            and self.is_active(athlete1_id) and self.is_active(athlete2_id)
+            and self._group_of[athlete1_id] == self._group_of[athlete2_id]
+        )
+
+    def suggestions(self):
+        """Propozycje par: kolejni aktywni zawodnicy każdej grupy (płeć, kategoria) łączeni po dwóch"""
+        pairs = []
+        for group in sorted(self._groups, key=lambda group: (group[0], group[1] or 0)):
+            members = self._members(self._groups[group] & self.active)
+            pairs.extend(zip(members[0::2], members[1::2]))
+        return pairs
+
+
+class EligibilityCache:
+    """
+    Macierze turniejów w pamięci procesu, budowane jednym zapytaniem.
+
+    Zmiana zgłoszeń w tym procesie aktualizuje macierz na miejscu
+    (odpadnięcie zawodnika to wyzerowanie bitu) i ustawia nową wersję we
+    wspólnym cache; pozostałe procesy po zauważeniu innej wersji budują
+    macierz od nowa.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._matrices = {}
+
+    @staticmethod
+    def _shared_version(tournament_id):
+        key = VERSION_KEY.format(tournament_id)
+        version = cache.get(key)
+        if version is None:
+            cache.add(key, uuid.uuid4().hex, None)
+            version = cache.get(key)
+        return version
+
+    @staticmethod
+    def _new_version(tournament_id):
+        version = uuid.uuid4().hex
+        cache.set(VERSION_KEY.format(tournament_id), version, None)
+        return version
+
+    def get(self, tournament_id):
+        version = self._shared_version(tournament_id)
+        with self._lock:
+            entry = self._matrices.get(tournament_id)
+            if entry is not None and entry[0] == version:
+                return entry[1]
+        matrix = EligibilityMatrix(Registration.objects.filter(tournament_id=tournament_id).values_list(
+            'athlete_id', 'athlete__gender', 'athlete__weight_category_id',
+        ))
+        with self._lock:
+            self._matrices[tournament_id] = (version, matrix)
+        return matrix
+
+    def update(self, tournament_id, added=(), removed=()):
+        """Nanosi zmianę zgłoszeń na macierz tego procesu i publikuje nową wersję"""
+        current = self._shared_version(tournament_id)
+        with self._lock:
+            entry = self._matrices.pop(tournament_id, None)
+            if entry is None or entry[0] != current:
+                # Macierz nieaktualna (zmiana w innym procesie) - następny odczyt zbuduje ją od nowa
+                self._new_version(tournament_id)
+                return
+            _, matrix = entry
+            for athlete_id, gender, weight_category_id in added:
+                matrix.add(athlete_id, gender, weight_category_id)
+            for athlete_id in removed:
+                matrix.remove(athlete_id)
+            self._matrices[tournament_id] = (self._new_version(tournament_id), matrix)
+
+    def invalidate(self, tournament_ids):
+        with self._lock:
+            for tournament_id in tournament_ids:
+                self._matrices.pop(tournament_id, None)
+                self._new_version(tournament_id)
+
+
+eligibility = EligibilityCache()
+
+
+def for_tournament(tournament_id):
+    return eligibility.get(tournament_id)
+
+
+def registrations_changed(tournament_ids, added=(), removed=()):
+    """
+    Zgłoszenia turniejów się zmieniły. Macierze są aktualizowane dopiero po
+    zatwierdzeniu transakcji - wycofana zmiana nie trafia do pamięci.
+    """
+    tournament_ids = list(tournament_ids)
+    removed = list(removed)
+    rows = list(Athlete.objects.filter(pk__in=added).values_list('id', 'gender', 'weight_category_id')) if added else []
+
+    def apply():
+        for tournament_id in tournament_ids:
+            eligibility.update(tournament_id, added=rows, removed=removed)
+
+    transaction.on_commit(apply)
+
+
+def invalidate(tournament_ids):
+    tournament_ids = list(tournament_ids)
+    transaction.on_commit(lambda: eligibility.invalidate(tournament_ids))
@@ -1,5 +1,8 @@
 from django import forms
-from .models import Round, Athlete, Tournament
+from . import eligibility
+from .divisions import division_label
+from .models import Round, Athlete, Tournament, Pool, Bracket, Registration
+from .pools import validate_pool_athletes
 
 
 class RoundForm(forms.ModelForm):
@@ -20,6 +23,10 @@ class RoundForm(forms.ModelForm):
         athlete2 = kwargs.pop('athlete2', None)
         super().__init__(*args, **kwargs)
 
+        # Zawodnicy usunięci z zachowaniem historii nie walczą w nowych rundach
+        self.fields['athlete1'].queryset = Athlete.objects.filter(deleted_at__isnull=True)
+        self.fields['athlete2'].queryset = Athlete.objects.filter(deleted_at__isnull=True)
+
         # Pole `winner` na początku jest puste
         self.fields['winner'].queryset = Athlete.objects.none()
 
@@ -27,6 +34,25 @@ class RoundForm(forms.ModelForm):
             # Ograniczamy wybór zwycięzcy do wybranych zawodników
             self.fields['winner'].queryset = Athlete.objects.filter(id__in=[athlete1.id, athlete2.id])
 
+        # Po wyborze turnieju oferujemy tylko zawodników, którzy mogą jeszcze walczyć
+        self.eligibility = None
+        tournament_id = self._selected('tournament')
+        if tournament_id is not None:
+            self.eligibility = eligibility.for_tournament(tournament_id)
+            active = Athlete.objects.filter(id__in=self.eligibility.athlete_ids())
+            self.fields['athlete1'].queryset = active
+            self.fields['athlete2'].queryset = active
+            first_id = self._selected('athlete1')
+            if not self.is_bound and first_id is not None:
+                self.fields['athlete2'].queryset = Athlete.objects.filter(id__in=self.eligibility.opponents(first_id))
+
+    def _selected(self, field):
+        value = self.data.get(field) if self.is_bound else self.initial.get(field)
+        try:
+            return int(getattr(value, 'pk', value))
+        except (TypeError, ValueError):
+            return None
+
     def clean(self):
         cleaned_data = super().clean()
         athlete1 = cleaned_data.get("athlete1")
@@ -37,8 +63,75 @@ class RoundForm(forms.ModelForm):
         if winner not in [athlete1, athlete2]:
             raise forms.ValidationError("Winner must be either Athlete 1 or Athlete 2.")
 
-        # Walidacja: zawodnicy muszą być w tej samej kategorii wagowej
-        if athlete1 and athlete2 and athlete1.weight_category != athlete2.weight_category:
-            raise forms.ValidationError("Athletes must belong to the same weight category.")
+        # Walidacja: ta sama płeć i kategoria wagowa, obaj wciąż w turnieju - jedno sprawdzenie w macierzy
+        if athlete1 and athlete2 and self.eligibility is not None:
+            if not self.eligibility.can_fight(athlete1.id, athlete2.id):
+                raise forms.ValidationError(
+                    "Athletes must be still in the tournament and share gender and weight category."
+                )
 
         return cleaned_data
+
+
+class PoolForm(forms.ModelForm):
+    class Meta:
+        model = Pool
+        fields = ['name', 'athletes']
+        labels = {
+            'name': 'Pool name',
+            'athletes': 'Athletes',
+        }
+
+    def __init__(self, *args, **kwargs):
+        tournament = kwargs.pop('tournament')
+        super().__init__(*args, **kwargs)
+        # Do grupy można przypisać tylko zawodników zgłoszonych do turnieju
+        self.fields['athletes'].queryset = tournament.athletes.all()
+
+    def clean_athletes(self):
+        athletes = self.cleaned_data['athletes']
+        validate_pool_athletes(list(athletes))
+        return athletes
+
+
+class PoolResultForm(forms.ModelForm):
+    class Meta:
+        model = Round
+        fields = ['winner', 'athlete1_points', 'athlete2_points']
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fields['winner'].required = True
+        self.fields['winner'].queryset = Athlete.objects.filter(
+            id__in=[self.instance.athlete1_id, self.instance.athlete2_id]
+        )
+
+
+class TournamentCloneForm(forms.ModelForm):
+    reclassify = forms.BooleanField(
+        required=False,
+        label='Reclassify weight categories',
+        help_text='Assign weight categories again from current athlete weights.',
+    )
+
+    class Meta:
+        model = Tournament
+        fields = ['name', 'date']
+        labels = {
+            'name': 'Name',
+            'date': 'Date',
+        }
+
+
+class BracketForm(forms.Form):
+    division_key = forms.ChoiceField(label='Division')
+    kind = forms.ChoiceField(label='Bracket type', choices=Bracket.KINDS)
+
+    def __init__(self, *args, **kwargs):
+        tournament = kwargs.pop('tournament')
+        super().__init__(*args, **kwargs)
+        # Dywizje, w których są zgłoszeni zawodnicy turnieju
+        keys = Registration.objects.filter(tournament=tournament).exclude(division_key='').values_list(
+            'division_key', flat=True,
+        ).distinct().order_by('division_key')
+        self.fields['division_key'].choices = [(key, division_label(key)) for key in keys]
@@ -0,0 +1,99 @@
+from django.db.models import Count, Exists, F, Max, OuterRef, Q, Sum
+from django.utils import timezone
+from django.utils.functional import SimpleLazyObject
+
+from . import http_cache
+from .divisions import division_label
+from .models import Athlete, Registration, Round, Tournament
+
+
+def bump_version(tournament_ids):
+    """Zwiększa wersję turniejów jednym zapytaniem UPDATE i usuwa ich strony publiczne z cache pośredniczących"""
+    Tournament.objects.filter(pk__in=tournament_ids).update(version=F('version') + 1)
+    http_cache.purge_tournaments(tournament_ids)
+
+
+def touch_athlete(athlete):
+    """
+    Unieważnia fragmenty wyników z zawodnikiem (np. po zmianie nazwy).
+
+    Rundy dywizji, w których zawodnik walczy lub jest zgłoszony, dostają nowy
+    `updated_at`, więc zmienia się ich znacznik, a turnieje - nową wersję.
+    """
+    registered = Registration.objects.filter(
+        athlete=athlete, tournament=OuterRef('tournament'), division_key=OuterRef('division_key'),
+    )
+    rounds = Round.objects.filter(Q(athlete1=athlete) | Q(athlete2=athlete) | Exists(registered))
+    bump_version(list(Tournament.objects.filter(
+        Q(pk__in=rounds.values('tournament_id')) | Q(registration__athlete=athlete),
+    ).values_list('pk', flat=True).distinct()))
+    rounds.update(updated_at=timezone.now())
+
+
+def division_stamps(tournament):
+    """
+    Znaczniki dywizji turnieju: {klucz dywizji: napis}.
+
+    Znacznik składa się z liczby i najpóźniejszej zmiany rund oraz z liczby
+    i sumy identyfikatorów zgłoszeń dywizji. Dopóki w dywizji nic się nie
+    dzieje, jej znacznik - a więc i zapamiętany fragment - pozostaje ten sam.
+    """
+    stamps = {}
+    rounds = Round.objects.filter(tournament=tournament).values('division_key').annotate(
+        count=Count('id'), changed=Max('updated_at'),
+    ).order_by()
+    for row in rounds:
+        stamps[row['division_key']] = f"r{row['count']}.{row['changed'].timestamp():.6f}"
+    registrations = Registration.objects.filter(tournament=tournament).values('division_key').annotate(
+        count=Count('id'), athletes=Sum('athlete_id'),
+    ).order_by()
+    for row in registrations:
+        key = row['division_key']
+        if key in stamps:
+            stamps[key] += f"-a{row['count']}.{row['athletes']}"
+        else:
+            # Dywizja bez walk zmienia się tylko razem z turniejem
+            stamps[key] = f"v{tournament.version}"
+    return stamps
+
+
+def division_rounds(tournament, key):
+    """Rundy dywizji jako gotowa projekcja do szablonu - bez obiektów zawodników"""
+    return Round.objects.filter(tournament=tournament, division_key=key).order_by('round_number', 'id').values(
+        'id', 'round_number', 'winner_id',
+        athlete1_name=F('athlete1__display_name'),
+        athlete2_name=F('athlete2__display_name'),
+        winner_name=F('winner__display_name'),
+    )
+
+
+def division_athletes(tournament, key):
+    """Nazwy zawodników dywizji: zgłoszeni oraz uczestnicy jej rund"""
+    athlete_ids = Registration.objects.filter(tournament=tournament, division_key=key).values('athlete_id')
+    rounds = Round.objects.filter(tournament=tournament, division_key=key)
+    return list(Athlete.objects.filter(
+        Q(id__in=athlete_ids) | Q(id__in=rounds.values('athlete1_id')) | Q(id__in=rounds.values('athlete2_id')),
+    ).order_by('id').values_list('display_name', flat=True))
+
+
+def tournament_fragments(tournament):
+    """
+    Dywizje turnieju do szablonu z fragmentami w cache.
+
+    Wszystko jest liczone leniwie: przy trafieniu w zapamiętany fragment
+    turnieju nie pada żadne zapytanie, a przy trafieniu we fragment dywizji
+    nie są pobierane jej rundy ani zawodnicy.
+    """
+    def build():
+        return [
+            {
+                'key': key,
+                'label': division_label(key),
+                'stamp': stamp,
+                'rounds': division_rounds(tournament, key),
+                'athletes': SimpleLazyObject(lambda key=key: division_athletes(tournament, key)),
+            }
+            for key, stamp in sorted(division_stamps(tournament).items())
+        ]
+
+    return SimpleLazyObject(build)
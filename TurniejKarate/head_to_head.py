@@ -0,0 +1,118 @@
+from django.db import transaction
+from django.db.models import F, Q
+
+from .models import HeadToHead, Round, Tournament
+
+
+def _pair(athlete_a_id, athlete_b_id):
+    return (athlete_a_id, athlete_b_id) if athlete_a_id < athlete_b_id else (athlete_b_id, athlete_a_id)
+
+
+def _wins_field(pair, athlete_id):
+    return 'wins_low' if athlete_id == pair[0] else 'wins_high'
+
+
+@transaction.atomic
+def apply_result(round_instance, previous_winner_id):
+    """Aktualizuje indeks bezpośrednich pojedynków o zmianę wyniku jednej rundy"""
+    pair = _pair(round_instance.athlete1_id, round_instance.athlete2_id)
+    winner_id = round_instance.winner_id
+    entry, _ = HeadToHead.objects.select_for_update().get_or_create(athlete_low_id=pair[0], athlete_high_id=pair[1])
+
+    changes = {}
+    if previous_winner_id is None:
+        changes['bouts'] = F('bouts') + 1
+    else:
+        changes[_wins_field(pair, previous_winner_id)] = F(_wins_field(pair, previous_winner_id)) - 1
+    if winner_id is None:
+        changes['bouts'] = F('bouts') - 1
+    else:
+        field = _wins_field(pair, winner_id)
+        changes[field] = changes.get(field, F(field)) + 1
+
+    # Niezapisany turniej może trzymać datę jako tekst lub datetime; porównujemy obiekty date
+    tournament_date = Tournament._meta.get_field('date').to_python(round_instance.tournament.date)
+    if winner_id is not None and (entry.last_date is None or tournament_date >= entry.last_date):
+        changes['last_round_id'] = round_instance.id
+        changes['last_date'] = tournament_date
+
+    HeadToHead.objects.filter(pk=entry.pk).update(**changes)
+
+    if winner_id is None and entry.last_round_id == round_instance.id:
+        # Cofnięto wynik ostatniego spotkania - ustalamy poprzednie
+        previous = _meetings(pair).exclude(pk=round_instance.pk).order_by(
+            '-tournament__date', '-round_number', '-id',
+        ).values_list('id', 'tournament__date').first()
+        HeadToHead.objects.filter(pk=entry.pk).update(
+            last_round_id=previous[0] if previous else None,
+            last_date=previous[1] if previous else None,
+        )
+
+
+def _meetings(pair):
+    return Round.objects.filter(
+        Q(athlete1_id=pair[0], athlete2_id=pair[1]) | Q(athlete1_id=pair[1], athlete2_id=pair[0]),
+        winner__isnull=False,
+    )
+
+
+def lookup(athlete_id, opponent_id):
+    """
+    Historia spotkań dwóch zawodników z perspektywy pierwszego z nich.
+
+    Jeden odczyt po unikalnym indeksie pary, niezależnie od liczby turniejów.
+    """
+    pair = _pair(athlete_id, opponent_id)
+    entry = HeadToHead.objects.filter(athlete_low_id=pair[0], athlete_high_id=pair[1]).first()
+    if entry is None:
+        return {'bouts': 0, 'wins': 0, 'losses': 0, 'last_round': None, 'last_date': None}
+
+    wins = entry.wins_low if athlete_id == pair[0] else entry.wins_high
+    return {
+        'bouts': entry.bouts,
+        'wins': wins,
+        'losses': entry.bouts - wins,
+        'last_round': entry.last_round_id,
+        'last_date': entry.last_date,
+    }
+
+
+def rebuild(athlete_ids=None, batch_size=1000, using='default'):
+    """
+    Odbudowuje indeks z historii rund - całość albo pary wskazanych zawodników.
+
+    Rundy są czytane strumieniowo w kolejności chronologicznej, a indeks
+    zapisywany paczkami `bulk_create`.
+    """
+    with transaction.atomic(using=using):
+        return _rebuild(athlete_ids, batch_size, using)
+
+
+def _rebuild(athlete_ids, batch_size, using):
+    # Walka zawodnika z samym sobą (np. po scaleniu duplikatów) nie jest spotkaniem
+    rounds = Round.objects.using(using).filter(winner__isnull=False).exclude(athlete1=F('athlete2'))
+    entries = HeadToHead.objects.using(using).all()
+    if athlete_ids is not None:
+        rounds = rounds.filter(Q(athlete1_id__in=athlete_ids) | Q(athlete2_id__in=athlete_ids))
+        entries = entries.filter(Q(athlete_low_id__in=athlete_ids) | Q(athlete_high_id__in=athlete_ids))
+    entries.delete()
+
+    index = {}
+    history = rounds.order_by('tournament__date', 'round_number', 'id').values_list(
+        'id', 'athlete1_id', 'athlete2_id', 'winner_id', 'tournament__date',
+    )
+    for round_id, athlete1_id, athlete2_id, winner_id, tournament_date in history.iterator(chunk_size=5000):
+        pair = _pair(athlete1_id, athlete2_id)
+        entry = index.get(pair)
+        if entry is None:
+            entry = index[pair] = HeadToHead(athlete_low_id=pair[0], athlete_high_id=pair[1])
+        entry.bouts += 1
+        if winner_id == pair[0]:
+            entry.wins_low += 1
+        elif winner_id == pair[1]:
+            entry.wins_high += 1
+        entry.last_round_id = round_id
+        entry.last_date = tournament_date
+
+    HeadToHead.objects.using(using).bulk_create(index.values(), batch_size=batch_size)
+    return len(index)
@@ -0,0 +1,80 @@
+from functools import wraps
+
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count, Max, Sum
+from django.utils.cache import patch_cache_control, patch_vary_headers
+from django.views.decorators.http import condition, require_safe
+
+from .models import Tournament
+from .signals import public_cache_purged
+
+LIST_KEY = 'tournaments'
+
+
+def is_public(request):
+    return request.path_info.startswith(settings.PUBLIC_URL_PREFIX)
+
+
+def tournament_key(tournament_id):
+    return f'tournament-{tournament_id}'
+
+
+def purge(keys):
+    """Po zatwierdzeniu transakcji zgłasza klucze Surrogate-Key do usunięcia z cache pośredniczących"""
+    keys = sorted(set(keys))
+    if keys and public_cache_purged.has_listeners():
+        transaction.on_commit(lambda: public_cache_purged.send(sender=None, keys=keys))
+
+
+def purge_tournaments(tournament_ids, listed=False):
+    # Bez odbiorców sygnału identyfikatory (np. leniwe zapytanie) nie są nawet odczytywane
+    if not public_cache_purged.has_listeners():
+        return
+    keys = [tournament_key(tournament_id) for tournament_id in tournament_ids]
+    purge(keys + [LIST_KEY] if listed else keys)
+
+
+def tournament_etag(request, tournament_id):
+    # Wersja rośnie przy każdej zmianie rund, zgłoszeń i samego turnieju - jeden odczyt po kluczu
+    version = Tournament.objects.filter(pk=tournament_id).values_list('version', flat=True).first()
+    return None if version is None else f't{tournament_id}-v{version}'
+
+
+def tournament_list_etag(request):
+    summary = Tournament.objects.aggregate(count=Count('id'), last=Max('id'), versions=Sum('version'))
+    return f"l{summary['count']}-{summary['last'] or 0}-{summary['versions'] or 0}"
+
+
+def add_cache_headers(response, keys):
+    """
+    Przeglądarka trzyma stronę krótko (PUBLIC_CACHE_MAX_AGE), a cache
+    pośredniczący długo (PUBLIC_CACHE_S_MAXAGE), bo zmiany wyników usuwają
+    go po kluczach z nagłówka Surrogate-Key.
+    """
+    patch_cache_control(
+        response, public=True, max_age=settings.PUBLIC_CACHE_MAX_AGE, s_maxage=settings.PUBLIC_CACHE_S_MAXAGE,
+    )
+    patch_vary_headers(response, ['Accept-Encoding'])
+    response['Surrogate-Key'] = ' '.join(keys)
+    return response
+
+
+def public_page(etag_func, keys_func):
+    """
+    Widok strony publicznej: tylko GET/HEAD, ETag z `etag_func` (odpowiedź
+    304 bez renderowania przy If-None-Match) i nagłówki cache z kluczami
+    `keys_func`. Obie funkcje dostają argumenty widoku.
+    """
+    def decorator(view):
+        conditional_view = condition(etag_func=etag_func)(view)
+
+        @wraps(view)
+        @require_safe
+        def wrapped(request, *args, **kwargs):
+            response = conditional_view(request, *args, **kwargs)
+            if response.status_code in (200, 304):
+                add_cache_headers(response, keys_func(request, *args, **kwargs))
+            return response
+        return wrapped
+    return decorator
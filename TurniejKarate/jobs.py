@@ -0,0 +1,80 @@
+import logging
+import traceback
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import BackgroundJob
+
+logger = logging.getLogger(__name__)
+
+# Rodzaj zadania -> funkcja(job); moduły rejestrują się dekoratorem `handler` (importowane w apps.ready)
+HANDLERS = {}
+
+
+def handler(kind):
+    def register(function):
+        HANDLERS[kind] = function
+        return function
+    return register
+
+
+def enqueue(kind, **params):
+    return BackgroundJob.objects.create(kind=kind, params=params)
+
+
+def set_total(job, total):
+    BackgroundJob.objects.filter(pk=job.pk).update(total=total)
+    job.total = total
+
+
+def report_progress(job, done):
+    """Dolicza przetworzone wiersze - jedno UPDATE, bez czytania zadania"""
+    if done:
+        BackgroundJob.objects.filter(pk=job.pk).update(progress=F('progress') + done)
+        job.progress += done
+
+
+def claim_next():
+    """
+    Pobiera najstarsze oczekujące zadanie i oznacza je jako wykonywane.
+    SKIP LOCKED pozwala uruchomić kilka procesów `run_jobs` naraz.
+    """
+    with transaction.atomic():
+        job = BackgroundJob.objects.select_for_update(skip_locked=True).filter(
+            status='QUEUED',
+        ).order_by('id').first()
+        if job is None:
+            return None
+        job.status = 'RUNNING'
+        job.started_at = timezone.now()
+        job.save(update_fields=['status', 'started_at'])
+    return job
+
+
+def run(job):
+    """Wykonuje zadanie poza transakcją - funkcja zadania sama dzieli pracę na krótkie transakcje"""
+    try:
+        HANDLERS[job.kind](job)
+    except Exception:
+        logger.exception("Zadanie %s nie powiodło się", job.pk)
+        job.status = 'FAILED'
+        job.error = traceback.format_exc()
+    else:
+        job.status = 'DONE'
+    job.finished_at = timezone.now()
+    job.save(update_fields=['status', 'error', 'finished_at'])
+    return job
+
+
+def run_pending(limit=None):
+    """Wykonuje oczekujące zadania po kolei; zwraca liczbę wykonanych"""
+    count = 0
+    while limit is None or count < limit:
+        job = claim_next()
+        if job is None:
+            break
+        run(job)
+        count += 1
+    return count
@@ -0,0 +1,144 @@
+from collections import Counter, defaultdict
+
+from django.db import transaction
+from django.db.models import Count, F, Q
+from django.db.models.functions import ExtractYear, Greatest
+
+from .models import Athlete, AthleteSeasonStats, ClubMedals, Placement, Round
+
+MEDALS = {1: 'gold', 2: 'silver', 3: 'bronze'}
+LEADERBOARD_SIZE = 50
+
+
+def _season(tournament_date):
+    # Data turnieju bywa napisem, dopóki obiekt nie zostanie odczytany z bazy
+    return int(str(tournament_date)[:4])
+
+
+def _apply_deltas(model, rows, deltas):
+    """
+    Dodaje przyrosty {klucz wiersza: {pole: zmiana}} zapytaniami UPDATE z F().
+    Wyniki sprzed tabel (bez przebudowy `rebuild_aggregates`) nie zostały doliczone,
+    więc ich korekta nie może zejść poniżej zera.
+    """
+    for lookup, changes in deltas.items():
+        changes = {field: Greatest(F(field) + delta, 0) for field, delta in changes.items() if delta}
+        if not changes:
+            continue
+        row, _ = model.objects.get_or_create(**dict(zip(rows, lookup)))
+        model.objects.filter(pk=row.pk).update(**changes)
+
+
+@transaction.atomic
+def apply_result(round_instance, previous_winner_id):
+    """Aktualizuje bilans sezonu obu zawodników o zmianę wyniku rundy"""
+    season = _season(round_instance.tournament.date)
+    deltas = defaultdict(Counter)
+
+    def count(winner_id, sign):
+        loser_id = round_instance.athlete2_id if winner_id == round_instance.athlete1_id else round_instance.athlete1_id
+        deltas[(winner_id, season)]['wins'] += sign
+        deltas[(winner_id, season)]['bouts'] += sign
+        deltas[(loser_id, season)]['losses'] += sign
+        deltas[(loser_id, season)]['bouts'] += sign
+
+    if previous_winner_id is not None:
+        count(previous_winner_id, -1)
+    if round_instance.winner_id is not None:
+        count(round_instance.winner_id, 1)
+    _apply_deltas(AthleteSeasonStats, ('athlete_id', 'season'), deltas)
+
+
+@transaction.atomic
+def apply_place_changes(tournament, changes):
+    """Przenosi zmiany miejsc medalowych do tabeli medalowej klubów (typ turnieju i wiersz zbiorczy)"""
+    medal_changes = [change for change in changes if change[1] in MEDALS or change[2] in MEDALS]
+    if not medal_changes:
+        return
+    clubs = dict(Athlete.objects.filter(pk__in=[change[0] for change in medal_changes]).values_list('id', 'club_id'))
+
+    deltas = defaultdict(Counter)
+    for athlete_id, previous, place in medal_changes:
+        for tournament_type in (tournament.type, ClubMedals.ALL_TYPES):
+            key = (clubs[athlete_id], tournament_type)
+            if previous in MEDALS:
+                deltas[key][MEDALS[previous]] -= 1
+            if place in MEDALS:
+                deltas[key][MEDALS[place]] += 1
+    _apply_deltas(ClubMedals, ('club_id', 'tournament_type'), deltas)
+
+
+def rebuild_season_stats(athlete_ids=None, using='default'):
+    """Przelicza bilanse sezonów od zera trzema zapytaniami agregującymi po rundach"""
+    with transaction.atomic(using=using):
+        return _rebuild_season_stats(athlete_ids, using)
+
+
+def _rebuild_season_stats(athlete_ids, using):
+    rounds = Round.objects.using(using).filter(winner__isnull=False).exclude(athlete1=F('athlete2')).annotate(
+        season=ExtractYear('tournament__date'),
+    )
+    stats = AthleteSeasonStats.objects.using(using).all()
+    if athlete_ids is not None:
+        rounds = rounds.filter(Q(athlete1_id__in=athlete_ids) | Q(athlete2_id__in=athlete_ids))
+        stats = stats.filter(athlete_id__in=athlete_ids)
+
+    totals = defaultdict(Counter)
+    for field, counter in (('athlete1', 'bouts'), ('athlete2', 'bouts'), ('winner', 'wins')):
+        grouped = rounds.values(field, 'season').annotate(total=Count('id')).values_list(field, 'season', 'total')
+        for athlete_id, season, total in grouped:
+            totals[(athlete_id, season)][counter] += total
+
+    stats.delete()
+    AthleteSeasonStats.objects.using(using).bulk_create([
+        AthleteSeasonStats(
+            athlete_id=athlete_id, season=season,
+            bouts=counts['bouts'], wins=counts['wins'], losses=counts['bouts'] - counts['wins'],
+        )
+        for (athlete_id, season), counts in totals.items()
+        if athlete_ids is None or athlete_id in athlete_ids
+    ], batch_size=1000)
+    return len(totals)
+
+
+def rebuild_club_medals(club_ids=None, using='default'):
+    """Przelicza tabelę medalową klubów (wszystkich albo wskazanych) z miejsc zapisanych w `Placement`"""
+    with transaction.atomic(using=using):
+        return _rebuild_club_medals(club_ids, using)
+
+
+def _rebuild_club_medals(club_ids, using):
+    placements = Placement.objects.using(using).filter(place__in=list(MEDALS))
+    medals = ClubMedals.objects.using(using).all()
+    if club_ids is not None:
+        placements = placements.filter(athlete__club_id__in=club_ids)
+        medals = medals.filter(club_id__in=club_ids)
+    grouped = placements.values(
+        'athlete__club_id', 'tournament__type', 'place',
+    ).annotate(total=Count('id')).values_list('athlete__club_id', 'tournament__type', 'place', 'total')
+
+    totals = defaultdict(Counter)
+    for club_id, tournament_type, place, total in grouped:
+        totals[(club_id, tournament_type)][MEDALS[place]] += total
+        totals[(club_id, ClubMedals.ALL_TYPES)][MEDALS[place]] += total
+
+    medals.delete()
+    ClubMedals.objects.using(using).bulk_create([
+        ClubMedals(club_id=club_id, tournament_type=tournament_type, **counts)
+        for (club_id, tournament_type), counts in totals.items()
+    ], batch_size=1000)
+    return len(totals)
+
+
+def club_medal_table(tournament_type=ClubMedals.ALL_TYPES, limit=LEADERBOARD_SIZE):
+    """Tabela medalowa - jeden odczyt po indeksie (typ, złote, srebrne, brązowe)"""
+    return ClubMedals.objects.filter(tournament_type=tournament_type).select_related('club').order_by(
+        '-gold', '-silver', '-bronze',
+    )[:limit]
+
+
+def season_leaderboard(season, limit=LEADERBOARD_SIZE):
+    """Ranking zawodników sezonu - jeden odczyt po indeksie (sezon, zwycięstwa, porażki)"""
+    return AthleteSeasonStats.objects.filter(season=season).select_related('athlete').order_by(
+        '-wins', 'losses',
+    )[:limit]
@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from TurniejKarate.audit import audit_tournament, count_violations
+from TurniejKarate.models import Tournament
+
+
+class Command(BaseCommand):
+    help = "Sprawdza spójność turnieju (płeć, kategorie, wagi, odpadnięcia, miejsca) przed wręczeniem medali."
+
+    def add_arguments(self, parser):
+        parser.add_argument('tournament_ids', nargs='+', type=int)
+        parser.add_argument(
+            '--strict', action='store_true',
+            help="Zakończ błędem, jeśli znaleziono jakiekolwiek naruszenia.",
+        )
+
+    def handle(self, *args, **options):
+        total = 0
+        for tournament_id in options['tournament_ids']:
+            try:
+                tournament = Tournament.objects.get(id=tournament_id)
+            except Tournament.DoesNotExist:
+                raise CommandError(f"Turniej {tournament_id} nie istnieje.")
+
+            report = audit_tournament(tournament)
+            violations = count_violations(report)
+            total += violations
+
+            self.stdout.write(self.style.MIGRATE_HEADING(f"{tournament} - naruszeń: {violations}"))
+            for section in report:
+                if not section['violations']:
+                    continue
+                self.stdout.write(self.style.WARNING(f"  {section['title']} ({len(section['violations'])}):"))
+                for violation in section['violations']:
+                    self.stdout.write(f"    - {violation['message']}")
+
+        if total:
+            if options['strict']:
+                raise CommandError(f"Znaleziono naruszeń: {total}.")
+        else:
+            self.stdout.write(self.style.SUCCESS("Nie znaleziono naruszeń."))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from TurniejKarate import head_to_head
+
+
+class Command(BaseCommand):
+    help = "Odbudowuje indeks bezpośrednich pojedynków zawodników z historii rund."
+
+    def handle(self, *args, **options):
+        pairs = head_to_head.rebuild()
+        self.stdout.write(self.style.SUCCESS(f"Zapisano par zawodników: {pairs}."))
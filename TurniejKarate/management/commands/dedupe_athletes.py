@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+
+from TurniejKarate.dedupe import DEFAULT_THRESHOLD, find_duplicates, store_candidates
+
+
+class Command(BaseCommand):
+    help = "Wyszukuje prawdopodobne duplikaty zawodników i zapisuje je do przeglądu w panelu administracyjnym."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--threshold', type=float, default=DEFAULT_THRESHOLD,
+            help="Minimalne podobieństwo pary (0-1).",
+        )
+        parser.add_argument(
+            '--dry-run', action='store_true',
+            help="Tylko wypisz pary, nie zapisuj ich.",
+        )
+
+    def handle(self, *args, **options):
+        pairs = find_duplicates(options['threshold'])
+        if options['dry_run']:
+            for keep, duplicate, score in pairs:
+                self.stdout.write(f"{keep} ~ {duplicate}: {score:.2f}")
+        else:
+            store_candidates(pairs)
+        self.stdout.write(self.style.SUCCESS(f"Znaleziono par do przeglądu: {len(pairs)}."))
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+from TurniejKarate.models import Tournament
+from TurniejKarate.snapshot import SnapshotError, export_snapshot, open_snapshot, parse_since
+
+
+class Command(BaseCommand):
+    help = "Eksportuje migawkę turnieju (pełną lub różnicową) do pliku .jsonl.gz."
+
+    def add_arguments(self, parser):
+        parser.add_argument('tournament_id', type=int)
+        parser.add_argument('path')
+        parser.add_argument(
+            '--since',
+            help="Eksport różnicowy: tylko rundy zmienione po tej chwili (ISO 8601, np. z poprzedniego eksportu).",
+        )
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+
+    def handle(self, *args, **options):
+        try:
+            tournament = Tournament.objects.using(options['database']).get(id=options['tournament_id'])
+        except Tournament.DoesNotExist:
+            raise CommandError(f"Turniej {options['tournament_id']} nie istnieje.")
+
+        try:
+            since = parse_since(options['since']) if options['since'] else None
+        except SnapshotError as exc:
+            raise CommandError(str(exc))
+
+        with open_snapshot(options['path'], 'w') as stream:
+            export_snapshot(tournament, stream, since=since, using=options['database'])
+        self.stdout.write(self.style.SUCCESS(f"Zapisano migawkę turnieju {tournament} do {options['path']}."))
@@ -0,0 +1,31 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from TurniejKarate.documents import KINDS, generate
+from TurniejKarate.models import Tournament
+
+
+class Command(BaseCommand):
+    help = ("Generuje listy startowe, identyfikatory lub dyplomy turnieju do jednego archiwum ZIP "
+            "(w puli procesów; przerwane generowanie jest wznawiane).")
+
+    def add_arguments(self, parser):
+        parser.add_argument('tournament_id', type=int)
+        parser.add_argument('kind', choices=KINDS)
+        parser.add_argument('--output', default=None, help="Ścieżka archiwum (domyślnie w DOCUMENTS_ROOT).")
+        parser.add_argument('--workers', type=int, default=None, help="Liczba procesów (domyślnie liczba rdzeni).")
+
+    def handle(self, *args, **options):
+        try:
+            tournament = Tournament.objects.get(id=options['tournament_id'])
+        except Tournament.DoesNotExist:
+            raise CommandError(f"Turniej {options['tournament_id']} nie istnieje.")
+
+        written = 0
+
+        def progress(done):
+            nonlocal written
+            written += done
+
+        path = generate(tournament, options['kind'], path=options['output'], workers=options['workers'],
+                        progress=progress)
+        self.stdout.write(self.style.SUCCESS(f"Zapisano dokumentów: {written} w {path}."))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS
+
+from TurniejKarate.snapshot import SnapshotError, import_snapshot, open_snapshot
+
+
+class Command(BaseCommand):
+    help = "Wczytuje migawkę turnieju (pełną lub różnicową) z pliku .jsonl.gz."
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+
+    def handle(self, *args, **options):
+        try:
+            with open_snapshot(options['path'], 'r') as stream:
+                tournament = import_snapshot(stream, using=options['database'])
+        except (OSError, SnapshotError) as exc:
+            raise CommandError(str(exc))
+        self.stdout.write(self.style.SUCCESS(f"Wczytano turniej {tournament} (id {tournament.id})."))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from TurniejKarate import leaderboards
+
+
+class Command(BaseCommand):
+    help = "Przelicza od zera tabelę medalową klubów i bilanse sezonów zawodników."
+
+    def handle(self, *args, **options):
+        seasons = leaderboards.rebuild_season_stats()
+        clubs = leaderboards.rebuild_club_medals()
+        self.stdout.write(self.style.SUCCESS(
+            f"Zapisano bilansów sezonów: {seasons}, wierszy tabeli medalowej: {clubs}."
+        ))
@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand
+
+from TurniejKarate import ratings
+
+
+class Command(BaseCommand):
+    help = "Przelicza od zera rankingi Elo zawodników po całej historii walk (chronologicznie)."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000)
+
+    def handle(self, *args, **options):
+        athletes = ratings.rebuild_ratings(batch_size=options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(f"Przeliczono rankingi zawodników: {athletes}."))
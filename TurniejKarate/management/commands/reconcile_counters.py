@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from TurniejKarate import counters
+
+
+class Command(BaseCommand):
+    help = "Przelicza od zera liczniki zawodników i walk turniejów (i dywizji) i poprawia te, które się rozjechały."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tournament', type=int, action='append', dest='tournaments',
+                            help="Tylko wskazane turnieje (można podać kilka razy).")
+
+    def handle(self, *args, **options):
+        fixed = counters.reconcile(options['tournaments'])
+        self.stdout.write(self.style.SUCCESS(f"Poprawiono liczników: {fixed}."))
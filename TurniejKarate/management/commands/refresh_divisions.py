@@ -0,0 +1,26 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from TurniejKarate.divisions import refresh_division_keys
+from TurniejKarate.models import Registration, Round
+
+
+class Command(BaseCommand):
+    help = "Przelicza klucze dywizji zgłoszeń i rund po zmianie przedziałów wieku lub grup pasów."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--tournament', type=int, help="Tylko wskazany turniej.")
+
+    def handle(self, *args, **options):
+        registrations = Registration.objects.all()
+        rounds = Round.objects.all()
+        if options['tournament']:
+            registrations = registrations.filter(tournament_id=options['tournament'])
+            rounds = rounds.filter(tournament_id=options['tournament'])
+
+        with transaction.atomic():
+            registration_count = refresh_division_keys(registrations)
+            round_count = refresh_division_keys(rounds, athlete_field='athlete1_id')
+        self.stdout.write(self.style.SUCCESS(
+            f"Przeliczono zgłoszeń: {registration_count}, rund: {round_count}."
+        ))
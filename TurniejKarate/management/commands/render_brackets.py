@@ -0,0 +1,29 @@
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+
+from TurniejKarate.bracket_render import FORMATS, render_all
+from TurniejKarate.models import Tournament
+
+
+class Command(BaseCommand):
+    help = "Rysuje drabinki wszystkich dywizji turnieju (SVG lub PDF) w puli procesów i zapisuje je do katalogu."
+
+    def add_arguments(self, parser):
+        parser.add_argument('tournament_id', type=int)
+        parser.add_argument('output_dir')
+        parser.add_argument('--format', choices=FORMATS, default='pdf')
+        parser.add_argument('--workers', type=int, default=None, help="Liczba procesów (domyślnie liczba rdzeni).")
+
+    def handle(self, *args, **options):
+        try:
+            tournament = Tournament.objects.get(id=options['tournament_id'])
+        except Tournament.DoesNotExist:
+            raise CommandError(f"Turniej {options['tournament_id']} nie istnieje.")
+
+        output_dir = Path(options['output_dir'])
+        output_dir.mkdir(parents=True, exist_ok=True)
+        outputs = render_all(tournament, options['format'], workers=options['workers'])
+        for division_key, output in outputs.items():
+            (output_dir / f"{division_key}.{options['format']}").write_bytes(output)
+        self.stdout.write(self.style.SUCCESS(f"Zapisano drabinek: {len(outputs)} w {output_dir}."))
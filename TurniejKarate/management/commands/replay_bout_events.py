@@ -0,0 +1,30 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from TurniejKarate import bout_log
+
+
+class Command(BaseCommand):
+    help = "Odtwarza stan dywizji z dziennika walk; sprawdza zgodność z tabelami lub zapisuje migawki."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--snapshot', action='store_true',
+            help="Zapisz migawki wszystkich dywizji.",
+        )
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        if options['snapshot']:
+            count = bout_log.snapshot_all()
+            self.stdout.write(self.style.SUCCESS(f"Zapisano migawek dywizji: {count}."))
+            return
+
+        problems = bout_log.check_projections()
+        elapsed = time.monotonic() - started
+        for problem in problems:
+            self.stdout.write(f"  - {problem}")
+        if problems:
+            raise CommandError(f"Znaleziono niezgodności: {len(problems)} ({elapsed:.2f} s).")
+        self.stdout.write(self.style.SUCCESS(f"Dziennik zgodny z tabelami ({elapsed:.2f} s)."))
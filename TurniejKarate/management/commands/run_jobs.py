@@ -0,0 +1,23 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from TurniejKarate import jobs
+
+
+class Command(BaseCommand):
+    help = "Wykonuje zadania w tle (np. usuwanie paczkami) z kolejki BackgroundJob."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--once', action='store_true', help="Wykonaj oczekujące zadania i zakończ.")
+        parser.add_argument('--sleep', type=float, default=5.0, help="Przerwa między sprawdzeniami kolejki (s).")
+
+    def handle(self, *args, **options):
+        while True:
+            done = jobs.run_pending()
+            if done:
+                self.stdout.write(f"Wykonano zadań: {done}.")
+            if options['once']:
+                break
+            time.sleep(options['sleep'])
+        self.stdout.write(self.style.SUCCESS("Kolejka zadań pusta."))
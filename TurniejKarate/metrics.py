@@ -0,0 +1,111 @@
+import threading
+from bisect import bisect_left
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # Ostatni kubełek to +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class MetricsRegistry:
+    """
+    Metryki żądań zbierane w pamięci procesu.
+
+    Każdy proces serwera ma własny rejestr, więc Prometheus powinien odpytywać
+    wszystkie procesy (albo jeden proces przy serwerze wielowątkowym).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.requests = {}
+            self.latency = {}
+            self.query_counts = {}
+            self.query_seconds = {}
+            self.render = {}
+
+    def observe_request(self, view, method, status, duration, queries, query_seconds, render_seconds=None):
+        with self._lock:
+            key = (view, method, str(status))
+            self.requests[key] = self.requests.get(key, 0) + 1
+            self._histogram(self.latency, (view, method), LATENCY_BUCKETS).observe(duration)
+            self._histogram(self.query_counts, (view,), QUERY_COUNT_BUCKETS).observe(queries)
+            self.query_seconds[(view,)] = self.query_seconds.get((view,), 0.0) + query_seconds
+            if render_seconds is not None:
+                self._histogram(self.render, (view,), LATENCY_BUCKETS).observe(render_seconds)
+
+    @staticmethod
+    def _histogram(store, key, buckets):
+        histogram = store.get(key)
+        if histogram is None:
+            histogram = store[key] = Histogram(buckets)
+        return histogram
+
+    def render_prometheus(self):
+        """Metryki w formacie tekstowym Prometheusa"""
+        with self._lock:
+            lines = []
+            self._counter_lines(
+                lines, 'karate_requests_total', "Liczba obsłużonych żądań.",
+                ('view', 'method', 'status'), self.requests,
+            )
+            self._histogram_lines(
+                lines, 'karate_request_duration_seconds', "Czas obsługi żądania.",
+                ('view', 'method'), self.latency,
+            )
+            self._histogram_lines(
+                lines, 'karate_db_queries_per_request', "Liczba zapytań SQL na żądanie.",
+                ('view',), self.query_counts,
+            )
+            self._counter_lines(
+                lines, 'karate_db_query_seconds_total', "Łączny czas zapytań SQL.",
+                ('view',), self.query_seconds,
+            )
+            self._histogram_lines(
+                lines, 'karate_template_render_seconds', "Czas renderowania szablonu.",
+                ('view',), self.render,
+            )
+            return '\n'.join(lines) + '\n'
+
+    @staticmethod
+    def _labels(names, values, extra=()):
+        pairs = list(zip(names, values)) + list(extra)
+        return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+    def _counter_lines(self, lines, name, help_text, label_names, values):
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} counter')
+        for key, value in sorted(values.items()):
+            lines.append(f'{name}{self._labels(label_names, key)} {value}')
+
+    def _histogram_lines(self, lines, name, help_text, label_names, histograms):
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} histogram')
+        for key, histogram in sorted(histograms.items()):
+            cumulative = 0
+            for bound, count in zip(histogram.buckets + ('+Inf',), histogram.counts):
+                cumulative += count
+                lines.append(f'{name}_bucket{self._labels(label_names, key, [("le", bound)])} {cumulative}')
+            lines.append(f'{name}_sum{self._labels(label_names, key)} {histogram.sum}')
+            lines.append(f'{name}_count{self._labels(label_names, key)} {histogram.count}')
+
+
+registry = MetricsRegistry()
@@ -0,0 +1,123 @@
+import json
+import logging
+import logging.handlers
+import time
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.contrib.auth.middleware import AuthenticationMiddleware
+from django.contrib.messages.middleware import MessageMiddleware
+from django.contrib.sessions.middleware import SessionMiddleware
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.middleware.csrf import CsrfViewMiddleware
+
+from .http_cache import is_public
+from .metrics import registry
+
+slow_request_logger = logging.getLogger('TurniejKarate.slow_requests')
+
+MAX_TRACED_QUERIES = 200
+
+
+class QueryRecorder:
+    """Licznik zapytań SQL podpinany przez `connection.execute_wrapper`"""
+
+    def __init__(self, capture_sql):
+        self.count = 0
+        self.duration = 0.0
+        self.capture_sql = capture_sql
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.count += 1
+            self.duration += elapsed
+            if self.capture_sql and len(self.queries) < MAX_TRACED_QUERIES:
+                self.queries.append({'sql': sql, 'seconds': round(elapsed, 6)})
+
+
+class InstrumentationMiddleware:
+    """
+    Zbiera czasy odpowiedzi, liczbę i czas zapytań SQL oraz czas renderowania
+    szablonów dla każdego widoku. Wolne żądania razem z ich zapytaniami mogą być
+    zapisywane do rotowanego pliku (`SLOW_REQUEST_LOG`).
+    """
+
+    def __init__(self, get_response):
+        if not getattr(settings, 'METRICS_ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.slow_threshold = getattr(settings, 'SLOW_REQUEST_THRESHOLD', 0.5)
+        self.trace_slow = bool(getattr(settings, 'SLOW_REQUEST_LOG', None))
+        if self.trace_slow and not slow_request_logger.handlers:
+            handler = logging.handlers.RotatingFileHandler(
+                settings.SLOW_REQUEST_LOG, maxBytes=5 * 1024 * 1024, backupCount=5, encoding='utf-8',
+            )
+            slow_request_logger.addHandler(handler)
+            slow_request_logger.setLevel(logging.INFO)
+            slow_request_logger.propagate = False
+
+    def __call__(self, request):
+        recorder = QueryRecorder(capture_sql=self.trace_slow)
+        start = time.perf_counter()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(recorder))
+            response = self.get_response(request)
+        duration = time.perf_counter() - start
+
+        match = getattr(request, 'resolver_match', None)
+        view = (match.view_name or match._func_path) if match else 'unresolved'
+        # Zapisuje backend szablonów (template_backends.InstrumentedDjangoTemplates)
+        render_seconds = getattr(request, '_metrics_render_seconds', None)
+        registry.observe_request(
+            view, request.method, response.status_code, duration,
+            recorder.count, recorder.duration, render_seconds,
+        )
+
+        if self.trace_slow and duration >= self.slow_threshold:
+            slow_request_logger.info(json.dumps({
+                'path': request.get_full_path(),
+                'method': request.method,
+                'view': view,
+                'status': response.status_code,
+                'seconds': round(duration, 6),
+                'render_seconds': round(render_seconds, 6) if render_seconds is not None else None,
+                'query_count': recorder.count,
+                'query_seconds': round(recorder.duration, 6),
+                'queries': recorder.queries,
+            }))
+        return response
+
+
+def skip_public(middleware_class):
+    """
+    Wersja middleware, która przepuszcza bez zmian żądania do stron
+    publicznych (PUBLIC_URL_PREFIX): bez odczytu sesji i ciasteczek, więc
+    odpowiedź nie dostaje `Vary: Cookie` i może być zapamiętana przez cache.
+    """
+    class PublicSkipping(middleware_class):
+        def __call__(self, request):
+            if is_public(request):
+                return self.get_response(request)
+            return super().__call__(request)
+
+        if hasattr(middleware_class, 'process_view'):
+            def process_view(self, request, view_func, view_args, view_kwargs):
+                if is_public(request):
+                    return None
+                return super().process_view(request, view_func, view_args, view_kwargs)
+
+    PublicSkipping.__name__ = PublicSkipping.__qualname__ = f'PublicSkipping{middleware_class.__name__}'
+    return PublicSkipping
+
+
+PublicSkippingSessionMiddleware = skip_public(SessionMiddleware)
+PublicSkippingCsrfViewMiddleware = skip_public(CsrfViewMiddleware)
+PublicSkippingAuthenticationMiddleware = skip_public(AuthenticationMiddleware)
+PublicSkippingMessageMiddleware = skip_public(MessageMiddleware)
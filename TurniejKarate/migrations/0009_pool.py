@@ -0,0 +1,38 @@
+# Generated by Django 5.2.18 on 2026-10-19 11:58
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('TurniejKarate', '0008_athlete_place'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='round',
+            name='athlete1_points',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='round',
+            name='athlete2_points',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='Pool',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('athletes', models.ManyToManyField(related_name='pools', to='TurniejKarate.athlete')),
+                ('tournament', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='pools', to='TurniejKarate.tournament')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='round',
+            name='pool',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='rounds', to='TurniejKarate.pool'),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.2.18 on 2026-10-19 11:59
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('TurniejKarate', '0009_pool'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='round',
+            name='athlete1_score',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=6, null=True),
+        ),
+        migrations.AddField(
+            model_name='round',
+            name='athlete2_score',
+            field=models.DecimalField(blank=True, decimal_places=2, max_digits=6, null=True),
+        ),
+        migrations.CreateModel(
+            name='JudgeScore',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('judge', models.PositiveSmallIntegerField()),
+                ('score', models.DecimalField(decimal_places=2, max_digits=4)),
+                ('athlete', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='judge_scores', to='TurniejKarate.athlete')),
+                ('round', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='judge_scores', to='TurniejKarate.round')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('round', 'athlete', 'judge'), name='unique_judge_score')],
+            },
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:00
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('TurniejKarate', '0010_judgescore'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DuplicateCandidate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('score', models.FloatField()),
+                ('status', models.CharField(choices=[('PENDING', 'Pending'), ('REJECTED', 'Rejected')], default='PENDING', max_length=10)),
+                ('athlete', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='duplicate_candidates', to='TurniejKarate.athlete')),
+                ('duplicate', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='TurniejKarate.athlete')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('athlete', 'duplicate'), name='unique_duplicate_candidate')],
+            },
+        ),
+    ]
@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:01
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('TurniejKarate', '0011_duplicatecandidate'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='HeadToHead',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bouts', models.PositiveIntegerField(default=0)),
+                ('wins_low', models.PositiveIntegerField(default=0)),
+                ('wins_high', models.PositiveIntegerField(default=0)),
+                ('last_date', models.DateField(blank=True, null=True)),
+                ('athlete_high', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='TurniejKarate.athlete')),
+                ('athlete_low', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='TurniejKarate.athlete')),
+                ('last_round', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='TurniejKarate.round')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('athlete_low', 'athlete_high'), name='unique_head_to_head')],
+            },
+        ),
+    ]
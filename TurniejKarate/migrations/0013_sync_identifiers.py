@@ -0,0 +1,70 @@
+import uuid
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+def fill_uids(apps, schema_editor):
+    for model_name in ('Athlete', 'Tournament', 'Pool', 'Round'):
+        model = apps.get_model('TurniejKarate', model_name)
+        objects = list(model.objects.only('id'))
+        for obj in objects:
+            obj.uid = uuid.uuid4()
+        model.objects.bulk_update(objects, ['uid'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('TurniejKarate', '0012_headtohead'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='athlete',
+            name='uid',
+            field=models.UUIDField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='tournament',
+            name='uid',
+            field=models.UUIDField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='pool',
+            name='uid',
+            field=models.UUIDField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='round',
+            name='uid',
+            field=models.UUIDField(editable=False, null=True),
+        ),
+        migrations.AddField(
+            model_name='round',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+        migrations.RunPython(fill_uids, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='athlete',
+            name='uid',
+            field=models.UUIDField(default=uuid.uuid4, editable=False, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='tournament',
+            name='uid',
+            field=models.UUIDField(default=uuid.uuid4, editable=False, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='pool',
+            name='uid',
+            field=models.UUIDField(default=uuid.uuid4, editable=False, unique=True),
+        ),
+        migrations.AlterField(
+            model_name='round',
+            name='uid',
+            field=models.UUIDField(default=uuid.uuid4, editable=False, unique=True),
+        ),
+    ]
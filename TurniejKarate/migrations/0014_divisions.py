@@ -0,0 +1,88 @@
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+def fill_division_keys(apps, schema_editor):
+    # Przedziały wieku i grupy pasów są jeszcze puste, więc klucz to płeć i kategoria wagowa
+    for model_name, athlete_field in (('Registration', 'athlete'), ('Round', 'athlete1')):
+        model = apps.get_model('TurniejKarate', model_name)
+        objects = list(model.objects.select_related(athlete_field))
+        for obj in objects:
+            athlete = getattr(obj, athlete_field)
+            obj.division_key = f"{athlete.gender}-0-0-{athlete.weight_category_id or 0}"
+        model.objects.bulk_update(objects, ['division_key'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('TurniejKarate', '0013_sync_identifiers'),
+    ]
+
+    operations = [
+        # Automatyczna tabela Tournament.athletes staje się jawnym modelem Registration bez zmiany schematu
+        migrations.SeparateDatabaseAndState(
+            state_operations=[
+                migrations.CreateModel(
+                    name='Registration',
+                    fields=[
+                        ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                        ('athlete', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='TurniejKarate.athlete')),
+                        ('tournament', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='TurniejKarate.tournament')),
+                    ],
+                    options={
+                        'db_table': 'TurniejKarate_tournament_athletes',
+                        'unique_together': {('tournament', 'athlete')},
+                    },
+                ),
+                migrations.AlterField(
+                    model_name='tournament',
+                    name='athletes',
+                    field=models.ManyToManyField(related_name='tournaments', through='TurniejKarate.Registration', to='TurniejKarate.athlete'),
+                ),
+            ],
+        ),
+        # Automatyczna tabela miała klucz `integer` - wyrównujemy do DEFAULT_AUTO_FIELD
+        migrations.AlterField(
+            model_name='registration',
+            name='id',
+            field=models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID'),
+        ),
+        migrations.AddField(
+            model_name='registration',
+            name='division_key',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+        migrations.AddIndex(
+            model_name='registration',
+            index=models.Index(fields=['tournament', 'division_key'], name='registration_division_idx'),
+        ),
+        migrations.AddField(
+            model_name='round',
+            name='division_key',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+        migrations.AddIndex(
+            model_name='round',
+            index=models.Index(fields=['tournament', 'division_key'], name='round_division_idx'),
+        ),
+        migrations.CreateModel(
+            name='AgeBand',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('min_age', models.PositiveIntegerField()),
+                ('max_age', models.PositiveIntegerField()),
+            ],
+        ),
+        migrations.CreateModel(
+            name='BeltGroup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('min_belt', models.PositiveSmallIntegerField(choices=[(1, 'White'), (2, 'Yellow'), (3, 'Green'), (4, 'Blue'), (5, 'Brown'), (6, 'Black')])),
+                ('max_belt', models.PositiveSmallIntegerField(choices=[(1, 'White'), (2, 'Yellow'), (3, 'Green'), (4, 'Blue'), (5, 'Brown'), (6, 'Black')])),
+            ],
+        ),
+        migrations.RunPython(fill_division_keys, migrations.RunPython.noop),
+    ]
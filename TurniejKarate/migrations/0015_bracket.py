@@ -0,0 +1,54 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:16
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('TurniejKarate', '0014_divisions'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Bracket',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('division_key', models.CharField(max_length=64)),
+                ('kind', models.CharField(choices=[('SINGLE', 'Single elimination'), ('REPECHAGE', 'Single elimination with repechage'), ('DOUBLE', 'Double elimination')], default='SINGLE', max_length=10)),
+                ('size', models.PositiveIntegerField()),
+                ('tournament', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='brackets', to='TurniejKarate.tournament')),
+            ],
+        ),
+        migrations.AddField(
+            model_name='round',
+            name='bracket',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='rounds', to='TurniejKarate.bracket'),
+        ),
+        migrations.CreateModel(
+            name='BracketNode',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('section', models.CharField(choices=[('WINNERS', 'Winners bracket'), ('LOSERS', 'Losers bracket'), ('REPECHAGE', 'Repechage'), ('FINAL', 'Grand final')], default='WINNERS', max_length=10)),
+                ('stage', models.PositiveSmallIntegerField()),
+                ('position', models.PositiveIntegerField()),
+                ('pending', models.PositiveSmallIntegerField(default=0)),
+                ('decided', models.BooleanField(default=False)),
+                ('winner_slot', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('loser_slot', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('winner_place', models.PositiveIntegerField(blank=True, null=True)),
+                ('loser_place', models.PositiveIntegerField(blank=True, null=True)),
+                ('athlete1', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='TurniejKarate.athlete')),
+                ('athlete2', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='TurniejKarate.athlete')),
+                ('bracket', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='nodes', to='TurniejKarate.bracket')),
+                ('loser_to', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='TurniejKarate.bracketnode')),
+                ('round', models.OneToOneField(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='bracket_node', to='TurniejKarate.round')),
+                ('winner', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='TurniejKarate.athlete')),
+                ('winner_to', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='TurniejKarate.bracketnode')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('bracket', 'section', 'stage', 'position'), name='unique_bracket_node')],
+            },
+        ),
+    ]
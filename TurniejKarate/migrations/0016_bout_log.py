@@ -0,0 +1,64 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:18
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_events(apps, schema_editor):
+    # Dotychczasowe wyniki trafiają do dziennika jako zapisane, aby odtworzenie zgadzało się z tabelami
+    Round = apps.get_model('TurniejKarate', 'Round')
+    BoutEvent = apps.get_model('TurniejKarate', 'BoutEvent')
+    rounds = Round.objects.filter(winner__isnull=False).order_by('id')
+    BoutEvent.objects.bulk_create([
+        BoutEvent(
+            kind='RECORDED', round_id=round_instance.id, tournament_id=round_instance.tournament_id,
+            division_key=round_instance.division_key, athlete1_id=round_instance.athlete1_id,
+            athlete2_id=round_instance.athlete2_id, winner_id=round_instance.winner_id,
+            eliminating=round_instance.pool_id is None and round_instance.bracket_id is None,
+        )
+        for round_instance in rounds.iterator()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('TurniejKarate', '0015_bracket'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BoutEvent',
+            fields=[
+                ('id', models.BigAutoField(primary_key=True, serialize=False)),
+                ('kind', models.CharField(choices=[('RECORDED', 'Result recorded'), ('CORRECTED', 'Result corrected'), ('WITHDRAWN', 'Result withdrawn')], max_length=10)),
+                ('division_key', models.CharField(blank=True, default='', max_length=64)),
+                ('eliminating', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('athlete1', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='TurniejKarate.athlete')),
+                ('athlete2', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='TurniejKarate.athlete')),
+                ('previous_winner', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='TurniejKarate.athlete')),
+                ('round', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='events', to='TurniejKarate.round')),
+                ('tournament', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='bout_events', to='TurniejKarate.tournament')),
+                ('winner', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='TurniejKarate.athlete')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['tournament', 'division_key', 'id'], name='bout_event_division_idx')],
+            },
+        ),
+        migrations.CreateModel(
+            name='DivisionSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('division_key', models.CharField(blank=True, default='', max_length=64)),
+                ('last_event_id', models.BigIntegerField()),
+                ('state', models.JSONField(default=dict)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('tournament', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='division_snapshots', to='TurniejKarate.tournament')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['tournament', 'division_key', '-last_event_id'], name='division_snapshot_idx')],
+            },
+        ),
+        migrations.RunPython(backfill_events, migrations.RunPython.noop),
+    ]
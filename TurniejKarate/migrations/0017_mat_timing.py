@@ -0,0 +1,55 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:20
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('TurniejKarate', '0016_bout_log'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ThroughputStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('scope', models.CharField(choices=[('MAT', 'Mat'), ('DIVISION', 'Division')], max_length=10)),
+                ('key', models.CharField(max_length=64)),
+                ('bouts_completed', models.PositiveIntegerField(default=0)),
+                ('total_seconds', models.FloatField(default=0)),
+                ('recent_seconds', models.FloatField(blank=True, null=True)),
+                ('first_started_at', models.DateTimeField(blank=True, null=True)),
+                ('last_ended_at', models.DateTimeField(blank=True, null=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='round',
+            name='ended_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='round',
+            name='mat',
+            field=models.PositiveSmallIntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='round',
+            name='started_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='round',
+            index=models.Index(fields=['tournament', 'mat', 'ended_at'], name='round_mat_idx'),
+        ),
+        migrations.AddField(
+            model_name='throughputstats',
+            name='tournament',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='throughput_stats', to='TurniejKarate.tournament'),
+        ),
+        migrations.AddConstraint(
+            model_name='throughputstats',
+            constraint=models.UniqueConstraint(fields=('tournament', 'scope', 'key'), name='unique_throughput_stats'),
+        ),
+    ]
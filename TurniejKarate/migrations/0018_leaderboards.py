@@ -0,0 +1,77 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:23
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def backfill_season_stats(apps, schema_editor):
+    # Miejsca sprzed tej migracji nie są przypisane do turniejów, więc tabela medalowa startuje pusta
+    Round = apps.get_model('TurniejKarate', 'Round')
+    AthleteSeasonStats = apps.get_model('TurniejKarate', 'AthleteSeasonStats')
+    totals = {}
+    rounds = Round.objects.filter(winner__isnull=False).values_list(
+        'athlete1_id', 'athlete2_id', 'winner_id', 'tournament__date',
+    )
+    for athlete1_id, athlete2_id, winner_id, tournament_date in rounds.iterator():
+        for athlete_id in (athlete1_id, athlete2_id):
+            stats = totals.setdefault((athlete_id, tournament_date.year), [0, 0])
+            stats[0] += 1
+            if athlete_id == winner_id:
+                stats[1] += 1
+    AthleteSeasonStats.objects.bulk_create([
+        AthleteSeasonStats(athlete_id=athlete_id, season=season, bouts=bouts, wins=wins, losses=bouts - wins)
+        for (athlete_id, season), (bouts, wins) in totals.items()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('TurniejKarate', '0017_mat_timing'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AthleteSeasonStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('season', models.PositiveSmallIntegerField()),
+                ('bouts', models.PositiveIntegerField(default=0)),
+                ('wins', models.PositiveIntegerField(default=0)),
+                ('losses', models.PositiveIntegerField(default=0)),
+                ('athlete', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='season_stats', to='TurniejKarate.athlete')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['season', '-wins', 'losses'], name='athlete_season_ranking_idx')],
+                'constraints': [models.UniqueConstraint(fields=('athlete', 'season'), name='unique_athlete_season')],
+            },
+        ),
+        migrations.CreateModel(
+            name='ClubMedals',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tournament_type', models.CharField(max_length=20)),
+                ('gold', models.PositiveIntegerField(default=0)),
+                ('silver', models.PositiveIntegerField(default=0)),
+                ('bronze', models.PositiveIntegerField(default=0)),
+                ('club', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='medals', to='TurniejKarate.club')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['tournament_type', '-gold', '-silver', '-bronze'], name='club_medals_ranking_idx')],
+                'constraints': [models.UniqueConstraint(fields=('club', 'tournament_type'), name='unique_club_medals')],
+            },
+        ),
+        migrations.CreateModel(
+            name='Placement',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('place', models.PositiveIntegerField()),
+                ('athlete', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='placements', to='TurniejKarate.athlete')),
+                ('tournament', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='placements', to='TurniejKarate.tournament')),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('tournament', 'athlete'), name='unique_placement')],
+            },
+        ),
+        migrations.RunPython(backfill_season_stats, migrations.RunPython.noop),
+    ]
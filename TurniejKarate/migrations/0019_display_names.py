@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:28
+
+from django.db import migrations, models
+
+
+def fill_display_names(apps, schema_editor):
+    Athlete = apps.get_model('TurniejKarate', 'Athlete')
+    athletes = list(Athlete.objects.all())
+    for athlete in athletes:
+        # Ten sam napis co Athlete.build_display_name
+        athlete.display_name = (
+            f"{athlete.first_name} {athlete.last_name} - {athlete.belt_level.capitalize()} Belt "
+            f"({athlete.karate_style.capitalize()})"
+        )
+    Athlete.objects.bulk_update(athletes, ['display_name'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('TurniejKarate', '0018_leaderboards'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='athlete',
+            name='display_name',
+            field=models.CharField(blank=True, default='', editable=False, max_length=150),
+        ),
+        migrations.AddField(
+            model_name='tournament',
+            name='version',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(fill_display_names, migrations.RunPython.noop),
+    ]
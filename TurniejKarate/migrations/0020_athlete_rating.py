@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:36
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('TurniejKarate', '0019_display_names'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='round',
+            name='rating_delta',
+            field=models.FloatField(blank=True, editable=False, null=True),
+        ),
+        migrations.CreateModel(
+            name='AthleteRating',
+            fields=[
+                ('athlete', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='rating', serialize=False, to='TurniejKarate.athlete')),
+                ('rating', models.FloatField(default=1500.0)),
+                ('bouts', models.PositiveIntegerField(default=0)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['-rating'], name='athlete_rating_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:49
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('TurniejKarate', '0021_background_jobs'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='round',
+            name='scheduled_end',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='round',
+            name='scheduled_start',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='round',
+            index=models.Index(fields=['scheduled_start'], name='round_schedule_idx'),
+        ),
+    ]
@@ -0,0 +1,92 @@
+# Generated by Django 5.2.18 on 2026-10-19 12:53
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import Case, Count, Exists, F, OuterRef, When
+
+
+def fill_counters(apps, schema_editor):
+    # Te same reguły co counters.expected_counts, na modelach historycznych
+    Tournament = apps.get_model('TurniejKarate', 'Tournament')
+    Registration = apps.get_model('TurniejKarate', 'Registration')
+    Round = apps.get_model('TurniejKarate', 'Round')
+    DivisionCounter = apps.get_model('TurniejKarate', 'DivisionCounter')
+
+    counts = {}
+
+    def add(tournament_id, key, index, amount=1):
+        counts.setdefault((tournament_id, key), [0, 0, 0])[index] += amount
+
+    for row in Registration.objects.values('tournament_id', 'division_key').annotate(count=Count('id')).order_by():
+        add(row['tournament_id'], row['division_key'], 0, row['count'])
+        add(row['tournament_id'], row['division_key'], 1, row['count'])
+    eliminated = Round.objects.filter(pool__isnull=True, bracket__isnull=True, winner__isnull=False).annotate(
+        loser=Case(When(winner_id=F('athlete1_id'), then=F('athlete2_id')), default=F('athlete1_id')),
+    ).exclude(Exists(Registration.objects.filter(
+        tournament_id=OuterRef('tournament_id'), athlete_id=OuterRef('loser'),
+    ))).values_list('tournament_id', 'loser', 'division_key').distinct()
+    seen = set()
+    for tournament_id, loser, key in eliminated:
+        if (tournament_id, loser) not in seen:
+            seen.add((tournament_id, loser))
+            add(tournament_id, key, 0)
+    decided = Round.objects.filter(winner__isnull=False).values('tournament_id', 'division_key').annotate(
+        count=Count('id'),
+    ).order_by()
+    for row in decided:
+        add(row['tournament_id'], row['division_key'], 2, row['count'])
+
+    fields = ('athletes_registered', 'athletes_remaining', 'bouts_decided')
+    tournaments = list(Tournament.objects.all())
+    for tournament in tournaments:
+        totals = [0, 0, 0]
+        for (tournament_id, _), values in counts.items():
+            if tournament_id == tournament.pk:
+                totals = [total + value for total, value in zip(totals, values)]
+        for field, value in zip(fields, totals):
+            setattr(tournament, field, value)
+    Tournament.objects.bulk_update(tournaments, fields, batch_size=1000)
+    DivisionCounter.objects.bulk_create([
+        DivisionCounter(tournament_id=tournament_id, division_key=key, **dict(zip(fields, values)))
+        for (tournament_id, key), values in counts.items()
+    ], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('TurniejKarate', '0022_round_schedule'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tournament',
+            name='athletes_registered',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='tournament',
+            name='athletes_remaining',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='tournament',
+            name='bouts_decided',
+            field=models.IntegerField(default=0, editable=False),
+        ),
+        migrations.CreateModel(
+            name='DivisionCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('division_key', models.CharField(blank=True, default='', max_length=64)),
+                ('athletes_registered', models.IntegerField(default=0)),
+                ('athletes_remaining', models.IntegerField(default=0)),
+                ('bouts_decided', models.IntegerField(default=0)),
+                ('tournament', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='division_counters', to='TurniejKarate.tournament')),
+            ],
+            options={
+                'unique_together': {('tournament', 'division_key')},
+            },
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
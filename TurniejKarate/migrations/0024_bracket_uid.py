@@ -0,0 +1,32 @@
+import uuid
+
+from django.db import migrations, models
+
+
+def fill_uids(apps, schema_editor):
+    Bracket = apps.get_model('TurniejKarate', 'Bracket')
+    brackets = list(Bracket.objects.only('id'))
+    for bracket in brackets:
+        bracket.uid = uuid.uuid4()
+    Bracket.objects.bulk_update(brackets, ['uid'], batch_size=1000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('TurniejKarate', '0023_tournament_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='bracket',
+            name='uid',
+            field=models.UUIDField(editable=False, null=True),
+        ),
+        migrations.RunPython(fill_uids, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='bracket',
+            name='uid',
+            field=models.UUIDField(default=uuid.uuid4, editable=False, unique=True),
+        ),
+    ]
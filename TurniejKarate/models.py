@@ -1,6 +1,11 @@
-from django.db import models
+import uuid
+
+from django.db import models, transaction
+from django.db.models import F
 from django.core.exceptions import ValidationError
 
+from .signals import result_changed
+
 
 class WeightCategory(models.Model):
     name = models.CharField(max_length=50, unique=True)
@@ -43,6 +48,8 @@ class Athlete(models.Model):
         ('O', 'Other'),
     ]
 
+    DISPLAY_NAME_FIELDS = ('first_name', 'last_name', 'belt_level', 'karate_style')
+
     first_name = models.CharField(max_length=50)
     last_name = models.CharField(max_length=50)
     age = models.PositiveIntegerField()
@@ -53,6 +60,27 @@ class Athlete(models.Model):
     club = models.ForeignKey(Club, on_delete=models.CASCADE)
     weight_category = models.ForeignKey(WeightCategory, on_delete=models.SET_NULL, null=True, blank=True)
     place = models.PositiveIntegerField(null=True, blank=True)  # Pozycja w turnieju
+    uid = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)  # Stały identyfikator do synchronizacji baz
+    # Gotowy napis do list i tabel wyników, utrzymywany przy zapisie zawodnika
+    display_name = models.CharField(max_length=150, blank=True, default='', editable=False)
+    # Zawodnik z historią walk nie jest usuwany, tylko znika z list i formularzy
+    deleted_at = models.DateTimeField(null=True, blank=True, editable=False)
+
+    def build_display_name(self):
+        return f"{self.first_name} {self.last_name} - {self.belt_level.capitalize()} Belt ({self.karate_style.capitalize()})"
+
+    def save(self, *args, **kwargs):
+        previous = self.display_name
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None or set(update_fields) & set(self.DISPLAY_NAME_FIELDS):
+            self.display_name = self.build_display_name()
+            if update_fields is not None:
+                kwargs['update_fields'] = [*update_fields, 'display_name']
+        super().save(*args, **kwargs)
+        if previous and previous != self.display_name:
+            # Zmiana nazwy unieważnia zapamiętane fragmenty wyników z tym zawodnikiem
+            from .fragments import touch_athlete
+            touch_athlete(self)
 
     def clean(self):
         # Walidacja, by waga zawodnika była zgodna z kategorią wagową
@@ -64,8 +92,42 @@ class Athlete(models.Model):
             )
         super().clean()
 
+    @property
+    def club_name(self):
+        # Nazwa z pamięci podręcznej procesu zamiast zapytania dla każdego wiersza
+        from .reference import reference_data
+        club = reference_data.club(self.club_id)
+        return club.name if club else ''
+
+    @property
+    def weight_category_name(self):
+        from .reference import reference_data
+        category = reference_data.category(self.weight_category_id)
+        return str(category) if category else ''
+
     def __str__(self):
-        return f"{self.first_name} {self.last_name} - {self.belt_level.capitalize()} Belt ({self.karate_style.capitalize()})"
+        return self.build_display_name()
+
+
+class AgeBand(models.Model):
+    name = models.CharField(max_length=50, unique=True)
+    min_age = models.PositiveIntegerField()
+    max_age = models.PositiveIntegerField()
+
+    def __str__(self):
+        return f"{self.name} ({self.min_age}-{self.max_age})"
+
+
+class BeltGroup(models.Model):
+    # Numeracja pasów od białego (1) do czarnego (6), zgodnie z kolejnością Athlete.BELT_LEVELS
+    BELT_RANKS = [(rank, label) for rank, (_, label) in enumerate(Athlete.BELT_LEVELS, start=1)]
+
+    name = models.CharField(max_length=50, unique=True)
+    min_belt = models.PositiveSmallIntegerField(choices=BELT_RANKS)
+    max_belt = models.PositiveSmallIntegerField(choices=BELT_RANKS)
+
+    def __str__(self):
+        return f"{self.name} ({self.get_min_belt_display()} - {self.get_max_belt_display()})"
 
 
 class Tournament(models.Model):
@@ -78,18 +140,131 @@ class Tournament(models.Model):
     name = models.CharField(max_length=100)
     type = models.CharField(max_length=20, choices=TOURNAMENT_TYPES, default='CLUB')
     date = models.DateField()
-    athletes = models.ManyToManyField(Athlete, related_name='tournaments')
+    athletes = models.ManyToManyField(Athlete, through='Registration', related_name='tournaments')
+    uid = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
+    # Zwiększana przy każdej zmianie rund i zgłoszeń - składnik kluczy cache wyników
+    version = models.PositiveIntegerField(default=0, editable=False)
+    # Liczniki utrzymywane przy zgłoszeniach i wynikach (counters.py), więc ich odczyt nie wymaga COUNT.
+    # IntegerField: chwilowy dryf (naprawiany przez reconcile_counters) nie blokuje zapisu wyniku
+    athletes_registered = models.IntegerField(default=0, editable=False)  # Zgłoszeni, łącznie z wyeliminowanymi
+    athletes_remaining = models.IntegerField(default=0, editable=False)  # Wciąż w turnieju
+    bouts_decided = models.IntegerField(default=0, editable=False)  # Rundy z wynikiem
+
+    # Kolumny zmieniane wyłącznie przez UPDATE z F() - zwykły zapis nie może nadpisać ich wartościami z pamięci
+    MANAGED_FIELDS = ('version', 'athletes_registered', 'athletes_remaining', 'bouts_decided')
+
+    def save(self, *args, **kwargs):
+        if self._state.adding or kwargs.get('force_insert'):
+            super().save(*args, **kwargs)
+            return
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None:
+            update_fields = [field.name for field in self._meta.concrete_fields if not field.primary_key]
+        kwargs['update_fields'] = [name for name in update_fields if name not in self.MANAGED_FIELDS]
+        if kwargs['update_fields']:
+            # Zmiana nazwy lub daty też zmienia strony turnieju; wersja tylko rośnie, więc ETag się nie powtórzy
+            Tournament._base_manager.using(self._state.db).filter(pk=self.pk).update(version=F('version') + 1)
+            super().save(*args, **kwargs)
+        self.refresh_from_db(fields=self.MANAGED_FIELDS)
 
     def __str__(self):
         return f"{self.name} ({self.get_type_display()})"
 
 
+class Registration(models.Model):
+    tournament = models.ForeignKey(Tournament, on_delete=models.CASCADE)
+    athlete = models.ForeignKey(Athlete, on_delete=models.CASCADE)
+    # Płeć, przedział wieku, grupa pasów i kategoria wagowa - liczone przy zgłoszeniu i ważeniu
+    division_key = models.CharField(max_length=64, blank=True, default='')
+
+    class Meta:
+        db_table = 'TurniejKarate_tournament_athletes'  # Tabela dawnego automatycznego ManyToMany
+        unique_together = [('tournament', 'athlete')]
+        indexes = [
+            models.Index(fields=['tournament', 'division_key'], name='registration_division_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.tournament_id} - {self.athlete_id} ({self.division_key})"
+
+
+class DivisionCounter(models.Model):
+    """Liczniki turnieju w podziale na dywizje (klucz jak w `Registration.division_key`)"""
+    tournament = models.ForeignKey(Tournament, on_delete=models.CASCADE, related_name='division_counters')
+    division_key = models.CharField(max_length=64, blank=True, default='')
+    athletes_registered = models.IntegerField(default=0)
+    athletes_remaining = models.IntegerField(default=0)
+    bouts_decided = models.IntegerField(default=0)
+
+    class Meta:
+        unique_together = [('tournament', 'division_key')]
+
+    def __str__(self):
+        return f"{self.tournament_id} {self.division_key}: {self.athletes_remaining}/{self.athletes_registered}"
+
+
+class Pool(models.Model):
+    tournament = models.ForeignKey(Tournament, on_delete=models.CASCADE, related_name='pools')
+    name = models.CharField(max_length=100)
+    athletes = models.ManyToManyField(Athlete, related_name='pools')
+    uid = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
+
+    def __str__(self):
+        return f"{self.name} ({self.tournament.name})"
+
+
+class Bracket(models.Model):
+    KINDS = [
+        ('SINGLE', 'Single elimination'),
+        ('REPECHAGE', 'Single elimination with repechage'),
+        ('DOUBLE', 'Double elimination'),
+    ]
+
+    tournament = models.ForeignKey(Tournament, on_delete=models.CASCADE, related_name='brackets')
+    division_key = models.CharField(max_length=64)
+    kind = models.CharField(max_length=10, choices=KINDS, default='SINGLE')
+    size = models.PositiveIntegerField()  # Liczba miejsc w pierwszej rundzie (potęga dwójki)
+    uid = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
+
+    def __str__(self):
+        return f"{self.tournament.name} - {self.division_key} ({self.get_kind_display()})"
+
+
 class Round(models.Model):
     tournament = models.ForeignKey(Tournament, on_delete=models.CASCADE, related_name='rounds')
     athlete1 = models.ForeignKey('Athlete', on_delete=models.CASCADE, related_name='rounds_as_athlete1')
     athlete2 = models.ForeignKey('Athlete', on_delete=models.CASCADE, related_name='rounds_as_athlete2')
     winner = models.ForeignKey('Athlete', on_delete=models.SET_NULL, null=True, blank=True, related_name='rounds_won')
     round_number = models.PositiveIntegerField()
+    pool = models.ForeignKey(Pool, on_delete=models.CASCADE, null=True, blank=True, related_name='rounds')  # Walka w grupie (system każdy z każdym)
+    bracket = models.ForeignKey(Bracket, on_delete=models.CASCADE, null=True, blank=True, related_name='rounds')  # Walka w drabince (miejsca ustala drabinka)
+    athlete1_points = models.PositiveIntegerField(default=0)
+    athlete2_points = models.PositiveIntegerField(default=0)
+    athlete1_score = models.DecimalField(max_digits=6, decimal_places=2, null=True, blank=True)  # Wynik kata od sędziów
+    athlete2_score = models.DecimalField(max_digits=6, decimal_places=2, null=True, blank=True)
+    uid = models.UUIDField(default=uuid.uuid4, unique=True, editable=False)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)  # Do synchronizacji zmienionych rund
+    division_key = models.CharField(max_length=64, blank=True, default='')  # Kopia klucza ze zgłoszenia zawodnika 1
+    mat = models.PositiveSmallIntegerField(null=True, blank=True)  # Numer maty
+    started_at = models.DateTimeField(null=True, blank=True)
+    ended_at = models.DateTimeField(null=True, blank=True)
+    scheduled_start = models.DateTimeField(null=True, blank=True)  # Planowany przedział walki na macie
+    scheduled_end = models.DateTimeField(null=True, blank=True)
+    rating_delta = models.FloatField(null=True, blank=True, editable=False)  # Punkty rankingu przeniesione na zwycięzcę
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['tournament', 'division_key'], name='round_division_idx'),
+            models.Index(fields=['tournament', 'mat', 'ended_at'], name='round_mat_idx'),
+            models.Index(fields=['scheduled_start'], name='round_schedule_idx'),
+        ]
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # Zapamiętujemy zwycięzcę z bazy, aby rozpoznać nowy wynik lub jego korektę
+        instance._loaded_winner_id = instance.__dict__.get('winner_id')
+        return instance
 
     def set_winner(self, winner_athlete):
         """Ustaw zwycięzcę rundy"""
@@ -98,21 +273,58 @@ class Round(models.Model):
         self.winner = winner_athlete
         self.save()
 
+    @transaction.atomic
     def save(self, *args, **kwargs):
-        if self.winner:
-            # Przegrany zawodnik odpada z turnieju
-            loser = self.athlete2 if self.winner == self.athlete1 else self.athlete1
-            self.tournament.athletes.remove(loser)
+        previous_winner_id = getattr(self, '_loaded_winner_id', None)
 
-            # Przypisanie miejsca przegranemu
-            total_athletes = self.tournament.athletes.count() + 1  # +1 bo przegrany jest usuwany
-            loser.place = total_athletes
-            loser.save()
+        if not self.division_key:
+            from .divisions import division_key_for_round
+            self.division_key = division_key_for_round(self)
+
+        # W grupie i w drabince przegrany może walczyć dalej, więc nie odpada z turnieju
+        places = {}
+        if self.pool_id is None and self.bracket_id is None and self.winner_id != previous_winner_id:
+            from . import counters
+            if previous_winner_id is not None:
+                # Korekta wyniku: poprzednio przegrany wraca do turnieju
+                previous_loser = self.athlete1 if previous_winner_id == self.athlete2_id else self.athlete2
+                with counters.elimination():
+                    self.tournament.athletes.add(previous_loser)
+                places[previous_loser.id] = None
+                places[previous_winner_id] = None  # Poprzedni zwycięzca traci ewentualne pierwsze miejsce
+
+            if self.winner:
+                # Przegrany zawodnik odpada z turnieju
+                loser = self.athlete2 if self.winner == self.athlete1 else self.athlete1
+                with counters.elimination():
+                    self.tournament.athletes.remove(loser)
+
+                # Przypisanie miejsca przegranemu - z licznika dywizji zamiast COUNT zgłoszeń;
+                # miejsca są liczone w obrębie dywizji, +1 bo przegrany jest już usunięty
+                total_athletes = counters.remaining(self.tournament_id, self.division_key) + 1
+                places[loser.id] = total_athletes
+                if total_athletes == 2:
+                    # Przegrany finału zajmuje drugie miejsce, więc zwycięzca wygrał turniej
+                    places[self.winner_id] = 1
+
+        if places:
+            from .placements import set_places
+            set_places(self.tournament, places)
+            for athlete in (self.athlete1, self.athlete2):
+                if athlete.id in places:
+                    athlete.place = places[athlete.id]
 
         super().save(*args, **kwargs)
+        self._loaded_winner_id = self.winner_id
 
+        if self.winner_id != previous_winner_id:
+            result_changed.send(sender=Round, round=self, previous_winner_id=previous_winner_id)
 
     def clean(self):
+        # Brak zawodnika zgłasza już walidacja pola formularza
+        if self.athlete1_id is None or self.athlete2_id is None:
+            return
+
         # Sprawdzenie, czy zawodnicy są tej samej płci
         if self.athlete1.gender != self.athlete2.gender:
             raise ValidationError(
@@ -127,6 +339,236 @@ class Round(models.Model):
         return f"Round {self.round_number} - {self.athlete1} vs {self.athlete2} (Winner: {winner})"
 
 
+class BracketNode(models.Model):
+    SECTIONS = [
+        ('WINNERS', 'Winners bracket'),
+        ('LOSERS', 'Losers bracket'),
+        ('REPECHAGE', 'Repechage'),
+        ('FINAL', 'Grand final'),
+    ]
+
+    bracket = models.ForeignKey(Bracket, on_delete=models.CASCADE, related_name='nodes')
+    section = models.CharField(max_length=10, choices=SECTIONS, default='WINNERS')
+    stage = models.PositiveSmallIntegerField()  # Runda w obrębie sekcji, od 1
+    position = models.PositiveIntegerField()
+    athlete1 = models.ForeignKey(Athlete, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    athlete2 = models.ForeignKey(Athlete, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    pending = models.PositiveSmallIntegerField(default=0)  # Ile pozycji czeka jeszcze na rozstrzygnięcie wcześniejszej walki
+    winner = models.ForeignKey(Athlete, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    decided = models.BooleanField(default=False)  # Walka rozstrzygnięta (także walkowerem lub wolnym losem)
+    round = models.OneToOneField(Round, on_delete=models.SET_NULL, null=True, blank=True, related_name='bracket_node')
+    # Dokąd trafia zwycięzca i przegrany; bez celu zawodnik kończy z miejscem winner_place / loser_place
+    winner_to = models.ForeignKey('self', on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    winner_slot = models.PositiveSmallIntegerField(null=True, blank=True)
+    loser_to = models.ForeignKey('self', on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    loser_slot = models.PositiveSmallIntegerField(null=True, blank=True)
+    winner_place = models.PositiveIntegerField(null=True, blank=True)
+    loser_place = models.PositiveIntegerField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['bracket', 'section', 'stage', 'position'], name='unique_bracket_node'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_section_display()} {self.stage}.{self.position} ({self.bracket_id})"
+
+
+class JudgeScore(models.Model):
+    round = models.ForeignKey(Round, on_delete=models.CASCADE, related_name='judge_scores')
+    athlete = models.ForeignKey(Athlete, on_delete=models.CASCADE, related_name='judge_scores')
+    judge = models.PositiveSmallIntegerField()  # Numer sędziego na macie
+    score = models.DecimalField(max_digits=4, decimal_places=2)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['round', 'athlete', 'judge'], name='unique_judge_score'),
+        ]
+
+    def __str__(self):
+        return f"Round {self.round_id} - Judge {self.judge}: {self.athlete_id} ({self.score})"
+
+
+class DuplicateCandidate(models.Model):
+    STATUSES = [
+        ('PENDING', 'Pending'),
+        ('REJECTED', 'Rejected'),
+    ]
+
+    athlete = models.ForeignKey(Athlete, on_delete=models.CASCADE, related_name='duplicate_candidates')  # Rekord zachowywany
+    duplicate = models.ForeignKey(Athlete, on_delete=models.CASCADE, related_name='+')  # Rekord do scalenia
+    score = models.FloatField()
+    status = models.CharField(max_length=10, choices=STATUSES, default='PENDING')
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['athlete', 'duplicate'], name='unique_duplicate_candidate'),
+        ]
+
+    def __str__(self):
+        return f"{self.athlete_id} ~ {self.duplicate_id} ({self.score:.2f})"
+
+
+class HeadToHead(models.Model):
+    # Para zawodników zapisana bez kolejności: athlete_low ma mniejsze id
+    athlete_low = models.ForeignKey(Athlete, on_delete=models.CASCADE, related_name='+')
+    athlete_high = models.ForeignKey(Athlete, on_delete=models.CASCADE, related_name='+')
+    bouts = models.PositiveIntegerField(default=0)
+    wins_low = models.PositiveIntegerField(default=0)
+    wins_high = models.PositiveIntegerField(default=0)
+    last_round = models.ForeignKey(Round, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    last_date = models.DateField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['athlete_low', 'athlete_high'], name='unique_head_to_head'),
+        ]
+
+    def __str__(self):
+        return f"{self.athlete_low_id} vs {self.athlete_high_id}: {self.wins_low}-{self.wins_high}"
+
+
+class BoutEvent(models.Model):
+    KINDS = [
+        ('RECORDED', 'Result recorded'),
+        ('CORRECTED', 'Result corrected'),
+        ('WITHDRAWN', 'Result withdrawn'),
+    ]
+
+    # Dziennik tylko do dopisywania - kolejność zdarzeń wyznacza id
+    id = models.BigAutoField(primary_key=True)
+    kind = models.CharField(max_length=10, choices=KINDS)
+    round = models.ForeignKey(Round, on_delete=models.SET_NULL, null=True, blank=True, related_name='events')
+    tournament = models.ForeignKey(Tournament, on_delete=models.CASCADE, related_name='bout_events')
+    division_key = models.CharField(max_length=64, blank=True, default='')
+    athlete1 = models.ForeignKey(Athlete, on_delete=models.SET_NULL, null=True, related_name='+')
+    athlete2 = models.ForeignKey(Athlete, on_delete=models.SET_NULL, null=True, related_name='+')
+    winner = models.ForeignKey(Athlete, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    previous_winner = models.ForeignKey(Athlete, on_delete=models.SET_NULL, null=True, blank=True, related_name='+')
+    eliminating = models.BooleanField(default=True)  # Przegrany odpada z turnieju (walka pucharowa)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['tournament', 'division_key', 'id'], name='bout_event_division_idx'),
+        ]
+
+    def __str__(self):
+        return f"#{self.id} {self.get_kind_display()} - round {self.round_id}"
+
+
+class DivisionSnapshot(models.Model):
+    tournament = models.ForeignKey(Tournament, on_delete=models.CASCADE, related_name='division_snapshots')
+    division_key = models.CharField(max_length=64, blank=True, default='')
+    last_event_id = models.BigIntegerField()  # Ostatnie zdarzenie uwzględnione w stanie
+    state = models.JSONField(default=dict)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['tournament', 'division_key', '-last_event_id'], name='division_snapshot_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.tournament_id} - {self.division_key} @ {self.last_event_id}"
+
+
+class ThroughputStats(models.Model):
+    SCOPES = [
+        ('MAT', 'Mat'),
+        ('DIVISION', 'Division'),
+    ]
+
+    # Agregaty aktualizowane przyrostowo po każdej zakończonej walce
+    tournament = models.ForeignKey(Tournament, on_delete=models.CASCADE, related_name='throughput_stats')
+    scope = models.CharField(max_length=10, choices=SCOPES)
+    key = models.CharField(max_length=64)  # Numer maty albo klucz dywizji
+    bouts_completed = models.PositiveIntegerField(default=0)
+    total_seconds = models.FloatField(default=0)
+    recent_seconds = models.FloatField(null=True, blank=True)  # Średnia wykładnicza czasu walki
+    first_started_at = models.DateTimeField(null=True, blank=True)
+    last_ended_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['tournament', 'scope', 'key'], name='unique_throughput_stats'),
+        ]
+
+    def __str__(self):
+        return f"{self.tournament_id} {self.get_scope_display()} {self.key}: {self.bouts_completed}"
+
+
+class Placement(models.Model):
+    # Miejsce zawodnika w konkretnym turnieju (Athlete.place przechowuje tylko ostatnie)
+    tournament = models.ForeignKey(Tournament, on_delete=models.CASCADE, related_name='placements')
+    athlete = models.ForeignKey(Athlete, on_delete=models.CASCADE, related_name='placements')
+    place = models.PositiveIntegerField()
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['tournament', 'athlete'], name='unique_placement'),
+        ]
+
+    def __str__(self):
+        return f"{self.tournament_id} - {self.athlete_id}: {self.place}"
+
+
+class ClubMedals(models.Model):
+    ALL_TYPES = 'ALL'  # Wiersz zbiorczy dla wszystkich typów turniejów
+
+    club = models.ForeignKey(Club, on_delete=models.CASCADE, related_name='medals')
+    tournament_type = models.CharField(max_length=20)
+    gold = models.PositiveIntegerField(default=0)
+    silver = models.PositiveIntegerField(default=0)
+    bronze = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['club', 'tournament_type'], name='unique_club_medals'),
+        ]
+        indexes = [
+            models.Index(fields=['tournament_type', '-gold', '-silver', '-bronze'], name='club_medals_ranking_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.club_id} ({self.tournament_type}): {self.gold}/{self.silver}/{self.bronze}"
+
+
+class AthleteSeasonStats(models.Model):
+    athlete = models.ForeignKey(Athlete, on_delete=models.CASCADE, related_name='season_stats')
+    season = models.PositiveSmallIntegerField()  # Rok turnieju
+    bouts = models.PositiveIntegerField(default=0)
+    wins = models.PositiveIntegerField(default=0)
+    losses = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['athlete', 'season'], name='unique_athlete_season'),
+        ]
+        indexes = [
+            models.Index(fields=['season', '-wins', 'losses'], name='athlete_season_ranking_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.athlete_id} {self.season}: {self.wins}-{self.losses}"
+
+
+class AthleteRating(models.Model):
+    INITIAL_RATING = 1500.0
+
+    athlete = models.OneToOneField(Athlete, on_delete=models.CASCADE, primary_key=True, related_name='rating')
+    rating = models.FloatField(default=INITIAL_RATING)  # Ranking Elo
+    bouts = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['-rating'], name='athlete_rating_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.athlete_id}: {self.rating:.0f}"
+
+
 class Coach(models.Model):
     first_name = models.CharField(max_length=50)
     last_name = models.CharField(max_length=50)
@@ -134,3 +576,31 @@ class Coach(models.Model):
 
     def __str__(self):
         return f"{self.first_name} {self.last_name} - {self.club.name}"
+
+
+class BackgroundJob(models.Model):
+    """Długie zadanie wykonywane poza żądaniem przez `manage.py run_jobs`"""
+    STATUSES = [
+        ('QUEUED', 'Queued'),
+        ('RUNNING', 'Running'),
+        ('DONE', 'Done'),
+        ('FAILED', 'Failed'),
+    ]
+
+    kind = models.CharField(max_length=30)
+    params = models.JSONField(default=dict)
+    status = models.CharField(max_length=10, choices=STATUSES, default='QUEUED')
+    progress = models.PositiveIntegerField(default=0)  # Przetworzone wiersze
+    total = models.PositiveIntegerField(null=True, blank=True)  # Szacowana liczba wierszy
+    error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'id'], name='background_job_queue_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.kind} #{self.pk} ({self.get_status_display()})"
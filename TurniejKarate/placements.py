@@ -0,0 +1,46 @@
+from django.db import transaction
+
+from .models import Athlete, Placement, Tournament
+from .signals import places_changed
+
+
+@transaction.atomic
+def set_places(tournament, places):
+    """
+    Ustawia miejsca zawodników w turnieju ({id zawodnika: miejsce lub None}).
+
+    Miejsca trafiają do tabeli `Placement` (per turniej) i do `Athlete.place`,
+    a rzeczywiste zmiany są rozsyłane sygnałem `places_changed`.
+    """
+    if not isinstance(tournament, Tournament):
+        tournament = Tournament.objects.get(pk=tournament)
+    previous = dict(
+        Placement.objects.select_for_update().filter(
+            tournament=tournament, athlete_id__in=list(places),
+        ).values_list('athlete_id', 'place')
+    )
+    changes = [
+        (athlete_id, previous.get(athlete_id), place)
+        for athlete_id, place in places.items()
+        if previous.get(athlete_id) != place
+    ]
+    # Athlete.place ustawiamy zawsze - starsze dane mogą nie mieć wiersza Placement
+    by_place = {}
+    for athlete_id, place in places.items():
+        by_place.setdefault(place, []).append(athlete_id)
+    for place, athlete_ids in by_place.items():
+        Athlete.objects.filter(pk__in=athlete_ids).update(place=place)
+    if not changes:
+        return []
+
+    removed = [athlete_id for athlete_id, _, place in changes if place is None]
+    Placement.objects.filter(tournament=tournament, athlete_id__in=removed).delete()
+    Placement.objects.bulk_create(
+        [Placement(tournament=tournament, athlete_id=athlete_id, place=place) for athlete_id, _, place in changes if place],
+        update_conflicts=True,
+        unique_fields=['tournament', 'athlete'],
+        update_fields=['place'],
+    )
+
+    places_changed.send(sender=Placement, tournament=tournament, changes=changes)
+    return changes
@@ -0,0 +1,170 @@
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Count, IntegerField, OuterRef, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from .divisions import division_key
+from .fragments import bump_version
+from .models import Pool, Registration, Round
+
+POOL_MIN_SIZE = 3
+POOL_MAX_SIZE = 5
+
+
+def circle_schedule(athletes):
+    """
+    Układa terminarz "każdy z każdym" metodą kołową.
+
+    Zwraca listę kolejek, każda to lista par. Przy nieparzystej liczbie
+    zawodników jeden z nich w każdej kolejce pauzuje.
+    """
+    slots = list(athletes)
+    if len(slots) % 2:
+        slots.append(None)
+
+    schedule = []
+    for _ in range(len(slots) - 1):
+        half = len(slots) // 2
+        pairs = [
+            (slots[i], slots[-1 - i])
+            for i in range(half)
+            if slots[i] is not None and slots[-1 - i] is not None
+        ]
+        schedule.append(pairs)
+        # Pierwszy zawodnik stoi w miejscu, pozostali obracają się o jedną pozycję
+        slots = [slots[0], slots[-1]] + slots[1:-1]
+    return schedule
+
+
+def validate_pool_athletes(athletes):
+    if not POOL_MIN_SIZE <= len(athletes) <= POOL_MAX_SIZE:
+        raise ValidationError(f"Grupa musi liczyć od {POOL_MIN_SIZE} do {POOL_MAX_SIZE} zawodników.")
+    if len({athlete.gender for athlete in athletes}) > 1:
+        raise ValidationError("W grupie mogą walczyć tylko zawodnicy tej samej płci.")
+    if len({athlete.weight_category_id for athlete in athletes}) > 1:
+        raise ValidationError("Zawodnicy w grupie muszą być w tej samej kategorii wagowej.")
+
+
+@transaction.atomic
+def create_pool(tournament, name, athletes):
+    """Tworzy grupę wraz z pełnym terminarzem walk zapisanym jednym `bulk_create`"""
+    athletes = list(athletes)
+    validate_pool_athletes(athletes)
+
+    pool = Pool.objects.create(tournament=tournament, name=name)
+    pool.athletes.set(athletes)
+
+    # bulk_create omija Round.save, więc klucz dywizji bierzemy wprost ze zgłoszeń
+    keys = dict(Registration.objects.filter(
+        tournament=tournament, athlete__in=athletes,
+    ).values_list('athlete_id', 'division_key'))
+    Round.objects.bulk_create([
+        Round(
+            tournament=tournament, pool=pool, athlete1=athlete1, athlete2=athlete2, round_number=number,
+            division_key=keys.get(athlete1.id) or division_key(athlete1),
+        )
+        for number, pairs in enumerate(circle_schedule(athletes), start=1)
+        for athlete1, athlete2 in pairs
+    ])
+    bump_version([tournament.id])
+    return pool
+
+
+def _sum_subquery(rounds, athlete_field, points_field):
+    return Coalesce(
+        Subquery(
+            rounds.filter(**{athlete_field: OuterRef('athlete_id')})
+            .values(athlete_field)
+            .annotate(total=Sum(points_field))
+            .values('total'),
+            output_field=IntegerField(),
+        ),
+        Value(0),
+    )
+
+
+def _count_subquery(rounds):
+    return Coalesce(
+        Subquery(
+            rounds.values('pool').annotate(total=Count('pk')).values('total'),
+            output_field=IntegerField(),
+        ),
+        Value(0),
+    )
+
+
+def pool_standings(pools):
+    """
+    Liczy tabele grup jednym zapytaniem agregującym dla dowolnej liczby grup.
+
+    Kolejność: zwycięstwa, wynik bezpośrednich walk między remisującymi,
+    różnica punktów, punkty zdobyte. Zwraca słownik {id grupy: lista wierszy}.
+    """
+    pool_ids = [pool.id if isinstance(pool, Pool) else pool for pool in pools]
+    decided = Round.objects.filter(pool=OuterRef('pool_id'), winner__isnull=False)
+
+    rows = Pool.athletes.through.objects.filter(pool_id__in=pool_ids).annotate(
+        wins=_count_subquery(decided.filter(winner=OuterRef('athlete_id'))),
+        bouts=_count_subquery(decided.filter(Q(athlete1=OuterRef('athlete_id')) | Q(athlete2=OuterRef('athlete_id')))),
+        points_as_athlete1=_sum_subquery(decided, 'athlete1', 'athlete1_points'),
+        points_as_athlete2=_sum_subquery(decided, 'athlete2', 'athlete2_points'),
+        conceded_as_athlete1=_sum_subquery(decided, 'athlete1', 'athlete2_points'),
+        conceded_as_athlete2=_sum_subquery(decided, 'athlete2', 'athlete1_points'),
+    ).values(
+        'pool_id', 'athlete_id', 'athlete__first_name', 'athlete__last_name', 'wins', 'bouts',
+        'points_as_athlete1', 'points_as_athlete2', 'conceded_as_athlete1', 'conceded_as_athlete2',
+    )
+
+    standings = {pool_id: [] for pool_id in pool_ids}
+    for row in rows:
+        points_for = row['points_as_athlete1'] + row['points_as_athlete2']
+        points_against = row['conceded_as_athlete1'] + row['conceded_as_athlete2']
+        standings[row['pool_id']].append({
+            'athlete_id': row['athlete_id'],
+            'name': f"{row['athlete__first_name']} {row['athlete__last_name']}",
+            'bouts': row['bouts'],
+            'wins': row['wins'],
+            'losses': row['bouts'] - row['wins'],
+            'points_for': points_for,
+            'points_against': points_against,
+            'head_to_head': 0,
+        })
+
+    _apply_head_to_head(standings)
+
+    for pool_id, table in standings.items():
+        table.sort(key=lambda row: (
+            -row['wins'], -row['head_to_head'], row['points_against'] - row['points_for'], -row['points_for'],
+        ))
+        for rank, row in enumerate(table, start=1):
+            row['rank'] = rank
+    return standings
+
+
+def _apply_head_to_head(standings):
+    """Dla zawodników z równą liczbą zwycięstw liczy zwycięstwa w walkach między nimi"""
+    tied = {}
+    for pool_id, table in standings.items():
+        by_wins = {}
+        for row in table:
+            by_wins.setdefault(row['wins'], []).append(row)
+        groups = [group for group in by_wins.values() if len(group) > 1]
+        if groups:
+            tied[pool_id] = groups
+    if not tied:
+        return
+
+    # Jedno zapytanie o rozstrzygnięte walki tylko w grupach z remisami
+    bouts = Round.objects.filter(pool_id__in=list(tied), winner__isnull=False).values_list(
+        'pool_id', 'athlete1_id', 'athlete2_id', 'winner_id',
+    )
+    results = {}
+    for pool_id, athlete1_id, athlete2_id, winner_id in bouts:
+        results.setdefault(pool_id, []).append((athlete1_id, athlete2_id, winner_id))
+
+    for pool_id, groups in tied.items():
+        for group in groups:
+            rows = {row['athlete_id']: row for row in group}
+            for athlete1_id, athlete2_id, winner_id in results.get(pool_id, []):
+                if athlete1_id in rows and athlete2_id in rows:
+                    rows[winner_id]['head_to_head'] += 1
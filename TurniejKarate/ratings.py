@@ -0,0 +1,157 @@
+from array import array
+from collections import Counter
+
+from django.db import connections, transaction
+from django.db.models import F
+
+from .models import AthleteRating, Round
+
+K_FACTOR = 32
+LEADERBOARD_SIZE = 50
+
+
+def expected_score(rating, opponent_rating):
+    """Oczekiwany wynik zawodnika (0..1) wg Elo"""
+    return 1 / (1 + 10 ** ((opponent_rating - rating) / 400))
+
+
+def rating_transfer(winner_rating, loser_rating):
+    """Punkty, które przegrany oddaje zwycięzcy"""
+    return K_FACTOR * (1 - expected_score(winner_rating, loser_rating))
+
+
+@transaction.atomic
+def apply_result(round_instance, previous_winner_id):
+    """
+    Aktualizuje rankingi obu zawodników o zmianę wyniku rundy.
+
+    Przeniesione punkty są zapisywane w `Round.rating_delta`, więc korekta
+    lub cofnięcie wyniku najpierw zwraca dokładnie te punkty, a dopiero potem
+    rozlicza nowy wynik. Późniejsze walki nie są przeliczane - kolejność
+    chronologiczną przywraca `rebuild_ratings`.
+    """
+    athlete_ids = (round_instance.athlete1_id, round_instance.athlete2_id)
+    if athlete_ids[0] == athlete_ids[1]:
+        return
+
+    AthleteRating.objects.bulk_create(
+        [AthleteRating(athlete_id=athlete_id) for athlete_id in athlete_ids], ignore_conflicts=True,
+    )
+    ratings = dict(AthleteRating.objects.select_for_update().filter(
+        athlete_id__in=athlete_ids,
+    ).values_list('athlete_id', 'rating'))
+
+    def loser_of(winner_id):
+        return athlete_ids[1] if winner_id == athlete_ids[0] else athlete_ids[0]
+
+    changes = Counter()
+    bouts = Counter()
+    if previous_winner_id is not None and round_instance.rating_delta is not None:
+        changes[previous_winner_id] -= round_instance.rating_delta
+        changes[loser_of(previous_winner_id)] += round_instance.rating_delta
+        bouts.update({athlete_id: -1 for athlete_id in athlete_ids})
+
+    delta = None
+    if round_instance.winner_id is not None:
+        winner_id, loser_id = round_instance.winner_id, loser_of(round_instance.winner_id)
+        delta = rating_transfer(ratings[winner_id] + changes[winner_id], ratings[loser_id] + changes[loser_id])
+        changes[winner_id] += delta
+        changes[loser_id] -= delta
+        bouts.update({athlete_id: 1 for athlete_id in athlete_ids})
+
+    for athlete_id in athlete_ids:
+        if changes[athlete_id] or bouts[athlete_id]:
+            AthleteRating.objects.filter(athlete_id=athlete_id).update(
+                rating=F('rating') + changes[athlete_id], bouts=F('bouts') + bouts[athlete_id],
+            )
+    Round.objects.filter(pk=round_instance.pk).update(rating_delta=delta)
+    round_instance.rating_delta = delta
+
+
+@transaction.atomic
+def merge_ratings(keep_id, duplicate_id):
+    """
+    Przenosi ranking duplikatu na zachowanego zawodnika (walki są już
+    przepięte, walki obu rekordów ze sobą usunięte): punkty przeniesione w
+    walkach obu rekordów się sumują. Bez przeliczania historii.
+    """
+    duplicate = AthleteRating.objects.select_for_update().filter(athlete_id=duplicate_id).first()
+    if duplicate is None:
+        return
+    AthleteRating.objects.get_or_create(athlete_id=keep_id)
+    AthleteRating.objects.filter(athlete_id=keep_id).update(
+        rating=F('rating') + duplicate.rating - AthleteRating.INITIAL_RATING,
+        bouts=F('bouts') + duplicate.bouts,
+    )
+    duplicate.delete()
+
+
+def rebuild_ratings(batch_size=5000, using='default'):
+    """
+    Przelicza rankingi od zera po całej historii walk, chronologicznie.
+
+    Walki są czytane strumieniowo (data turnieju, kolejność zapisu), a
+    rankingi i liczniki trzymane w tablicach `array` indeksowanych kolejnym
+    numerem zawodnika - bez obiektów modeli w pętli. Do bazy trafiają na
+    końcu paczkami `bulk_create` i `executemany`. Zwraca liczbę zawodników.
+    """
+    bouts = Round.objects.using(using).filter(winner__isnull=False).exclude(athlete1=F('athlete2')).order_by(
+        'tournament__date', 'id',
+    ).values_list('id', 'athlete1_id', 'athlete2_id', 'winner_id')
+
+    index = {}
+    ratings = array('d')
+    counts = array('L')
+    round_ids = array('q')
+    deltas = array('d')
+
+    def slot(athlete_id):
+        position = index.get(athlete_id)
+        if position is None:
+            position = index[athlete_id] = len(ratings)
+            ratings.append(AthleteRating.INITIAL_RATING)
+            counts.append(0)
+        return position
+
+    for round_id, athlete1_id, athlete2_id, winner_id in bouts.iterator(chunk_size=batch_size):
+        first, second = slot(athlete1_id), slot(athlete2_id)
+        winner, loser = (first, second) if winner_id == athlete1_id else (second, first)
+        delta = rating_transfer(ratings[winner], ratings[loser])
+        ratings[winner] += delta
+        ratings[loser] -= delta
+        counts[winner] += 1
+        counts[loser] += 1
+        round_ids.append(round_id)
+        deltas.append(delta)
+
+    with transaction.atomic(using=using):
+        AthleteRating.objects.using(using).all().delete()
+        AthleteRating.objects.using(using).bulk_create(
+            (
+                AthleteRating(athlete_id=athlete_id, rating=ratings[position], bouts=counts[position])
+                for athlete_id, position in index.items()
+            ),
+            batch_size=batch_size,
+        )
+        Round.objects.using(using).exclude(rating_delta=None).update(rating_delta=None)
+        _write_deltas(round_ids, deltas, batch_size, using)
+    return len(index)
+
+
+def _write_deltas(round_ids, deltas, batch_size, using):
+    # Proste UPDATE po kluczu głównym w executemany - bulk_update buduje dla każdej paczki wielki CASE
+    connection = connections[using]
+    quote = connection.ops.quote_name
+    meta = Round._meta
+    sql = (
+        f"UPDATE {quote(meta.db_table)} SET {quote(meta.get_field('rating_delta').column)} = %s "
+        f"WHERE {quote(meta.pk.column)} = %s"
+    )
+    with connection.cursor() as cursor:
+        for start in range(0, len(round_ids), batch_size):
+            cursor.executemany(sql, list(zip(deltas[start:start + batch_size], round_ids[start:start + batch_size])))
+
+
+def rating_leaderboard(limit=LEADERBOARD_SIZE):
+    """Najwyższe rankingi - jeden odczyt po indeksie malejącego rankingu"""
+    return AthleteRating.objects.select_related('athlete').order_by('-rating')[:limit]
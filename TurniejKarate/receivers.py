@@ -0,0 +1,153 @@
+from copy import copy
+
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete
+from django.dispatch import receiver
+
+from . import (
+    bout_log, brackets, counters, divisions, eligibility, fragments, head_to_head, http_cache, leaderboards, ratings,
+    reference,
+)
+from .models import AgeBand, Athlete, BeltGroup, Club, Registration, Round, Tournament, WeightCategory
+from .signals import places_changed, result_changed
+
+
+@receiver(result_changed)
+def log_bout_event(sender, round, previous_winner_id, **kwargs):
+    bout_log.append_event(round, previous_winner_id)
+
+
+@receiver(result_changed)
+def update_head_to_head(sender, round, previous_winner_id, **kwargs):
+    head_to_head.apply_result(round, previous_winner_id)
+
+
+@receiver(result_changed)
+def update_season_stats(sender, round, previous_winner_id, **kwargs):
+    leaderboards.apply_result(round, previous_winner_id)
+
+
+@receiver(result_changed)
+def update_ratings(sender, round, previous_winner_id, **kwargs):
+    ratings.apply_result(round, previous_winner_id)
+
+
+@receiver(result_changed)
+def update_bout_counters(sender, round, previous_winner_id, **kwargs):
+    counters.result_changed(round, previous_winner_id)
+
+
+@receiver(places_changed)
+def update_club_medals(sender, tournament, changes, **kwargs):
+    leaderboards.apply_place_changes(tournament, changes)
+
+
+@receiver(result_changed)
+def advance_bracket(sender, round, previous_winner_id, **kwargs):
+    if round.bracket_id is not None:
+        brackets.record_result(round)
+
+
+@receiver(post_save, sender=AgeBand)
+@receiver(post_delete, sender=AgeBand)
+@receiver(post_save, sender=BeltGroup)
+@receiver(post_delete, sender=BeltGroup)
+@receiver(post_save, sender=WeightCategory)
+@receiver(post_delete, sender=WeightCategory)
+@receiver(post_save, sender=Club)
+@receiver(post_delete, sender=Club)
+def invalidate_reference_data(sender, **kwargs):
+    reference.invalidate()
+
+
+@receiver(m2m_changed, sender=Tournament.athletes.through)
+def compute_division_keys(sender, instance, action, reverse, pk_set, **kwargs):
+    # Klucz dywizji jest liczony raz, przy zgłoszeniu zawodnika do turnieju
+    if action != 'post_add' or not pk_set:
+        return
+    if reverse:
+        registrations = sender.objects.filter(athlete=instance, tournament_id__in=pk_set)
+    else:
+        registrations = sender.objects.filter(tournament=instance, athlete_id__in=pk_set)
+    divisions.refresh_division_keys(registrations)
+
+
+@receiver(m2m_changed, sender=Tournament.athletes.through)
+def count_registrations(sender, instance, action, reverse, pk_set, **kwargs):
+    # Po compute_division_keys - nowe zgłoszenia mają już klucze dywizji
+    if action != 'post_add' or not pk_set:
+        return
+    if reverse:
+        counters.registrations_added(sender.objects.filter(athlete=instance, tournament_id__in=pk_set))
+    else:
+        counters.registrations_added(sender.objects.filter(tournament=instance, athlete_id__in=pk_set))
+
+
+@receiver(post_delete, sender=Registration)
+def uncount_registration(sender, instance, **kwargs):
+    # Każde usunięcie zgłoszenia: remove(), clear() i kaskada przy usuwaniu zawodnika lub turnieju
+    counters.registration_removed(instance)
+
+
+@receiver(pre_delete, sender=Round)
+def withdraw_deleted_result(sender, instance, **kwargs):
+    # Usunięcie rozstrzygniętej rundy cofa jej walkę w projekcjach zawodników jak wycofanie wyniku;
+    # liczniki turnieju odejmuje uncount_round
+    if instance.winner_id is None:
+        return
+    withdrawn = copy(instance)
+    withdrawn.winner = None
+    bout_log.append_event(withdrawn, instance.winner_id, deleted=True)
+    head_to_head.apply_result(withdrawn, instance.winner_id)
+    leaderboards.apply_result(withdrawn, instance.winner_id)
+    ratings.apply_result(withdrawn, instance.winner_id)
+
+
+@receiver(post_delete, sender=Round)
+def uncount_round(sender, instance, **kwargs):
+    counters.round_deleted(instance)
+
+
+@receiver(post_save, sender=Round)
+@receiver(post_delete, sender=Round)
+def bump_tournament_version(sender, instance, **kwargs):
+    fragments.bump_version([instance.tournament_id])
+
+
+@receiver(m2m_changed, sender=Tournament.athletes.through)
+def bump_version_on_registration(sender, instance, action, reverse, pk_set, **kwargs):
+    if action in ('post_add', 'post_remove') and pk_set:
+        fragments.bump_version(pk_set if reverse else [instance.pk])
+    elif action == 'pre_clear' and reverse:
+        fragments.bump_version(list(instance.tournaments.values_list('pk', flat=True)))
+    elif action == 'post_clear' and not reverse:
+        fragments.bump_version([instance.pk])
+
+
+@receiver(post_save, sender=Tournament)
+@receiver(post_delete, sender=Tournament)
+def purge_tournament_pages(sender, instance, **kwargs):
+    http_cache.purge_tournaments([instance.pk], listed=True)
+
+
+@receiver(m2m_changed, sender=Tournament.athletes.through)
+def update_eligibility(sender, instance, action, reverse, pk_set, **kwargs):
+    # Odpadnięcie zawodnika (usunięcie zgłoszenia) to tylko wyzerowanie jego bitu w macierzy
+    if action in ('post_add', 'post_remove') and pk_set:
+        tournament_ids = pk_set if reverse else [instance.pk]
+        athlete_ids = [instance.pk] if reverse else pk_set
+        if action == 'post_add':
+            eligibility.registrations_changed(tournament_ids, added=athlete_ids)
+        else:
+            eligibility.registrations_changed(tournament_ids, removed=athlete_ids)
+    elif action == 'pre_clear' and reverse:
+        eligibility.invalidate(instance.tournaments.values_list('pk', flat=True))
+    elif action == 'post_clear' and not reverse:
+        eligibility.invalidate([instance.pk])
+
+
+@receiver(post_save, sender=Athlete)
+@receiver(pre_delete, sender=Athlete)
+def invalidate_eligibility(sender, instance, created=False, **kwargs):
+    # Płeć lub kategoria wagowa mogły się zmienić
+    if not created:
+        eligibility.invalidate(Registration.objects.filter(athlete=instance).values_list('tournament_id', flat=True))
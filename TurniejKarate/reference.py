@@ -0,0 +1,132 @@
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+
+from .models import AgeBand, BeltGroup, Club, WeightCategory
+
+VERSION_KEY = 'TurniejKarate:reference-version'
+
+
+class ReferenceData:
+    """
+    Pamięć podręczna procesu dla małych, rzadko zmienianych tabel
+    (`WeightCategory`, `Club`, `AgeBand`, `BeltGroup`) z odczytem po id
+    i nazwie w O(1).
+
+    Tabele są wczytywane w całości przy pierwszym użyciu. Zmiana dowolnego
+    wiersza ustawia nową wersję we wspólnym cache (`CACHES['default']`), a
+    każdy proces porównuje ją ze swoją najwyżej raz na
+    `REFERENCE_CACHE_CHECK_INTERVAL` sekund i w razie różnicy wczytuje dane
+    ponownie. Zwracane obiekty są współdzielone - tylko do odczytu.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._state = None
+        self._version = None
+        self._checked_at = 0.0
+
+    def _shared_version(self):
+        version = cache.get(VERSION_KEY)
+        if version is None:
+            cache.add(VERSION_KEY, uuid.uuid4().hex)
+            version = cache.get(VERSION_KEY)
+        return version
+
+    def _get_state(self):
+        interval = getattr(settings, 'REFERENCE_CACHE_CHECK_INTERVAL', 1.0)
+        now = time.monotonic()
+        state = self._state
+        if state is not None and now - self._checked_at < interval:
+            return state
+
+        version = self._shared_version()
+        if state is not None and version == self._version:
+            self._checked_at = now
+            return state
+
+        with self._lock:
+            self._state = self._load()
+            self._version = version
+            self._checked_at = now
+            return self._state
+
+    @staticmethod
+    def _load():
+        categories = list(WeightCategory.objects.order_by('min_weight', 'name'))
+        clubs = list(Club.objects.order_by('name'))
+        age_bands = list(AgeBand.objects.order_by('min_age', 'id'))
+        belt_groups = list(BeltGroup.objects.order_by('min_belt', 'id'))
+        return {
+            'age_bands': age_bands,
+            'age_bands_by_id': {age_band.id: age_band for age_band in age_bands},
+            'belt_groups': belt_groups,
+            'belt_groups_by_id': {belt_group.id: belt_group for belt_group in belt_groups},
+            'categories': categories,
+            'categories_by_id': {category.id: category for category in categories},
+            'categories_by_name': {category.name: category for category in categories},
+            'clubs': clubs,
+            'clubs_by_id': {club.id: club for club in clubs},
+            'clubs_by_name': {club.name: club for club in clubs},
+        }
+
+    def categories(self):
+        return self._get_state()['categories']
+
+    def category(self, category_id):
+        return self._get_state()['categories_by_id'].get(category_id)
+
+    def category_by_name(self, name):
+        return self._get_state()['categories_by_name'].get(name)
+
+    def clubs(self):
+        return self._get_state()['clubs']
+
+    def club(self, club_id):
+        return self._get_state()['clubs_by_id'].get(club_id)
+
+    def club_by_name(self, name):
+        return self._get_state()['clubs_by_name'].get(name)
+
+    def age_bands(self):
+        return self._get_state()['age_bands']
+
+    def age_band(self, age_band_id):
+        return self._get_state()['age_bands_by_id'].get(age_band_id)
+
+    def belt_groups(self):
+        return self._get_state()['belt_groups']
+
+    def belt_group(self, belt_group_id):
+        return self._get_state()['belt_groups_by_id'].get(belt_group_id)
+
+    def version(self):
+        """Wersja wczytanych danych - składnik kluczy cache zależnych od nazw słownikowych"""
+        self._get_state()
+        return self._version
+
+    def clear(self):
+        with self._lock:
+            self._state = None
+            self._version = None
+
+
+reference_data = ReferenceData()
+
+
+def _bump_version():
+    cache.set(VERSION_KEY, uuid.uuid4().hex, None)
+    reference_data.clear()
+
+
+def invalidate():
+    """
+    Unieważnia dane we wszystkich procesach - od razu i ponownie po
+    zatwierdzeniu transakcji, aby inne procesy nie zatrzymały stanu sprzed niej.
+    """
+    _bump_version()
+    transaction.on_commit(_bump_version)
@@ -0,0 +1,82 @@
+from django.db import connections, transaction
+from django.db.models import Exists, OuterRef, Q, Subquery
+
+from . import eligibility
+from .counters import count_copied_registrations, division_keys_changing
+from .divisions import refresh_division_keys
+from .models import Athlete, Placement, Registration, Round, Tournament, WeightCategory
+
+
+def _matching_categories():
+    return WeightCategory.objects.filter(min_weight__lte=OuterRef('weight'), max_weight__gte=OuterRef('weight'))
+
+
+def classification_expression():
+    """Kategoria wagowa z aktualnej wagi zawodnika - odpowiednik `classify_weight` w SQL"""
+    return Subquery(_matching_categories().order_by('min_weight', 'name').values('id')[:1])
+
+
+def entrants(source, using='default'):
+    """
+    Zawodnicy poprzedniej edycji: obecne zgłoszenia, uczestnicy walk i
+    zawodnicy z miejscem - Round.save usuwa zgłoszenie przegranego, więc po
+    zakończonym turnieju same zgłoszenia to tylko zwycięzca. Bez ukrytych zawodników.
+    """
+    rounds = Round.objects.using(using).filter(tournament=source)
+    return Athlete.objects.using(using).filter(
+        Q(id__in=Registration.objects.using(using).filter(tournament=source).values('athlete_id'))
+        | Q(id__in=rounds.values('athlete1_id'))
+        | Q(id__in=rounds.values('athlete2_id'))
+        | Q(id__in=Placement.objects.using(using).filter(tournament=source).values('athlete_id')),
+        deleted_at__isnull=True,
+    ).values_list('id')
+
+
+def _copy_registrations(source, target, using):
+    # INSERT ... SELECT - zgłoszenia nie przechodzą przez Pythona niezależnie od ich liczby.
+    # Klucze dywizji liczy potem refresh_division_keys
+    connection = connections[using]
+    quote = connection.ops.quote_name
+    meta = Registration._meta
+    columns = ', '.join(quote(meta.get_field(name).column) for name in ('athlete', 'tournament', 'division_key'))
+    sql, params = entrants(source, using).query.sql_with_params()
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f"INSERT INTO {quote(meta.db_table)} ({columns}) SELECT entrants.*, %s, '' FROM ({sql}) entrants",
+            [target.id, *params],
+        )
+        return cursor.rowcount
+
+
+def clone_tournament(source, name, date, reclassify=False, using='default'):
+    """
+    Tworzy nową edycję turnieju z ustawieniami i zawodnikami poprzedniej.
+
+    Zgłoszenia są kopiowane jednym `INSERT ... SELECT`, a klucze dywizji
+    przeliczane jednym UPDATE zgłoszeń - liczba zapytań nie zależy od liczby
+    zawodników. Ponowna klasyfikacja wagowa zmienia kategorię zawodnika, więc
+    przelicza też jego dywizje (z licznikami) w pozostałych turniejach.
+    Zwraca (nowy turniej, liczba skopiowanych zgłoszeń).
+    """
+    with transaction.atomic(using=using):
+        target = Tournament.objects.using(using).create(name=name, type=source.type, date=date)
+        copied = _copy_registrations(source, target, using)
+        registrations = Registration.objects.using(using).filter(tournament=target)
+
+        if reclassify:
+            others = Registration.objects.using(using).filter(
+                athlete_id__in=registrations.values('athlete_id'),
+            ).exclude(tournament=target)
+            with division_keys_changing(others):
+                # Bez wagi lub poza wszystkimi przedziałami zostaje kategoria ustawiona ręcznie
+                Athlete.objects.using(using).filter(
+                    Exists(_matching_categories()),
+                    id__in=registrations.values('athlete_id'), weight__isnull=False,
+                ).update(weight_category=classification_expression())
+                refresh_division_keys(others)
+            eligibility.invalidate(others.values_list('tournament_id', flat=True).distinct())
+
+        # Pas, wiek i kategoria mogły się zmienić od poprzedniej edycji
+        refresh_division_keys(registrations)
+        count_copied_registrations(target, copied, using=using)  # INSERT ... SELECT omija sygnały liczników
+    return target, copied
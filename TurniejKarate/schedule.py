@@ -0,0 +1,177 @@
+from collections import namedtuple
+from datetime import datetime, time, timedelta
+
+from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import Round
+
+# Zaplanowany przedział walki [start, end) z punktu widzenia jednego zawodnika
+Slot = namedtuple('Slot', 'start end round_id')
+# gap_seconds < 0: walki nachodzą na siebie, 0 <= gap_seconds < przerwa: za krótki odpoczynek
+Conflict = namedtuple('Conflict', 'athlete_id round_id other_round_id kind gap_seconds')
+
+
+class ScheduleConflict(ValidationError):
+    def __init__(self, conflicts):
+        super().__init__("Zawodnik ma w tym czasie inną walkę lub za krótką przerwę.")
+        self.conflicts = conflicts
+
+
+def min_rest():
+    return timedelta(minutes=settings.SCHEDULE_MIN_REST_MINUTES)
+
+
+class IntervalTree:
+    """
+    Statyczne drzewo przedziałów: przedziały posortowane po początku tworzą
+    niejawne zrównoważone drzewo binarne (korzeń w środku tablicy), a każdy
+    węzeł pamięta największy koniec w swoim poddrzewie. Budowa O(n log n),
+    zapytanie O(log n + liczba wyników).
+    """
+
+    def __init__(self, slots):
+        self._slots = sorted(slots)
+        self._max_end = [None] * len(self._slots)
+        self._build(0, len(self._slots))
+
+    def _build(self, low, high):
+        if low >= high:
+            return None
+        middle = (low + high) // 2
+        max_end = self._slots[middle].end
+        for child in (self._build(low, middle), self._build(middle + 1, high)):
+            if child is not None and child > max_end:
+                max_end = child
+        self._max_end[middle] = max_end
+        return max_end
+
+    def overlapping(self, start, end):
+        """Przedziały, które mają część wspólną z [start, end)"""
+        found = []
+        self._search(0, len(self._slots), start, end, found)
+        return found
+
+    def _search(self, low, high, start, end, found):
+        if low >= high:
+            return
+        middle = (low + high) // 2
+        if self._max_end[middle] <= start:
+            return  # Całe poddrzewo kończy się przed szukanym przedziałem
+        self._search(low, middle, start, end, found)
+        slot = self._slots[middle]
+        if slot.start < end:
+            if slot.end > start:
+                found.append(slot)
+            # Prawe poddrzewo zaczyna się nie wcześniej niż ten przedział
+            self._search(middle + 1, high, start, end, found)
+
+
+def _conflict(athlete_id, first, second):
+    gap = (second.start - first.end).total_seconds()
+    return Conflict(athlete_id, first.round_id, second.round_id, 'OVERLAP' if gap < 0 else 'REST', gap)
+
+
+class ScheduleIndex:
+    """
+    Zaplanowane walki pogrupowane po zawodnikach, z drzewem przedziałów dla
+    każdego zawodnika. Przesunięcie walki przebudowuje tylko drzewa jej
+    dwóch zawodników i sprawdza tylko ich walki.
+    """
+
+    def __init__(self, rows, rest=None):
+        # rows: (id rundy, id zawodnika 1, id zawodnika 2, początek, koniec)
+        self.rest = min_rest() if rest is None else rest
+        self._athletes = {}
+        self._slots = {}
+        self._trees = {}
+        for row in rows:
+            self.add(*row)
+
+    def add(self, round_id, athlete1_id, athlete2_id, start, end):
+        """Dodaje walkę do indeksu lub zastępuje jej przedział"""
+        # Para jako krotka: zapis nie gubi strony, gdy obie strony to ten sam zawodnik
+        self._athletes[round_id] = (athlete1_id, athlete2_id)
+        for athlete_id in self._round_athletes(round_id):
+            self._slots.setdefault(athlete_id, {})[round_id] = Slot(start, end, round_id)
+            self._trees.pop(athlete_id, None)
+
+    def _round_athletes(self, round_id):
+        return dict.fromkeys(self._athletes[round_id])
+
+    def _tree(self, athlete_id):
+        tree = self._trees.get(athlete_id)
+        if tree is None:
+            tree = self._trees[athlete_id] = IntervalTree(self._slots[athlete_id].values())
+        return tree
+
+    def conflicts(self):
+        """Wszystkie konflikty; każda para walk zawodnika zgłaszana raz (od wcześniejszej)"""
+        found = []
+        for athlete_id, slots in self._slots.items():
+            tree = self._tree(athlete_id)
+            for slot in slots.values():
+                for other in tree.overlapping(slot.start, slot.end + self.rest):
+                    if (other.start, other.round_id) > (slot.start, slot.round_id):
+                        found.append(_conflict(athlete_id, slot, other))
+        return sorted(found, key=lambda conflict: (conflict.athlete_id, conflict.round_id, conflict.other_round_id))
+
+    def round_conflicts(self, round_id):
+        found = []
+        for athlete_id in self._round_athletes(round_id):
+            slot = self._slots[athlete_id][round_id]
+            for other in self._tree(athlete_id).overlapping(slot.start - self.rest, slot.end + self.rest):
+                if other.round_id != round_id:
+                    found.append(_conflict(athlete_id, *sorted((slot, other))))
+        return found
+
+    def move(self, round_id, start, end):
+        """Przesuwa walkę i zwraca jej konflikty po przesunięciu"""
+        self.add(round_id, *self._athletes[round_id], start, end)
+        return self.round_conflicts(round_id)
+
+
+def _rows(rounds):
+    return rounds.filter(scheduled_start__isnull=False, scheduled_end__isnull=False).values_list(
+        'id', 'athlete1_id', 'athlete2_id', 'scheduled_start', 'scheduled_end',
+    )
+
+
+def event_conflicts(day, rest=None):
+    """Konflikty wszystkich walk zaplanowanych na dany dzień - we wszystkich turniejach i dywizjach"""
+    start = timezone.make_aware(datetime.combine(day, time.min))
+    rounds = Round.objects.filter(scheduled_start__gte=start, scheduled_start__lt=start + timedelta(days=1))
+    return ScheduleIndex(_rows(rounds), rest).conflicts()
+
+
+def check_round(round_instance, start, end, rest=None):
+    """Konflikty walki, gdyby odbyła się w [start, end) - czyta tylko sąsiednie walki jej zawodników"""
+    rest = min_rest() if rest is None else rest
+    athlete_ids = [round_instance.athlete1_id, round_instance.athlete2_id]
+    nearby = Round.objects.filter(
+        Q(athlete1_id__in=athlete_ids) | Q(athlete2_id__in=athlete_ids),
+        scheduled_start__lt=end + rest, scheduled_end__gt=start - rest,
+    ).exclude(pk=round_instance.pk)
+    index = ScheduleIndex(_rows(nearby), rest)
+    index.add(round_instance.pk, *athlete_ids, start, end)
+    return index.round_conflicts(round_instance.pk)
+
+
+def schedule_round(round_instance, start, end, mat=None, force=False):
+    """
+    Planuje walkę na [start, end). Przy konflikcie rzuca ScheduleConflict,
+    chyba że `force` - wtedy zapisuje i zwraca konflikty.
+    """
+    if end <= start:
+        raise ValidationError("Koniec walki musi być po jej początku.")
+    conflicts = check_round(round_instance, start, end)
+    if conflicts and not force:
+        raise ScheduleConflict(conflicts)
+    round_instance.scheduled_start = start
+    round_instance.scheduled_end = end
+    if mat is not None:
+        round_instance.mat = mat
+    round_instance.save(update_fields=['scheduled_start', 'scheduled_end', 'mat', 'updated_at'])
+    return conflicts
@@ -0,0 +1,136 @@
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+from django.db.models import Count, Max, Min, Sum
+from django.utils import timezone
+
+from .fragments import bump_version
+from .models import JudgeScore, Round
+
+MIN_JUDGES = 5
+MAX_JUDGES = 7
+MAX_SCORE = Decimal('10.00')
+
+
+def parse_scores(raw_scores):
+    """Zamienia listę ocen z zapytania na słownik {(runda, zawodnik, sędzia): ocena}"""
+    scores = {}
+    errors = []
+    for item in raw_scores:
+        try:
+            key = (int(item['round']), int(item['athlete']), int(item['judge']))
+            score = Decimal(str(item['score'])).quantize(Decimal('0.01'))
+            if not score.is_finite():
+                raise InvalidOperation
+        except (KeyError, TypeError, ValueError, InvalidOperation):
+            errors.append({'item': item, 'error': "Nieprawidłowa ocena."})
+            continue
+        if not 1 <= key[2] <= MAX_JUDGES:
+            errors.append({'item': item, 'error': f"Numer sędziego musi być w przedziale 1-{MAX_JUDGES}."})
+            continue
+        if not Decimal('0') <= score <= MAX_SCORE:
+            errors.append({'item': item, 'error': f"Ocena musi być w przedziale 0-{MAX_SCORE}."})
+            continue
+        scores[key] = score
+    return scores, errors
+
+
+def flight_totals(round_ids):
+    """
+    Liczy wyniki kata dla wszystkich zawodników wskazanych rund jednym zapytaniem.
+
+    Najwyższa i najniższa ocena są odrzucane, pozostałe sumowane. Zwraca
+    słownik {(runda, zawodnik): (wynik, suma wszystkich ocen, liczba sędziów)}.
+    """
+    rows = JudgeScore.objects.filter(round_id__in=round_ids).values('round_id', 'athlete_id').annotate(
+        judges=Count('id'),
+        raw_total=Sum('score'),
+        trimmed_total=Sum('score') - Max('score') - Min('score'),
+    )
+    return {
+        (row['round_id'], row['athlete_id']): (row['trimmed_total'], row['raw_total'], row['judges'])
+        for row in rows
+    }
+
+
+def decide_winner(round_instance, totals):
+    """Zwycięzca kata albo None, jeśli oceny są niepełne lub wynik jest nierozstrzygnięty"""
+    first = totals.get((round_instance.id, round_instance.athlete1_id))
+    second = totals.get((round_instance.id, round_instance.athlete2_id))
+    if not first or not second:
+        return None
+    if first[2] < MIN_JUDGES or first[2] != second[2]:
+        return None
+    # Przy równym wyniku decyduje suma wszystkich ocen
+    if first[:2] == second[:2]:
+        return None
+    return round_instance.athlete1 if first[:2] > second[:2] else round_instance.athlete2
+
+
+@transaction.atomic
+def ingest_scores(scores):
+    """
+    Zapisuje oceny sędziów dla całego wylotu i przelicza tylko zmienione rundy.
+
+    Oceny są zapisywane jednym `bulk_create` z nadpisaniem istniejących (korekty),
+    po czym wyniki i zwycięzcy są wyznaczani dla rund, których dotyczyły oceny.
+    Zmiana zwycięzcy (także jego usunięcie przy remisie) przechodzi przez
+    `Round.save`, więc odpadanie i miejsca działają jak przy walkach kumite.
+    Wynik drabinki, którego nie można już zmienić, rzuca ValidationError.
+    """
+    rounds = Round.objects.select_related('athlete1', 'athlete2', 'tournament').in_bulk(
+        {round_id for round_id, _, _ in scores}
+    )
+
+    errors = []
+    to_save = []
+    for (round_id, athlete_id, judge), score in scores.items():
+        round_instance = rounds.get(round_id)
+        if round_instance is None or athlete_id not in (round_instance.athlete1_id, round_instance.athlete2_id):
+            errors.append({
+                'item': {'round': round_id, 'athlete': athlete_id, 'judge': judge},
+                'error': "Zawodnik nie bierze udziału w tej rundzie.",
+            })
+            continue
+        to_save.append(JudgeScore(round_id=round_id, athlete_id=athlete_id, judge=judge, score=score))
+
+    JudgeScore.objects.bulk_create(
+        to_save,
+        update_conflicts=True,
+        unique_fields=['round', 'athlete', 'judge'],
+        update_fields=['score'],
+    )
+
+    touched = {score.round_id for score in to_save}
+    totals = flight_totals(touched)
+
+    results = []
+    unchanged_winner = []
+    for round_id in sorted(touched):
+        round_instance = rounds[round_id]
+        first = totals.get((round_id, round_instance.athlete1_id))
+        second = totals.get((round_id, round_instance.athlete2_id))
+        round_instance.athlete1_score = first[0] if first and first[2] >= MIN_JUDGES else None
+        round_instance.athlete2_score = second[0] if second and second[2] >= MIN_JUDGES else None
+
+        # Korekta może też dać remis lub niepełne oceny - wtedy wynik jest cofany (winner=None)
+        winner = decide_winner(round_instance, totals)
+        if (winner.id if winner else None) != round_instance.winner_id:
+            round_instance.winner = winner
+            round_instance.save()
+        else:
+            # bulk_update nie ustawia pól auto_now
+            round_instance.updated_at = timezone.now()
+            unchanged_winner.append(round_instance)
+
+        results.append({
+            'round': round_id,
+            'athlete1_score': str(round_instance.athlete1_score) if round_instance.athlete1_score is not None else None,
+            'athlete2_score': str(round_instance.athlete2_score) if round_instance.athlete2_score is not None else None,
+            'winner': round_instance.winner_id,
+        })
+
+    Round.objects.bulk_update(unchanged_winner, ['athlete1_score', 'athlete2_score', 'updated_at'])
+    if unchanged_winner:
+        bump_version({round_instance.tournament_id for round_instance in unchanged_winner})
+    return results, errors
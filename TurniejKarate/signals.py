@@ -0,0 +1,13 @@
+from django.dispatch import Signal
+
+# Wysyłany po zapisaniu rundy, której zwycięzca się zmienił (nowy wynik, korekta lub jego usunięcie).
+# Argumenty: round - zapisana runda, previous_winner_id - zwycięzca przed zmianą (lub None).
+result_changed = Signal()
+
+# Wysyłany po zmianie miejsc zawodników w turnieju.
+# Argumenty: tournament - turniej, changes - lista krotek (id zawodnika, poprzednie miejsce, nowe miejsce).
+places_changed = Signal()
+
+# Wysyłany po zatwierdzeniu zmian widocznych na stronach publicznych (PUBLIC_URL_PREFIX).
+# Argumenty: keys - klucze Surrogate-Key stron do usunięcia z cache pośredniczących (CDN, Varnish).
+public_cache_purged = Signal()
@@ -0,0 +1,543 @@
+import gzip
+import json
+import uuid
+from datetime import datetime
+
+from django.db import transaction
+from django.db.models import F, OuterRef, Q, Subquery
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from . import bout_log, counters, divisions, eligibility, head_to_head, leaderboards, ratings, reference
+from .models import (
+    Athlete, Bracket, BracketNode, Club, JudgeScore, Placement, Pool, Registration, Round, Tournament, WeightCategory,
+)
+
+FORMAT = 'turniej-snapshot'
+VERSION = 2
+SUPPORTED_VERSIONS = (1, 2)
+BATCH_SIZE = 1000
+
+ATHLETE_FIELDS = [
+    'first_name', 'last_name', 'age', 'weight', 'gender', 'belt_level', 'karate_style', 'place',
+]
+ROUND_FIELDS = [
+    'round_number', 'athlete1_points', 'athlete2_points', 'athlete1_score', 'athlete2_score',
+    'mat', 'started_at', 'ended_at', 'scheduled_start', 'scheduled_end',
+]
+V1_ROUND_FIELDS = ROUND_FIELDS[:5]
+BRACKET_FIELDS = ['division_key', 'kind', 'size']
+NODE_FIELDS = [
+    'section', 'stage', 'position', 'pending', 'decided', 'winner_slot', 'loser_slot', 'winner_place', 'loser_place',
+]
+
+
+class SnapshotError(Exception):
+    pass
+
+
+def _json_default(value):
+    if isinstance(value, uuid.UUID):
+        return value.hex
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)  # Decimal, date
+
+
+def _write(stream, record):
+    stream.write(json.dumps(record, default=_json_default, separators=(',', ':')).encode())
+    stream.write(b'\n')
+
+
+def open_snapshot(path, mode):
+    """Migawki są plikami JSON Lines kompresowanymi gzipem"""
+    return gzip.open(path, mode + 'b')
+
+
+def export_snapshot(tournament, stream, since=None, using='default'):
+    """
+    Zapisuje migawkę turnieju strumieniowo, rekord po rekordzie.
+
+    Pełna migawka zawiera kluby, kategorie, zawodników, turniej, grupy,
+    drabinki, zgłoszenia, rundy z ocenami sędziów i miejsca. Z `since`
+    powstaje migawka różnicowa: tylko rundy zmienione od tej chwili, ich
+    zawodnicy, oceny i drabinki oraz aktualne zgłoszenia i miejsca. Obie
+    zawierają listę `uid` wszystkich rund turnieju, więc import usuwa rundy
+    skasowane w bazie źródłowej (pliki w wersji 1 jej nie mają). Rekordy
+    odwołują się do siebie przez `uid`, nazwy i pozycje węzłów drabinki, więc
+    import nie zależy od kluczy głównych bazy źródłowej.
+    """
+    rounds = Round.objects.using(using).filter(tournament=tournament)
+    if since is not None:
+        rounds = rounds.filter(updated_at__gt=since)
+    registered = Athlete.objects.using(using).filter(tournaments=tournament)
+    if since is None:
+        athletes = Athlete.objects.using(using).filter(
+            Q(tournaments=tournament)
+            | Q(rounds_as_athlete1__tournament=tournament)
+            | Q(rounds_as_athlete2__tournament=tournament)
+            | Q(pools__tournament=tournament)
+            | Q(placements__tournament=tournament)
+        ).distinct()
+    else:
+        athletes = Athlete.objects.using(using).filter(
+            Q(tournaments=tournament) | Q(rounds_as_athlete1__in=rounds) | Q(rounds_as_athlete2__in=rounds)
+        ).distinct()
+
+    _write(stream, {
+        'type': 'header',
+        'format': FORMAT,
+        'version': VERSION,
+        'kind': 'delta' if since is not None else 'full',
+        'since': since,
+        'exported_at': timezone.now(),
+    })
+
+    club_ids = athletes.values('club_id')
+    for name in Club.objects.using(using).filter(id__in=club_ids).values_list('name', flat=True).iterator():
+        _write(stream, {'type': 'club', 'name': name})
+
+    category_ids = athletes.values('weight_category_id')
+    categories = WeightCategory.objects.using(using).filter(id__in=category_ids)
+    for category in categories.values('name', 'min_weight', 'max_weight').iterator():
+        _write(stream, {'type': 'category', **category})
+
+    athlete_values = athletes.values('uid', 'club__name', 'weight_category__name', *ATHLETE_FIELDS)
+    for athlete in athlete_values.iterator(chunk_size=BATCH_SIZE):
+        athlete['club'] = athlete.pop('club__name')
+        athlete['category'] = athlete.pop('weight_category__name')
+        _write(stream, {'type': 'athlete', **athlete})
+
+    _write(stream, {
+        'type': 'tournament',
+        'uid': tournament.uid,
+        'name': tournament.name,
+        'tournament_type': tournament.type,
+        'date': tournament.date,
+    })
+
+    if since is None:
+        for pool in Pool.objects.using(using).filter(tournament=tournament).iterator():
+            _write(stream, {
+                'type': 'pool',
+                'uid': pool.uid,
+                'name': pool.name,
+                'athletes': list(pool.athletes.values_list('uid', flat=True)),
+            })
+
+    brackets = Bracket.objects.using(using).filter(tournament=tournament)
+    if since is not None:
+        brackets = brackets.filter(rounds__in=rounds).distinct()
+    brackets = list(brackets.order_by('id'))
+    for bracket in brackets:
+        _write(stream, {
+            'type': 'bracket', 'uid': bracket.uid, **{field: getattr(bracket, field) for field in BRACKET_FIELDS},
+        })
+
+    _write(stream, {
+        'type': 'registrations',
+        'athletes': list(registered.values_list('uid', flat=True).iterator(chunk_size=BATCH_SIZE)),
+    })
+
+    round_values = rounds.values(
+        'uid', 'pool__uid', 'bracket__uid', 'athlete1__uid', 'athlete2__uid', 'winner__uid', *ROUND_FIELDS,
+    ).order_by('id')
+    for round_instance in round_values.iterator(chunk_size=BATCH_SIZE):
+        _write(stream, {
+            'type': 'round',
+            'uid': round_instance['uid'],
+            'pool': round_instance['pool__uid'],
+            'bracket': round_instance['bracket__uid'],
+            'athlete1': round_instance['athlete1__uid'],
+            'athlete2': round_instance['athlete2__uid'],
+            'winner': round_instance['winner__uid'],
+            **{field: round_instance[field] for field in ROUND_FIELDS},
+        })
+    # Lista wszystkich rund turnieju zamiast znaczników usunięcia: rundy spoza niej import usuwa
+    _write(stream, {
+        'type': 'round_index',
+        'rounds': list(Round.objects.using(using).filter(tournament=tournament).values_list(
+            'uid', flat=True,
+        ).iterator(chunk_size=BATCH_SIZE)),
+    })
+
+    scores = JudgeScore.objects.using(using).filter(round__in=rounds).order_by('round_id', 'athlete_id', 'judge')
+    for round_uid, athlete_uid, judge, score in scores.values_list(
+        'round__uid', 'athlete__uid', 'judge', 'score',
+    ).iterator(chunk_size=BATCH_SIZE):
+        _write(stream, {
+            'type': 'judge_score', 'round': round_uid, 'athlete': athlete_uid, 'judge': judge, 'score': score,
+        })
+
+    # Węzły po rundach - wskazują na nie; cała drabinka w jednym rekordzie, bo węzły wskazują na siebie nawzajem
+    for bracket in brackets:
+        nodes = list(bracket.nodes.using(using).values(
+            'id', 'athlete1__uid', 'athlete2__uid', 'winner__uid', 'round__uid', 'winner_to_id', 'loser_to_id',
+            *NODE_FIELDS,
+        ).order_by('id'))
+        positions = {node['id']: [node['section'], node['stage'], node['position']] for node in nodes}
+        _write(stream, {
+            'type': 'bracket_nodes',
+            'bracket': bracket.uid,
+            'nodes': [
+                {
+                    'athlete1': node['athlete1__uid'],
+                    'athlete2': node['athlete2__uid'],
+                    'winner': node['winner__uid'],
+                    'round': node['round__uid'],
+                    'winner_to': positions.get(node['winner_to_id']),
+                    'loser_to': positions.get(node['loser_to_id']),
+                    **{field: node[field] for field in NODE_FIELDS},
+                }
+                for node in nodes
+            ],
+        })
+
+    placements = Placement.objects.using(using).filter(tournament=tournament).order_by('athlete_id').values_list(
+        'athlete__uid', 'place',
+    )
+    _write(stream, {
+        'type': 'placements',
+        'athletes': [[uid, place] for uid, place in placements.iterator(chunk_size=BATCH_SIZE)],
+    })
+
+
+class _Importer:
+    def __init__(self, using, version=VERSION):
+        self.using = using
+        # Migawka w wersji 1 nie zna drabinek, ocen ani czasów walk - tych pól nie nadpisujemy
+        self.legacy = version == 1
+        self.clubs = {}
+        self.categories = {}
+        self.athletes = {}
+        self.pools = {}
+        self.brackets = {}
+        self.rounds = {}
+        self.tournament = None
+        self.pending = []
+        self.pending_type = None
+        self.changed_athletes = set()
+        self.changed_clubs = set()
+        self.previous_winners = {}  # {uid rundy: zwycięzca przed importem} dla rund ze zmienionym wynikiem
+        self.removed_results = False  # Usunięto rozstrzygnięte rundy, których nie ma już w bazie źródłowej
+
+    def add(self, record):
+        record_type = record.pop('type')
+        if record_type != self.pending_type:
+            self.flush()
+            self.pending_type = record_type
+        self.pending.append(record)
+        if len(self.pending) >= BATCH_SIZE:
+            self.flush()
+
+    def flush(self):
+        if self.pending:
+            getattr(self, f'_import_{self.pending_type}')(self.pending)
+        self.pending = []
+
+    def _by_natural_key(self, model, field, values):
+        return dict(model.objects.using(self.using).filter(**{f'{field}__in': values}).values_list(field, 'id'))
+
+    def _import_club(self, records):
+        names = [record['name'] for record in records]
+        existing = self._by_natural_key(Club, 'name', names)
+        Club.objects.using(self.using).bulk_create(
+            [Club(name=name) for name in names if name not in existing], batch_size=BATCH_SIZE,
+        )
+        if len(existing) < len(names):
+            reference.invalidate()
+        self.clubs.update(self._by_natural_key(Club, 'name', names))
+
+    def _import_category(self, records):
+        names = [record['name'] for record in records]
+        existing = self._by_natural_key(WeightCategory, 'name', names)
+        WeightCategory.objects.using(self.using).bulk_create(
+            [WeightCategory(**record) for record in records if record['name'] not in existing],
+            batch_size=BATCH_SIZE,
+        )
+        if len(existing) < len(names):
+            reference.invalidate()
+        self.categories.update(self._by_natural_key(WeightCategory, 'name', names))
+
+    def _import_athlete(self, records):
+        athletes = [
+            Athlete(
+                uid=uuid.UUID(record['uid']),
+                club_id=self.clubs[record['club']],
+                weight_category_id=self.categories.get(record['category']),
+                **{field: record[field] for field in ATHLETE_FIELDS},
+            )
+            for record in records
+        ]
+        # bulk_create omija Athlete.save
+        for athlete in athletes:
+            athlete.display_name = athlete.build_display_name()
+        # Zawodnik mógł zmienić klub - medale liczymy dla dawnego i nowego
+        self.changed_clubs.update(Athlete.objects.using(self.using).filter(
+            uid__in=[athlete.uid for athlete in athletes],
+        ).values_list('club_id', flat=True))
+        self.changed_clubs.update(athlete.club_id for athlete in athletes)
+        Athlete.objects.using(self.using).bulk_create(
+            athletes,
+            update_conflicts=True,
+            unique_fields=['uid'],
+            update_fields=['club', 'weight_category', 'display_name', *ATHLETE_FIELDS],
+            batch_size=BATCH_SIZE,
+        )
+        mapping = self._by_natural_key(Athlete, 'uid', [athlete.uid for athlete in athletes])
+        self.athletes.update(mapping)
+        self.changed_athletes.update(mapping.values())
+
+    def _import_tournament(self, records):
+        record = records[-1]
+        self.tournament, _ = Tournament.objects.using(self.using).update_or_create(
+            uid=uuid.UUID(record['uid']),
+            defaults={'name': record['name'], 'type': record['tournament_type'], 'date': record['date']},
+        )
+
+    def _athlete_ids(self, uids):
+        """Zawodnicy spoza migawki (migawka różnicowa) są szukani w bazie docelowej"""
+        missing = [uid for uid in uids if uuid.UUID(uid) not in self.athletes]
+        if missing:
+            self.athletes.update(self._by_natural_key(Athlete, 'uid', missing))
+        try:
+            return [self.athletes[uuid.UUID(uid)] for uid in uids]
+        except KeyError as exc:
+            raise SnapshotError(f"Zawodnik {exc.args[0]} nie istnieje w bazie docelowej.")
+
+    def _import_pool(self, records):
+        for record in records:
+            pool, _ = Pool.objects.using(self.using).update_or_create(
+                uid=uuid.UUID(record['uid']),
+                defaults={'tournament': self.tournament, 'name': record['name']},
+            )
+            pool.athletes.set(self._athlete_ids(record['athletes']))
+            self.pools[pool.uid] = pool.id
+
+    def _import_bracket(self, records):
+        brackets = [
+            Bracket(
+                uid=uuid.UUID(record['uid']), tournament_id=self.tournament.id,
+                **{field: record[field] for field in BRACKET_FIELDS},
+            )
+            for record in records
+        ]
+        Bracket.objects.using(self.using).bulk_create(
+            brackets,
+            update_conflicts=True,
+            unique_fields=['uid'],
+            update_fields=['tournament', *BRACKET_FIELDS],
+            batch_size=BATCH_SIZE,
+        )
+        self.brackets.update(self._by_natural_key(Bracket, 'uid', [bracket.uid for bracket in brackets]))
+
+    def _mapped(self, mapping, model, uids):
+        """Identyfikatory obiektów po `uid`; spoza migawki (migawka różnicowa) szukane w bazie docelowej"""
+        missing = [uid for uid in uids if uid and uuid.UUID(uid) not in mapping]
+        if missing:
+            mapping.update(self._by_natural_key(model, 'uid', missing))
+        try:
+            return [mapping[uuid.UUID(uid)] if uid else None for uid in uids]
+        except KeyError as exc:
+            raise SnapshotError(f"{model.__name__} {exc.args[0]} nie istnieje w bazie docelowej.")
+
+    def _import_registrations(self, records):
+        # Tylko różnica: każde usunięte zgłoszenie to sygnał i UPDATE liczników,
+        # a liczniki i tak przelicza później reconcile
+        through = Tournament.athletes.through
+        registrations = through.objects.using(self.using).filter(tournament=self.tournament)
+        athlete_ids = set(self._athlete_ids(records[-1]['athletes']))
+        existing = set(registrations.values_list('athlete_id', flat=True))
+        registrations.filter(athlete_id__in=existing - athlete_ids).delete()
+        through.objects.using(self.using).bulk_create(
+            [through(tournament_id=self.tournament.id, athlete_id=athlete_id) for athlete_id in athlete_ids - existing],
+            batch_size=BATCH_SIZE,
+        )
+
+    def _import_round(self, records):
+        uids = [uid for record in records for uid in (record['athlete1'], record['athlete2'])]
+        self._athlete_ids(uids)
+        pool_ids = self._mapped(self.pools, Pool, [record['pool'] for record in records])
+        bracket_ids = self._mapped(self.brackets, Bracket, [record.get('bracket') for record in records])
+
+        rounds = [
+            Round(
+                uid=uuid.UUID(record['uid']),
+                tournament_id=self.tournament.id,
+                pool_id=pool_id,
+                bracket_id=bracket_id,
+                athlete1_id=self.athletes[uuid.UUID(record['athlete1'])],
+                athlete2_id=self.athletes[uuid.UUID(record['athlete2'])],
+                winner_id=self.athletes[uuid.UUID(record['winner'])] if record['winner'] else None,
+                **{field: record[field] for field in self._round_fields()},
+            )
+            for record, pool_id, bracket_id in zip(records, pool_ids, bracket_ids)
+        ]
+        # Stan sprzed importu: zmienione wyniki trafiają do dziennika walk, dawni zawodnicy do przeliczeń
+        existing = {
+            uid: (winner_id, athlete1_id, athlete2_id)
+            for uid, winner_id, athlete1_id, athlete2_id in Round.objects.using(self.using).filter(
+                uid__in=[round_instance.uid for round_instance in rounds],
+            ).values_list('uid', 'winner_id', 'athlete1_id', 'athlete2_id')
+        }
+        for round_instance in rounds:
+            winner_id, *athlete_ids = existing.get(round_instance.uid, (None, None, None))
+            if winner_id != round_instance.winner_id:
+                self.previous_winners[round_instance.uid] = winner_id
+            self.changed_athletes.update(athlete_id for athlete_id in athlete_ids if athlete_id)
+
+        Round.objects.using(self.using).bulk_create(
+            rounds,
+            update_conflicts=True,
+            unique_fields=['uid'],
+            update_fields=[
+                'pool', 'athlete1', 'athlete2', 'winner', 'updated_at', *([] if self.legacy else ['bracket']),
+                *self._round_fields(),
+            ],
+            batch_size=BATCH_SIZE,
+        )
+        mapping = self._by_natural_key(Round, 'uid', [round_instance.uid for round_instance in rounds])
+        self.rounds.update(mapping)
+        if not self.legacy:
+            # Oceny sędziów rund z migawki są zastępowane rekordami judge_score, które idą zaraz po rundach
+            JudgeScore.objects.using(self.using).filter(round_id__in=mapping.values()).delete()
+        self.changed_athletes.update(round_instance.athlete1_id for round_instance in rounds)
+        self.changed_athletes.update(round_instance.athlete2_id for round_instance in rounds)
+
+    def _import_round_index(self, records):
+        present = {uuid.UUID(uid) for uid in records[-1]['rounds']}
+        rounds = Round.objects.using(self.using).filter(tournament=self.tournament)
+        removed = [
+            pk for pk, uid in rounds.values_list('pk', 'uid').iterator(chunk_size=BATCH_SIZE) if uid not in present
+        ]
+        # Pojedynczo przez delete(): receivery usuwania cofają wyniki w projekcjach i licznikach
+        for round_instance in rounds.filter(pk__in=removed):
+            self.changed_athletes.update((round_instance.athlete1_id, round_instance.athlete2_id))
+            self.removed_results |= round_instance.winner_id is not None
+            round_instance.delete()
+
+    def _round_fields(self):
+        return V1_ROUND_FIELDS if self.legacy else ROUND_FIELDS
+
+    def _import_judge_score(self, records):
+        round_ids = self._mapped(self.rounds, Round, [record['round'] for record in records])
+        athlete_ids = self._athlete_ids([record['athlete'] for record in records])
+        JudgeScore.objects.using(self.using).bulk_create([
+            JudgeScore(round_id=round_id, athlete_id=athlete_id, judge=record['judge'], score=record['score'])
+            for record, round_id, athlete_id in zip(records, round_ids, athlete_ids)
+        ], batch_size=BATCH_SIZE)
+
+    def _import_bracket_nodes(self, records):
+        for record in records:
+            bracket_id, = self._mapped(self.brackets, Bracket, [record['bracket']])
+            nodes = record['nodes']
+            self._athlete_ids([
+                uid for node in nodes for uid in (node['athlete1'], node['athlete2'], node['winner']) if uid
+            ])
+            round_ids = self._mapped(self.rounds, Round, [node['round'] for node in nodes])
+
+            BracketNode.objects.using(self.using).filter(bracket_id=bracket_id).delete()
+            created = BracketNode.objects.using(self.using).bulk_create([
+                BracketNode(
+                    bracket_id=bracket_id,
+                    athlete1_id=self.athletes[uuid.UUID(node['athlete1'])] if node['athlete1'] else None,
+                    athlete2_id=self.athletes[uuid.UUID(node['athlete2'])] if node['athlete2'] else None,
+                    winner_id=self.athletes[uuid.UUID(node['winner'])] if node['winner'] else None,
+                    round_id=round_id,
+                    **{field: node[field] for field in NODE_FIELDS},
+                )
+                for node, round_id in zip(nodes, round_ids)
+            ], batch_size=BATCH_SIZE)
+
+            # Powiązania między węzłami dopiero po zapisaniu wszystkich węzłów drabinki
+            by_position = {(node.section, node.stage, node.position): node for node in created}
+            for node, record_node in zip(created, nodes):
+                node.winner_to = by_position[tuple(record_node['winner_to'])] if record_node['winner_to'] else None
+                node.loser_to = by_position[tuple(record_node['loser_to'])] if record_node['loser_to'] else None
+            BracketNode.objects.using(self.using).bulk_update(created, ['winner_to', 'loser_to'], batch_size=BATCH_SIZE)
+
+    def _import_placements(self, records):
+        placements = self.tournament.placements.using(self.using)
+        previous = set(placements.values_list('athlete_id', flat=True))
+        uids = [uid for uid, _ in records[-1]['athletes']]
+        athlete_ids = self._athlete_ids(uids)
+        placements.delete()
+        Placement.objects.using(self.using).bulk_create([
+            Placement(tournament_id=self.tournament.id, athlete_id=athlete_id, place=place)
+            for athlete_id, (_, place) in zip(athlete_ids, records[-1]['athletes'])
+        ], batch_size=BATCH_SIZE)
+        self.changed_clubs.update(Athlete.objects.using(self.using).filter(
+            pk__in=previous | set(athlete_ids),
+        ).values_list('club_id', flat=True))
+
+
+def import_snapshot(stream, using='default'):
+    """
+    Wczytuje migawkę (pełną lub różnicową) do wskazanej bazy.
+
+    Kluby i kategorie są dopasowywane po nazwie, pozostałe obiekty po `uid`
+    (węzły drabinki po pozycji); istniejące rekordy są nadpisywane, nowe
+    tworzone paczkami `bulk_create`, a klucze główne przemapowywane na klucze
+    bazy docelowej. Na końcu odbudowywane są projekcje: dziennik walk,
+    indeks spotkań, bilanse sezonów, rankingi i medale klubów. Zwraca turniej.
+    """
+    with transaction.atomic(using=using):
+        lines = iter(stream)
+        try:
+            header = json.loads(next(lines))
+        except (StopIteration, ValueError):
+            raise SnapshotError("Plik nie jest migawką turnieju.")
+        if header.get('format') != FORMAT or header.get('version') not in SUPPORTED_VERSIONS:
+            raise SnapshotError("Nieobsługiwany format migawki.")
+
+        importer = _Importer(using, header['version'])
+
+        for line in lines:
+            importer.add(json.loads(line))
+        importer.flush()
+
+        if importer.tournament is None:
+            raise SnapshotError("Migawka nie zawiera turnieju.")
+
+        # Klucze dywizji zawierają id przedziałów i kategorii, więc liczymy je w bazie docelowej
+        divisions.refresh_division_keys(Registration.objects.using(using).filter(tournament=importer.tournament))
+        rounds = Round.objects.using(using).filter(tournament=importer.tournament)
+        divisions.refresh_division_keys(rounds, athlete_field='athlete1_id')
+        importer.tournament.brackets.using(using).update(division_key=Coalesce(
+            Subquery(rounds.filter(bracket=OuterRef('pk')).order_by('id').values('division_key')[:1]),
+            F('division_key'),
+        ))
+
+        eligibility.invalidate([importer.tournament.id])
+        # Zgłoszenia i wyniki wczytane zbiorczo omijają sygnały liczników
+        counters.reconcile([importer.tournament.id], using=using)
+        _rebuild_projections(importer, using)
+    return importer.tournament
+
+
+def _rebuild_projections(importer, using):
+    """Wyniki i miejsca wczytane zbiorczo omijają Round.save i sygnały, więc projekcje odbudowujemy tutaj"""
+    if importer.previous_winners:
+        changed = Round.objects.using(using).filter(uid__in=list(importer.previous_winners)).order_by('id')
+        bout_log.append_events(changed, {
+            round_instance.id: importer.previous_winners[round_instance.uid] for round_instance in changed
+        }, using=using)
+    if importer.previous_winners or importer.removed_results:
+        # Ranking zależy od kolejności wszystkich walk, więc jest przeliczany w całości
+        ratings.rebuild_ratings(using=using)
+    if importer.changed_athletes:
+        athlete_ids = list(importer.changed_athletes)
+        head_to_head.rebuild(athlete_ids=athlete_ids, using=using)
+        leaderboards.rebuild_season_stats(athlete_ids=athlete_ids, using=using)
+    if importer.changed_clubs:
+        leaderboards.rebuild_club_medals(club_ids=list(importer.changed_clubs), using=using)
+
+
+def parse_since(value):
+    since = parse_datetime(value)
+    if since is None:
+        raise SnapshotError(f"Nieprawidłowa data: {value}")
+    if timezone.is_naive(since):
+        since = timezone.make_aware(since)
+    return since
@@ -0,0 +1,29 @@
+import time
+
+from django.template.backends.django import DjangoTemplates, Template
+
+
+class TimedTemplate(Template):
+    def render(self, context=None, request=None):
+        start = time.perf_counter()
+        try:
+            return super().render(context, request)
+        finally:
+            if request is not None:
+                # Kilka szablonów w jednym żądaniu (np. fragmenty strony) - czasy się sumują
+                elapsed = time.perf_counter() - start
+                request._metrics_render_seconds = getattr(request, '_metrics_render_seconds', 0.0) + elapsed
+
+
+class InstrumentedDjangoTemplates(DjangoTemplates):
+    """
+    DjangoTemplates, który dolicza czas renderowania do żądania - dla
+    `render()` w widokach funkcyjnych i dla TemplateResponse tak samo.
+    Czas odczytuje InstrumentationMiddleware.
+    """
+
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        return TimedTemplate(super().get_template(template_name).template, self)
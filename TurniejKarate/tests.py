@@ -2,11 +2,27 @@ import pytest
 from django.urls import reverse
 from django.test import Client
 from django.core.exceptions import ValidationError
-from TurniejKarate.models import Tournament, Athlete, Round, Club, WeightCategory
+from TurniejKarate.models import Tournament, Athlete, Round, Club, WeightCategory, JudgeScore
 from TurniejKarate.forms import RoundForm
 from django.contrib.auth.models import User
 
 
+@pytest.fixture(autouse=True)
+def clear_reference_data():
+    # Dane słownikowe z poprzedniego testu zniknęły razem z wycofaną transakcją
+    from TurniejKarate.reference import reference_data
+    reference_data.clear()
+    yield
+    reference_data.clear()
+
+
+@pytest.fixture(autouse=True)
+def clear_fragment_cache():
+    # Klucze fragmentów zawierają id turniejów, które powtarzają się między testami
+    from django.core.cache import cache
+    cache.clear()
+
+
 @pytest.fixture
 def user():
     user = User.objects.create_user(username='testuser', password='password')
@@ -104,6 +120,8 @@ def test_round_form_valid_data(athlete1, athlete2, tournament):
     athlete2.gender = "F"
     athlete1.save()
     athlete2.save()
+    # Formularz oferuje tylko zawodników zgłoszonych do turnieju
+    tournament.athletes.add(athlete1, athlete2)
 
     form_data = {
         'tournament': tournament.id,
@@ -125,6 +143,7 @@ def test_round_form_valid_data(athlete1, athlete2, tournament):
 
 @pytest.mark.django_db
 def test_round_form_invalid_winner(athlete1, athlete2, tournament):
+    tournament.athletes.add(athlete1, athlete2)
     form_data = {
         'tournament': tournament.id,
         'athlete1': athlete1.id,
@@ -164,6 +183,7 @@ def test_round_create_view_get(client, tournament, athlete1, athlete2, user):
 def test_round_create_view_post_invalid(client, tournament, athlete1, athlete2, user):
     # Zalogowanie użytkownika przed wysłaniem zapytania
     client.login(username=user.username, password='password')  # Użyj odpowiednich danych użytkownika
+    tournament.athletes.add(athlete1, athlete2)
 
     url = reverse('round_create')
     form_data = {
@@ -356,3 +376,1834 @@ def test_female_vs_female_can_fight(client, tournament, athlete1, athlete2):
         round_.clean()  # Nie powinno rzucić błędu
     except ValidationError:
         pytest.fail("Test failed: Female vs Female should be allowed")
+
+
+@pytest.mark.django_db
+def test_weigh_in_batch_updates_and_flags(client, user, tournament, club):
+    lightweight = WeightCategory.objects.create(name="Lightweight", min_weight=60, max_weight=70)
+    WeightCategory.objects.create(name="Middleweight", min_weight=70.01, max_weight=80)
+    registered = Athlete.objects.create(
+        first_name="Adam", last_name="Nowak", age=20, weight=68, gender="M",
+        belt_level="blue", karate_style="shotokan", club=club, weight_category=lightweight
+    )
+    unassigned = Athlete.objects.create(
+        first_name="Piotr", last_name="Kowalski", age=22, weight=0.5, gender="M",
+        belt_level="blue", karate_style="shotokan", club=club
+    )
+    tournament.athletes.add(registered, unassigned)
+    client.login(username=user.username, password='password')
+
+    url = reverse('weigh_in', args=[tournament.id])
+    response = client.post(url, data={'measurements': [
+        {'athlete': registered.id, 'weight': '72.5'},
+        {'athlete': unassigned.id, 'weight': '65'},
+        {'athlete': 9999, 'weight': '65'},
+        {'athlete': registered.id, 'weight': 'abc'},
+        {'athlete': unassigned.id, 'weight': 'NaN'},
+    ]}, content_type='application/json')
+
+    assert response.status_code == 200
+    data = response.json()
+    results = {result['athlete']: result for result in data['results']}
+    assert results[registered.id]['flagged'] is True
+    assert results[registered.id]['category'] == "Middleweight"
+    assert results[unassigned.id]['flagged'] is False
+    assert 'error' in results[9999]
+    assert len(data['errors']) == 2
+
+    registered.refresh_from_db()
+    unassigned.refresh_from_db()
+    assert float(registered.weight) == 72.5
+    assert registered.weight_category == lightweight  # Zgłoszona kategoria zostaje do decyzji organizatora
+    assert unassigned.weight_category == lightweight
+
+
+@pytest.mark.django_db
+def test_weigh_in_rejects_invalid_payload(client, user, tournament):
+    client.login(username=user.username, password='password')
+    url = reverse('weigh_in', args=[tournament.id])
+    assert client.get(url).status_code == 200
+
+    response = client.post(url, data='nie-json', content_type='application/json')
+    assert response.status_code == 400
+
+
+@pytest.mark.django_db
+def test_audit_tournament_finds_violations(tournament, club):
+    from TurniejKarate.audit import audit_tournament, count_violations
+
+    lightweight = WeightCategory.objects.create(name="Lightweight", min_weight=60, max_weight=70)
+    heavyweight = WeightCategory.objects.create(name="Heavyweight", min_weight=80, max_weight=100)
+    man = Athlete.objects.create(
+        first_name="Adam", last_name="Nowak", age=20, weight=75, gender="M",
+        belt_level="blue", karate_style="shotokan", club=club, weight_category=lightweight
+    )
+    other_man = Athlete.objects.create(
+        first_name="Piotr", last_name="Kowalski", age=22, weight=85, gender="M",
+        belt_level="blue", karate_style="shotokan", club=club, weight_category=heavyweight
+    )
+    woman = Athlete.objects.create(
+        first_name="Anna", last_name="Zielińska", age=21, weight=65, gender="F",
+        belt_level="blue", karate_style="shotokan", club=club, weight_category=lightweight
+    )
+    tournament.athletes.add(man, other_man, woman)
+
+    # Zapisy z pominięciem walidacji formularza
+    Round.objects.bulk_create([
+        Round(tournament=tournament, athlete1=man, athlete2=woman, round_number=1, winner=woman),
+        Round(tournament=tournament, athlete1=man, athlete2=other_man, round_number=2),
+    ])
+
+    report = {section['key']: section['violations'] for section in audit_tournament(tournament)}
+    assert len(report['cross_gender']) == 1
+    assert len(report['category_mismatch']) == 1
+    assert [v['object'] for v in report['out_of_range']] == [man]
+    assert len(report['after_elimination']) == 1
+    assert report['invalid_winner'] == []
+    assert count_violations(audit_tournament(tournament)) == 4
+
+
+@pytest.mark.django_db
+def test_audit_duplicate_places_per_division_and_tournament(tournament, club):
+    from TurniejKarate.audit import audit_tournament
+    from TurniejKarate.models import Placement
+
+    first, second, third = _division_athletes(club, 3)
+    woman = Athlete.objects.create(
+        first_name="Anna", last_name="Zielińska", age=21, weight=65, gender="F",
+        belt_level="blue", karate_style="shotokan", club=club,
+    )
+    tournament.athletes.set([first, second, third, woman])
+    # Zwycięzcy dwóch dywizji oraz miejsce z innego turnieju zapisane w Athlete.place
+    Placement.objects.bulk_create([
+        Placement(tournament=tournament, athlete=first, place=1),
+        Placement(tournament=tournament, athlete=woman, place=1),
+    ])
+    Athlete.objects.filter(pk=second.pk).update(place=1)
+    report = {section['key']: section['violations'] for section in audit_tournament(tournament)}
+    assert report['duplicate_places'] == []
+
+    Placement.objects.create(tournament=tournament, athlete=third, place=1)
+    report = {section['key']: section['violations'] for section in audit_tournament(tournament)}
+    assert [violation['message'] for violation in report['duplicate_places']] == [
+        "Male, Każdy wiek, Każdy pas, Brak kategorii: miejsce 1 ma 2 zawodników",
+    ]
+
+
+@pytest.mark.django_db
+def test_audit_tournament_command_strict(tournament):
+    from django.core.management import call_command, CommandError
+
+    call_command('audit_tournament', tournament.id, '--strict')
+    with pytest.raises(CommandError):
+        call_command('audit_tournament', 9999)
+
+
+def test_circle_schedule_pairs_everyone_once():
+    from TurniejKarate.pools import circle_schedule
+
+    schedule = circle_schedule(['A', 'B', 'C', 'D', 'E'])
+    pairs = [frozenset(pair) for matchday in schedule for pair in matchday]
+    assert len(schedule) == 5
+    assert len(pairs) == 10
+    assert len(set(pairs)) == 10
+    # W każdej kolejce zawodnik walczy najwyżej raz
+    for matchday in schedule:
+        athletes = [athlete for pair in matchday for athlete in pair]
+        assert len(athletes) == len(set(athletes))
+
+
+@pytest.mark.django_db
+def test_pool_standings_with_head_to_head(tournament, club):
+    from TurniejKarate.pools import create_pool, pool_standings
+
+    athletes = [
+        Athlete.objects.create(
+            first_name=name, last_name="Pool", age=20, weight=70, gender="M",
+            belt_level="blue", karate_style="shotokan", club=club
+        )
+        for name in ["A", "B", "C"]
+    ]
+    tournament.athletes.add(*athletes)
+    pool = create_pool(tournament, "Grupa A", athletes)
+    assert pool.rounds.count() == 3
+
+    a, b, c = athletes
+    results = {frozenset([a.id, b.id]): (a, 5, 1), frozenset([b.id, c.id]): (b, 3, 0), frozenset([a.id, c.id]): (c, 2, 1)}
+    for round_instance in pool.rounds.all():
+        winner, winner_points, loser_points = results[frozenset([round_instance.athlete1_id, round_instance.athlete2_id])]
+        round_instance.winner = winner
+        if winner.id == round_instance.athlete1_id:
+            round_instance.athlete1_points, round_instance.athlete2_points = winner_points, loser_points
+        else:
+            round_instance.athlete1_points, round_instance.athlete2_points = loser_points, winner_points
+        round_instance.save()
+
+    # Przegrani w grupie nie odpadają z turnieju
+    assert tournament.athletes.filter(id__in=[a.id, b.id, c.id]).count() == 3
+
+    table = pool_standings([pool])[pool.id]
+    assert [row['wins'] for row in table] == [1, 1, 1]
+    assert [row['head_to_head'] for row in table] == [1, 1, 1]
+    assert table[0]['athlete_id'] == a.id  # Najlepsza różnica punktów: 6:3
+    assert table[0]['points_for'] == 6 and table[0]['points_against'] == 3
+
+
+@pytest.mark.django_db
+def test_create_pool_rejects_mixed_genders(tournament, athlete1, athlete2, club):
+    from TurniejKarate.pools import create_pool
+
+    third = Athlete.objects.create(
+        first_name="Ola", last_name="Nowak", age=20, weight=60, gender="F",
+        belt_level="blue", karate_style="shotokan", club=club
+    )
+    with pytest.raises(ValidationError):
+        create_pool(tournament, "Grupa B", [athlete1, athlete2, third])
+
+
+@pytest.fixture
+def kata_round(tournament, club):
+    athletes = [
+        Athlete.objects.create(
+            first_name=name, last_name="Kata", age=20, weight=70, gender="F",
+            belt_level="black", karate_style="shotokan", club=club
+        )
+        for name in ["Ewa", "Ola"]
+    ]
+    tournament.athletes.add(*athletes)
+    return Round.objects.create(tournament=tournament, athlete1=athletes[0], athlete2=athletes[1], round_number=1)
+
+
+def _kata_payload(round_, athlete1_scores, athlete2_scores):
+    return {'scores': [
+        {'round': round_.id, 'athlete': athlete.id, 'judge': judge, 'score': score}
+        for athlete, scores in ((round_.athlete1, athlete1_scores), (round_.athlete2, athlete2_scores))
+        for judge, score in enumerate(scores, start=1)
+    ]}
+
+
+@pytest.mark.django_db
+def test_kata_scores_trimmed_total_decides_winner(client, user, tournament, kata_round):
+    client.login(username=user.username, password='password')
+    url = reverse('kata_scores')
+
+    payload = _kata_payload(kata_round, ['8.0', '8.2', '8.4', '9.9', '7.0'], ['8.3', '8.3', '8.3', '8.3', '8.3'])
+    response = client.post(url, data=payload, content_type='application/json')
+    assert response.status_code == 200
+
+    kata_round.refresh_from_db()
+    # 8.0 + 8.2 + 8.4 = 24.6 (odrzucone 9.9 i 7.0) wobec 24.9
+    assert float(kata_round.athlete1_score) == 24.6
+    assert float(kata_round.athlete2_score) == 24.9
+    assert kata_round.winner == kata_round.athlete2
+    assert not tournament.athletes.filter(id=kata_round.athlete1_id).exists()
+    assert kata_round.athlete1.place is not None
+
+
+@pytest.mark.django_db
+def test_kata_score_correction_reverses_result(client, user, tournament, kata_round):
+    client.login(username=user.username, password='password')
+    url = reverse('kata_scores')
+    payload = _kata_payload(kata_round, ['8.0', '8.2', '8.4', '9.9', '7.0'], ['8.3', '8.3', '8.3', '8.3', '8.3'])
+    client.post(url, data=payload, content_type='application/json')
+
+    # Sędzia 2 poprawia ocenę pierwszej zawodniczki
+    correction = {'scores': [{'round': kata_round.id, 'athlete': kata_round.athlete1_id, 'judge': 2, 'score': '9.0'}]}
+    response = client.post(url, data=correction, content_type='application/json')
+    assert response.json()['results'][0]['winner'] == kata_round.athlete1_id
+
+    kata_round.refresh_from_db()
+    assert kata_round.winner == kata_round.athlete1
+    assert JudgeScore.objects.filter(round=kata_round).count() == 10
+    assert tournament.athletes.filter(id=kata_round.athlete1_id).exists()
+    assert not tournament.athletes.filter(id=kata_round.athlete2_id).exists()
+    kata_round.athlete1.refresh_from_db()
+    kata_round.athlete2.refresh_from_db()
+    # W dwuosobowym turnieju korekta finału zamienia miejsca
+    assert (kata_round.athlete1.place, kata_round.athlete2.place) == (1, 2)
+
+
+
+@pytest.mark.django_db
+def test_kata_score_correction_to_tie_clears_winner(client, user, tournament, kata_round):
+    client.login(username=user.username, password='password')
+    url = reverse('kata_scores')
+    client.post(url, data=_kata_payload(kata_round, ['8.0'] * 5, ['8.5'] * 5), content_type='application/json')
+    kata_round.refresh_from_db()
+    assert kata_round.winner == kata_round.athlete2
+
+    # Korekta wyrównuje wynik: runda nie ma zwycięzcy, a przegrana wraca do turnieju bez miejsca
+    correction = _kata_payload(kata_round, [], ['8.0'] * 5)
+    correction['scores'].append({'round': kata_round.id, 'athlete': kata_round.athlete1_id, 'judge': 1, 'score': 'NaN'})
+    response = client.post(url, data=correction, content_type='application/json')
+    assert response.status_code == 200
+    assert len(response.json()['errors']) == 1
+    assert response.json()['results'][0]['winner'] is None
+
+    kata_round.refresh_from_db()
+    assert kata_round.winner is None
+    assert tournament.athletes.filter(id=kata_round.athlete1_id).exists()
+    kata_round.athlete1.refresh_from_db()
+    assert kata_round.athlete1.place is None
+
+
+@pytest.mark.django_db
+def test_kata_correction_of_finished_bracket_round_conflicts(client, user, tournament, club):
+    from TurniejKarate.brackets import build_bracket
+
+    tournament.athletes.set(_division_athletes(club, 4))
+    bracket = build_bracket(tournament, "M-0-0-0")
+    _decide(bracket)
+    _decide(bracket)
+    semifinal = bracket.rounds.order_by('id').first()
+
+    client.login(username=user.username, password='password')
+    response = client.post(
+        reverse('kata_scores'), data=_kata_payload(semifinal, ['7.0'] * 5, ['9.0'] * 5), content_type='application/json',
+    )
+    assert response.status_code == 409
+    assert not JudgeScore.objects.exists()
+
+@pytest.mark.django_db
+def test_kata_scores_reject_foreign_athlete(client, user, kata_round, athlete1):
+    client.login(username=user.username, password='password')
+    payload = {'scores': [{'round': kata_round.id, 'athlete': athlete1.id, 'judge': 1, 'score': '8.0'}]}
+    response = client.post(reverse('kata_scores'), data=payload, content_type='application/json')
+    assert len(response.json()['errors']) == 1
+    assert not JudgeScore.objects.exists()
+
+
+@pytest.mark.django_db
+def test_find_duplicates_uses_blocks(club):
+    from TurniejKarate.dedupe import find_duplicates
+
+    other_club = Club.objects.create(name="Other Club")
+    common = dict(weight=70, gender="M", belt_level="blue", karate_style="shotokan")
+    original = Athlete.objects.create(first_name="Paweł", last_name="Wiśniewski", age=20, club=club, **common)
+    typo = Athlete.objects.create(first_name="Pawel", last_name="Wisniewski", age=21, club=club, **common)
+    Athlete.objects.create(first_name="Pawel", last_name="Wisniewski", age=25, club=club, **common)
+    Athlete.objects.create(first_name="Pawel", last_name="Wisniewski", age=20, club=other_club, **common)
+
+    pairs = find_duplicates()
+    assert [(keep, duplicate) for keep, duplicate, _ in pairs] == [(original.id, typo.id)]
+
+
+@pytest.mark.django_db
+def test_merge_athletes_repoints_history(tournament, club):
+    from TurniejKarate.dedupe import merge_athletes
+
+    common = dict(age=20, weight=70, gender="M", belt_level="blue", karate_style="shotokan", club=club)
+    keep = Athlete.objects.create(first_name="Jan", last_name="Kowalski", **common)
+    duplicate = Athlete.objects.create(first_name="Jan", last_name="Kowalsky", **common)
+    opponent = Athlete.objects.create(first_name="Adam", last_name="Nowak", **common)
+    other_tournament = Tournament.objects.create(name="Other", date="2024-02-01")
+    tournament.athletes.add(keep, duplicate, opponent)
+    other_tournament.athletes.add(duplicate)
+    Round.objects.bulk_create([
+        Round(tournament=tournament, athlete1=duplicate, athlete2=opponent, round_number=1, winner=duplicate),
+    ])
+
+    merge_athletes(keep, duplicate)
+
+    assert not Athlete.objects.filter(id=duplicate.id).exists()
+    assert Round.objects.get().athlete1 == keep
+    assert Round.objects.get().winner == keep
+    assert list(keep.tournaments.order_by('id')) == [tournament, other_tournament]
+
+
+@pytest.mark.django_db
+def test_merge_athletes_merges_ratings_and_touches_only_their_clubs(tournament, club):
+    from TurniejKarate.dedupe import merge_athletes
+    from TurniejKarate.models import AthleteRating, ClubMedals
+
+    other_club = Club.objects.create(name="Inny klub")
+    unrelated = Club.objects.create(name="Niezwiązany klub")
+    ClubMedals.objects.create(club=unrelated, tournament_type=ClubMedals.ALL_TYPES, gold=7)
+    keep, opponent, rival = _division_athletes(club, 3)
+    duplicate = _division_athletes(other_club, 1)[0]
+    for number, (first, second) in enumerate([(keep, opponent), (duplicate, rival)], start=1):
+        Round.objects.create(tournament=tournament, athlete1=first, athlete2=second, round_number=number, winner=first)
+    ratings = dict(AthleteRating.objects.values_list('athlete_id', 'rating'))
+    expected = ratings[keep.id] + ratings[duplicate.id] - AthleteRating.INITIAL_RATING
+
+    merge_athletes(keep, duplicate)
+
+    merged = AthleteRating.objects.get(athlete=keep)
+    assert merged.rating == pytest.approx(expected)
+    assert merged.bouts == 2
+    assert ClubMedals.objects.get(club=unrelated).gold == 7
+
+
+@pytest.mark.django_db
+def test_merge_athletes_who_fought_each_other(tournament, club):
+    from django.db.models import F
+    from TurniejKarate import bout_log
+    from TurniejKarate.dedupe import merge_athletes
+    from TurniejKarate.leaderboards import rebuild_season_stats
+    from TurniejKarate.models import AthleteRating, AthleteSeasonStats, HeadToHead
+
+    keep, duplicate, opponent = _division_athletes(club, 3)
+    Round.objects.create(tournament=tournament, athlete1=keep, athlete2=opponent, round_number=1, winner=keep)
+    Round.objects.create(tournament=tournament, athlete1=duplicate, athlete2=keep, round_number=2, winner=duplicate)
+
+    merge_athletes(keep, duplicate)
+
+    assert not Round.objects.filter(athlete1=F('athlete2')).exists()
+    assert not HeadToHead.objects.filter(athlete_low=F('athlete_high')).exists()
+    stats = AthleteSeasonStats.objects.get(athlete=keep)
+    assert (stats.bouts, stats.wins, stats.losses) == (1, 1, 0)
+    rebuild_season_stats()
+    stats = AthleteSeasonStats.objects.get(athlete=keep)
+    assert (stats.bouts, stats.wins, stats.losses) == (1, 1, 0)
+    # Zostają tylko punkty z walki z przeciwnikiem
+    rating = AthleteRating.objects.get(athlete=keep)
+    assert (rating.bouts, rating.rating) == (1, pytest.approx(1500 + Round.objects.get().rating_delta))
+    assert bout_log.check_projections() == []
+
+
+@pytest.mark.django_db
+def test_head_to_head_updated_incrementally(client, user, tournament, club):
+    from TurniejKarate import head_to_head
+
+    common = dict(age=20, weight=70, gender="M", belt_level="blue", karate_style="shotokan", club=club)
+    first = Athlete.objects.create(first_name="Jan", last_name="Kowalski", **common)
+    second = Athlete.objects.create(first_name="Adam", last_name="Nowak", **common)
+    tournament.athletes.add(first, second)
+
+    round_ = Round.objects.create(tournament=tournament, athlete1=first, athlete2=second, round_number=1)
+    assert head_to_head.lookup(first.id, second.id)['bouts'] == 0
+
+    round_.set_winner(second)
+    history = head_to_head.lookup(first.id, second.id)
+    assert (history['bouts'], history['wins'], history['losses']) == (1, 0, 1)
+    assert history['last_round'] == round_.id
+
+    # Korekta wyniku przenosi zwycięstwo, nie dodaje walki
+    round_.set_winner(first)
+    history = head_to_head.lookup(second.id, first.id)
+    assert (history['bouts'], history['wins'], history['losses']) == (1, 0, 1)
+
+    client.login(username=user.username, password='password')
+    response = client.get(reverse('round_head_to_head', args=[round_.id]))
+    assert response.json()['wins'] == 1
+
+
+@pytest.mark.django_db
+def test_deleting_decided_round_reverses_athlete_projections(tournament, club):
+    from TurniejKarate import bout_log, head_to_head
+    from TurniejKarate.models import AthleteRating, AthleteSeasonStats
+
+    first, second = _division_athletes(club, 2)
+    tournament.athletes.add(first, second)
+    kept = Round.objects.create(tournament=tournament, athlete1=first, athlete2=second, round_number=1, mat=1)
+    kept.set_winner(first)
+    deleted = Round.objects.create(tournament=tournament, athlete1=first, athlete2=second, round_number=2, mat=1)
+    deleted.set_winner(second)
+
+    deleted.delete()
+
+    history = head_to_head.lookup(first.id, second.id)
+    assert (history['bouts'], history['wins'], history['last_round']) == (1, 1, kept.id)
+    assert sorted(AthleteSeasonStats.objects.values_list('bouts', 'wins', 'losses')) == [(1, 0, 1), (1, 1, 0)]
+    ratings = dict(AthleteRating.objects.values_list('athlete_id', 'bouts'))
+    assert ratings == {first.id: 1, second.id: 1}
+    kept.refresh_from_db()
+    assert AthleteRating.objects.get(athlete=first).rating == pytest.approx(1500 + kept.rating_delta)
+    assert bout_log.check_projections() == []
+
+    tournament.delete()
+    assert head_to_head.lookup(first.id, second.id)['bouts'] == 0
+    assert AthleteRating.objects.get(athlete=first).rating == pytest.approx(1500)
+
+
+@pytest.mark.django_db
+def test_backfill_head_to_head_matches_incremental(tournament, club):
+    from django.core.management import call_command
+    from TurniejKarate.models import HeadToHead
+
+    common = dict(age=20, weight=70, gender="M", belt_level="blue", karate_style="shotokan", club=club)
+    first = Athlete.objects.create(first_name="Jan", last_name="Kowalski", **common)
+    second = Athlete.objects.create(first_name="Adam", last_name="Nowak", **common)
+    Round.objects.bulk_create([
+        Round(tournament=tournament, athlete1=first, athlete2=second, round_number=1, winner=first),
+        Round(tournament=tournament, athlete1=second, athlete2=first, round_number=2, winner=first),
+        Round(tournament=tournament, athlete1=second, athlete2=first, round_number=3),
+    ])
+
+    call_command('backfill_head_to_head')
+
+    entry = HeadToHead.objects.get()
+    assert (entry.athlete_low_id, entry.bouts, entry.wins_low, entry.wins_high) == (first.id, 2, 2, 0)
+
+
+@pytest.mark.django_db
+def test_head_to_head_last_meeting_compares_dates(club):
+    from datetime import date
+    from TurniejKarate.models import HeadToHead
+
+    first, second = _division_athletes(club, 2)
+    autumn = Tournament.objects.create(name="Jesień", date=date(2024, 10, 1))
+    Round.objects.create(tournament=autumn, athlete1=first, athlete2=second, round_number=1).set_winner(first)
+
+    # Turniej w pamięci trzyma datę jako podany tekst; jako napisy "2024-5-1" > "2024-10-01"
+    spring = Tournament.objects.create(name="Wiosna", date="2024-5-1")
+    Round.objects.create(tournament=spring, athlete1=first, athlete2=second, round_number=1).set_winner(second)
+
+    assert HeadToHead.objects.get().last_date == date(2024, 10, 1)
+
+
+@pytest.mark.django_db
+def test_metrics_endpoint_reports_views(client, user, tournament):
+    from TurniejKarate.metrics import registry
+
+    registry.reset()
+    client.login(username=user.username, password='password')
+    client.get(reverse('round_list'))
+
+    response = client.get(reverse('metrics'))
+    assert response.status_code == 200
+    body = response.content.decode()
+    assert 'karate_requests_total{view="round_list",method="GET",status="200"} 1' in body
+    assert 'karate_request_duration_seconds_count{view="round_list",method="GET"} 1' in body
+    assert 'karate_db_queries_per_request_bucket{view="round_list",le="+Inf"} 1' in body
+    assert 'karate_template_render_seconds_count{view="round_list"} 1' in body
+
+    # Widok funkcyjny z render() zamiast TemplateResponse
+    client.get(reverse('schedule_conflicts', args=[tournament.id]))
+    body = client.get(reverse('metrics')).content.decode()
+    assert 'karate_template_render_seconds_count{view="schedule_conflicts"} 1' in body
+
+
+@pytest.mark.django_db
+def test_slow_requests_are_traced_with_sql(client, tournament, settings, tmp_path):
+    import json
+    from TurniejKarate.middleware import slow_request_logger
+
+    log_file = tmp_path / 'slow.log'
+    settings.SLOW_REQUEST_LOG = str(log_file)
+    settings.SLOW_REQUEST_THRESHOLD = 0
+    try:
+        client.get(reverse('tournament_detail', args=[tournament.id]))
+    finally:
+        for handler in list(slow_request_logger.handlers):
+            handler.close()
+            slow_request_logger.removeHandler(handler)
+
+    trace = json.loads(log_file.read_text().splitlines()[0])
+    assert trace['path'] == f'/tournament/{tournament.id}/'
+    assert trace['view'] == 'tournament_detail'
+    assert trace['query_count'] == len(trace['queries']) > 0
+
+
+@pytest.mark.django_db
+def test_snapshot_roundtrip_and_delta(tournament, club):
+    import io
+    from django.utils import timezone
+    from TurniejKarate.snapshot import export_snapshot, import_snapshot
+
+    category = WeightCategory.objects.create(name="Lightweight", min_weight=60, max_weight=70)
+    common = dict(age=20, weight=65, gender="M", belt_level="blue", karate_style="shotokan", club=club)
+    first = Athlete.objects.create(first_name="Jan", last_name="Kowalski", weight_category=category, **common)
+    second = Athlete.objects.create(first_name="Adam", last_name="Nowak", weight_category=category, **common)
+    tournament.athletes.add(first, second)
+    Round.objects.create(tournament=tournament, athlete1=first, athlete2=second, round_number=1)
+
+    full = io.BytesIO()
+    export_snapshot(tournament, full)
+    uids = (tournament.uid, first.uid, Round.objects.get().uid)
+
+    # Baza docelowa bez tego turnieju (inne klucze główne)
+    Tournament.objects.all().delete()
+    Athlete.objects.all().delete()
+    Club.objects.all().delete()
+
+    imported = import_snapshot(io.BytesIO(full.getvalue()))
+    assert imported.uid == uids[0]
+    assert imported.athletes.count() == 2
+    round_ = Round.objects.get(uid=uids[2])
+    assert round_.athlete1.uid == uids[1]
+    assert round_.athlete1.weight_category.name == "Lightweight"
+
+    since = timezone.now()
+    round_.set_winner(round_.athlete1)
+    delta = io.BytesIO()
+    export_snapshot(imported, delta, since=since)
+
+    # Stan centralny sprzed walki; różnica przenosi wynik, miejsce i zgłoszenia
+    Round.objects.update(winner=None)
+    Athlete.objects.update(place=None)
+    imported.athletes.add(round_.athlete2)
+    import_snapshot(io.BytesIO(delta.getvalue()))
+
+    round_.refresh_from_db()
+    assert round_.winner.uid == uids[1]
+    assert list(imported.athletes.all()) == [round_.athlete1]
+    assert Athlete.objects.get(id=round_.athlete2_id).place == 2
+
+
+@pytest.mark.django_db
+def test_snapshot_import_keeps_registrations_and_drops_deleted_rounds(tournament, club):
+    import io
+    from django.utils import timezone
+    from TurniejKarate.models import HeadToHead, Registration
+    from TurniejKarate.snapshot import export_snapshot, import_snapshot
+
+    first, second = _division_athletes(club, 2)
+    tournament.athletes.set([first, second])
+    Round.objects.create(tournament=tournament, athlete1=first, athlete2=second, round_number=1)
+    decided = Round.objects.create(tournament=tournament, athlete1=first, athlete2=second, round_number=2)
+    decided.set_winner(first)
+    registrations = set(Registration.objects.values_list('id', flat=True))
+
+    full = io.BytesIO()
+    export_snapshot(tournament, full)
+    since = timezone.now()
+    decided.delete()
+    delta = io.BytesIO()
+    export_snapshot(tournament, delta, since=since)
+
+    # Pełny import przywraca rundę, a niezmienionych zgłoszeń nie tworzy od nowa
+    import_snapshot(io.BytesIO(full.getvalue()))
+    assert set(Registration.objects.values_list('id', flat=True)) == registrations
+    assert Round.objects.filter(uid=decided.uid).exists()
+    assert HeadToHead.objects.get().bouts == 1
+
+    # Różnica nie ma już usuniętej rundy, więc znika ona razem z wynikiem
+    import_snapshot(io.BytesIO(delta.getvalue()))
+    assert list(Round.objects.values_list('round_number', flat=True)) == [1]
+    assert not HeadToHead.objects.filter(bouts__gt=0).exists()
+
+
+@pytest.mark.django_db
+def test_snapshot_restores_brackets_scores_and_projections(tournament, club):
+    import io
+    from datetime import timedelta
+    from decimal import Decimal
+    from django.utils import timezone
+    from TurniejKarate import bout_log, head_to_head
+    from TurniejKarate.brackets import build_bracket
+    from TurniejKarate.models import AthleteRating, AthleteSeasonStats, Bracket, BracketNode, ClubMedals, Placement
+    from TurniejKarate.snapshot import export_snapshot, import_snapshot
+
+    athletes = _division_athletes(club, 4)
+    tournament.athletes.set(athletes)
+    bracket = build_bracket(tournament, "M-0-0-0")
+    _decide(bracket)
+    _decide(bracket)
+    final = bracket.rounds.order_by('-id').first()
+    started = timezone.now().replace(microsecond=0)
+    Round.objects.filter(pk=final.pk).update(mat=3, started_at=started, ended_at=started + timedelta(minutes=2))
+    JudgeScore.objects.create(round=final, athlete=final.athlete1, judge=1, score=Decimal('8.5'))
+
+    def state():
+        return {
+            'nodes': sorted(BracketNode.objects.values_list(
+                'section', 'stage', 'position', 'athlete1__uid', 'winner__uid', 'round__uid',
+                'winner_to__stage', 'decided',
+            )),
+            'rounds': sorted(Round.objects.values_list('uid', 'bracket__uid', 'winner__uid', 'mat', 'started_at')),
+            'scores': list(JudgeScore.objects.values_list('round__uid', 'athlete__uid', 'judge', 'score')),
+            'places': sorted(Placement.objects.values_list('athlete__uid', 'place')),
+            'seasons': sorted(AthleteSeasonStats.objects.values_list('athlete__uid', 'bouts', 'wins')),
+            'ratings': sorted((uid, round(rating, 6)) for uid, rating in AthleteRating.objects.values_list(
+                'athlete__uid', 'rating',
+            )),
+            'medals': sorted(ClubMedals.objects.values_list('tournament_type', 'gold', 'silver', 'bronze')),
+        }
+
+    before = state()
+    winner, loser = final.winner.uid, final.athlete2.uid
+    full = io.BytesIO()
+    export_snapshot(tournament, full)
+
+    Tournament.objects.all().delete()
+    Athlete.objects.all().delete()
+    Club.objects.all().delete()
+    ClubMedals.objects.all().delete()
+
+    import_snapshot(io.BytesIO(full.getvalue()))
+    assert state() == before
+    assert not Round.objects.filter(bracket__isnull=True).exists()
+    assert Bracket.objects.get().division_key == Round.objects.first().division_key
+    history = head_to_head.lookup(
+        Athlete.objects.get(uid=winner).id, Athlete.objects.get(uid=loser).id,
+    )
+    assert (history['bouts'], history['wins']) == (1, 1)
+    assert bout_log.check_projections() == []
+
+
+@pytest.mark.django_db
+def test_import_rejects_unknown_format():
+    import io
+    from TurniejKarate.snapshot import SnapshotError, import_snapshot
+
+    with pytest.raises(SnapshotError):
+        import_snapshot(io.BytesIO(b'{"format": "other"}\n'))
+
+
+@pytest.mark.django_db
+def test_reference_data_reads_once_and_invalidates(django_assert_num_queries):
+    from TurniejKarate.reference import reference_data
+
+    lightweight = WeightCategory.objects.create(name="Lightweight", min_weight=60, max_weight=70)
+    club = Club.objects.create(name="Karate Club")
+
+    with django_assert_num_queries(4):
+        assert reference_data.category(lightweight.id).name == "Lightweight"
+        assert reference_data.club_by_name("Karate Club").id == club.id
+        assert reference_data.categories() == [lightweight]
+
+    # Zmiana tabeli unieważnia dane bez czekania na kolejny proces
+    lightweight.name = "Light"
+    lightweight.save()
+    assert reference_data.category_by_name("Light").id == lightweight.id
+    assert reference_data.category_by_name("Lightweight") is None
+
+
+@pytest.mark.django_db
+def test_reference_data_follows_shared_version(settings):
+    from django.core.cache import cache
+    from TurniejKarate.reference import VERSION_KEY, reference_data
+
+    settings.REFERENCE_CACHE_CHECK_INTERVAL = 0
+    club = Club.objects.create(name="Karate Club")
+    assert reference_data.club(club.id) is not None
+
+    # Inny proces zmienił tabelę i ustawił nową wersję
+    Club.objects.filter(id=club.id).update(name="Renamed")
+    cache.set(VERSION_KEY, 'other-process')
+    assert reference_data.club(club.id).name == "Renamed"
+
+
+@pytest.mark.django_db
+def test_athlete_list_uses_cached_club_names(client, user, club, django_assert_max_num_queries):
+    for number in range(5):
+        Athlete.objects.create(
+            first_name=f"Zawodnik{number}", last_name="Test", age=20, weight=70, gender="M",
+            belt_level="blue", karate_style="shotokan", club=club
+        )
+    client.login(username=user.username, password='password')
+    client.get(reverse('athlete_list'))
+
+    with django_assert_max_num_queries(4):
+        response = client.get(reverse('athlete_list'))
+    assert "Karate Club" in response.content.decode()
+
+
+@pytest.mark.django_db
+def test_division_key_computed_at_registration(club):
+    from TurniejKarate.divisions import division_key
+    from TurniejKarate.models import AgeBand, BeltGroup, Registration
+
+    seniors = AgeBand.objects.create(name="Seniorzy", min_age=18, max_age=99)
+    AgeBand.objects.create(name="Juniorzy", min_age=14, max_age=17)
+    advanced = BeltGroup.objects.create(name="Zaawansowani", min_belt=4, max_belt=6)
+    lightweight = WeightCategory.objects.create(name="Lightweight", min_weight=60, max_weight=70)
+    athlete = Athlete.objects.create(
+        first_name="John", last_name="Doe", age=25, weight=70, gender="M", belt_level="blue",
+        karate_style="shotokan", club=club, weight_category=lightweight
+    )
+    tournament = Tournament.objects.create(name="Test Tournament", type="CLUB", date="2024-01-01")
+
+    tournament.athletes.add(athlete)
+    registration = Registration.objects.get(tournament=tournament, athlete=athlete)
+    # Klucz policzony w SQL zgadza się z wersją w Pythonie
+    assert registration.division_key == f"M-{seniors.id}-{advanced.id}-{lightweight.id}"
+    assert registration.division_key == division_key(athlete)
+
+
+@pytest.mark.django_db
+def test_weigh_in_refreshes_division_key(client, user, club):
+    from TurniejKarate.models import DivisionCounter, Registration
+
+    lightweight = WeightCategory.objects.create(name="Lightweight", min_weight=60, max_weight=70)
+    athlete = Athlete.objects.create(
+        first_name="John", last_name="Doe", age=25, weight=0, gender="M", belt_level="white",
+        karate_style="shotokan", club=club
+    )
+    tournament = Tournament.objects.create(name="Test Tournament", type="CLUB", date="2024-01-01")
+    tournament.athletes.add(athlete)
+    assert Registration.objects.get(athlete=athlete).division_key == "M-0-0-0"
+    other = Tournament.objects.create(name="Inny turniej", type="CLUB", date="2024-01-01")
+    other.athletes.add(athlete)
+    unrelated = Tournament.objects.create(name="Trzeci turniej", type="CLUB", date="2024-01-01")
+    DivisionCounter.objects.create(tournament=unrelated, division_key="M-0-0-0", athletes_registered=5)
+
+    client.login(username=user.username, password='password')
+    client.post(
+        reverse('weigh_in', args=[tournament.id]),
+        data='{"measurements": [{"athlete": %d, "weight": "65"}]}' % athlete.id,
+        content_type='application/json',
+    )
+    # Waga zawodnika zmienia jego dywizję także w innym turnieju, do którego jest zgłoszony
+    assert set(Registration.objects.filter(athlete=athlete).values_list('division_key', flat=True)) == {
+        f"M-0-0-{lightweight.id}",
+    }
+    # Liczniki dywizji przeniesione razem ze zgłoszeniami; liczniki turniejów bez tych zgłoszeń nietknięte
+    for registered_in in (tournament, other):
+        assert dict(DivisionCounter.objects.filter(tournament=registered_in).values_list(
+            'division_key', 'athletes_registered',
+        )) == {"M-0-0-0": 0, f"M-0-0-{lightweight.id}": 1}
+    assert DivisionCounter.objects.get(tournament=unrelated).athletes_registered == 5
+
+
+@pytest.mark.django_db
+def test_round_list_groups_by_division(client, user, tournament, athlete1, athlete2, django_assert_max_num_queries):
+    tournament.athletes.set([athlete1, athlete2])
+    Round.objects.create(tournament=tournament, athlete1=athlete1, athlete2=athlete2, round_number=1)
+    assert Round.objects.get().division_key == "M-0-0-0"
+
+    client.login(username=user.username, password='password')
+    client.get(reverse('round_list'))
+    with django_assert_max_num_queries(8):
+        response = client.get(reverse('round_list'))
+    divisions = response.context['tournament_data'][0]['divisions']
+    assert [division['key'] for division in divisions] == ["F-0-0-0", "M-0-0-0"]
+    assert divisions[0]['athletes'] == [athlete2.display_name]
+    assert athlete1.display_name in divisions[1]['athletes']
+
+
+@pytest.mark.django_db
+def test_clone_tournament_copies_registrations_in_constant_queries(tournament, club, django_assert_max_num_queries):
+    from TurniejKarate.rollover import clone_tournament
+
+    Athlete.objects.bulk_create([
+        Athlete(
+            first_name=f"Zawodnik{number}", last_name="Test", age=20, weight=70, gender="M",
+            belt_level="blue", karate_style="shotokan", club=club
+        )
+        for number in range(50)
+    ])
+    tournament.athletes.set(Athlete.objects.all())
+
+    # INSERT turnieju, INSERT ... SELECT, UPDATE kluczy dywizji i wersji turnieju, liczniki turnieju i dywizji
+    # oraz punkt zapisu transakcji
+    with django_assert_max_num_queries(8):
+        clone, copied = clone_tournament(tournament, "Test Tournament 2025", "2025-01-01")
+    assert copied == 50
+    assert clone.type == tournament.type
+    assert set(clone.athletes.values_list('id', flat=True)) == set(tournament.athletes.values_list('id', flat=True))
+
+
+@pytest.mark.django_db
+def test_clone_tournament_view_reclassifies(client, user, tournament, athlete1):
+    from TurniejKarate.models import Registration
+
+    lightweight = WeightCategory.objects.create(name="Lightweight", min_weight=60, max_weight=75)
+    tournament.athletes.set([athlete1])
+
+    client.login(username=user.username, password='password')
+    response = client.post(reverse('clone_tournament', args=[tournament.id]), {
+        'name': "Test Tournament 2025", 'date': "2025-01-01", 'reclassify': 'on',
+    })
+    clone = Tournament.objects.get(name="Test Tournament 2025")
+    assert response.url == reverse('tournament_detail', args=[clone.id])
+
+    athlete1.refresh_from_db()
+    assert athlete1.weight_category == lightweight
+    assert Registration.objects.get(tournament=clone).division_key == f"M-0-0-{lightweight.id}"
+
+
+
+@pytest.mark.django_db
+def test_clone_finished_tournament_copies_all_entrants(tournament, club):
+    from TurniejKarate.models import DivisionCounter, Registration
+    from TurniejKarate.rollover import clone_tournament
+
+    first, second, third, fourth = _division_athletes(club, 4)
+    tournament.athletes.add(first, second, third, fourth)
+    for number, (winner, loser) in enumerate([(first, second), (third, fourth), (first, third)], start=1):
+        Round.objects.create(tournament=tournament, athlete1=winner, athlete2=loser, round_number=number, winner=winner)
+    assert list(tournament.athletes.all()) == [first]
+
+    # Druga edycja, w której zawodnicy już startują
+    other = Tournament.objects.create(name="Inny turniej", date="2024-06-01")
+    other.athletes.add(first, second)
+    lightweight = WeightCategory.objects.create(name="Lightweight", min_weight=60, max_weight=75)
+    # Waga poza przedziałami - kategoria ustawiona ręcznie nie może zniknąć
+    heavyweight = WeightCategory.objects.create(name="Heavyweight", min_weight=90, max_weight=120)
+    Athlete.objects.filter(pk=fourth.pk).update(weight=80, weight_category=heavyweight)
+
+    clone, copied = clone_tournament(tournament, "Test Tournament 2025", "2025-01-01", reclassify=True)
+    assert copied == 4
+    assert set(clone.athletes.all()) == {first, second, third, fourth}
+    clone.refresh_from_db()
+    assert (clone.athletes_registered, clone.athletes_remaining) == (4, 4)
+    assert Athlete.objects.get(pk=fourth.pk).weight_category == heavyweight
+
+    # Nowa kategoria zawodnika zmienia jego dywizję także w innym turnieju - razem z licznikami
+    key = f"M-0-0-{lightweight.id}"
+    assert set(Registration.objects.filter(tournament=other).values_list('division_key', flat=True)) == {key}
+    assert list(DivisionCounter.objects.filter(tournament=other, athletes_registered__gt=0).values_list(
+        'division_key', 'athletes_registered', 'athletes_remaining',
+    )) == [(key, 2, 2)]
+
+@pytest.mark.django_db
+def test_tournament_list_renders_without_detail_links(client, user, tournament):
+    # Lista i szczegóły turnieju dzielą szablon; akcje turnieju są tylko w szczegółach
+    client.login(username=user.username, password='password')
+    response = client.get(reverse('tournament_list'))
+    assert response.status_code == 200
+    assert reverse('clone_tournament', args=[tournament.id]) not in response.content.decode()
+
+
+def _division_athletes(club, count):
+    return [
+        Athlete.objects.create(
+            first_name=f"Zawodnik{number}", last_name="Test", age=20, weight=70, gender="M",
+            belt_level="blue", karate_style="shotokan", club=club
+        )
+        for number in range(count)
+    ]
+
+
+def _decide(bracket, winner_index=1):
+    """Rozstrzyga wszystkie gotowe walki drabinki na korzyść zawodnika 1 lub 2"""
+    for round_instance in bracket.rounds.filter(winner__isnull=True).order_by('id'):
+        round_instance.winner_id = getattr(round_instance, f'athlete{winner_index}_id')
+        round_instance.save()
+
+
+@pytest.mark.django_db
+def test_single_elimination_bracket_handles_byes(tournament, club):
+    from TurniejKarate.brackets import build_bracket
+
+    athletes = _division_athletes(club, 5)
+    tournament.athletes.set(athletes)
+    bracket = build_bracket(tournament, "M-0-0-0")
+
+    # 5 zawodników w drabince na 8: trzech rozstawionych przechodzi bez walki,
+    # a rozstawieni z nr 2 i 3 od razu dostają walkę w półfinale
+    assert bracket.size == 8
+    assert bracket.rounds.count() == 2
+    while bracket.rounds.filter(winner__isnull=True).exists():
+        _decide(bracket)
+
+    places = dict(Athlete.objects.filter(place__isnull=False).values_list('id', 'place'))
+    assert sorted(places.values()) == [1, 2, 3, 3, 5]
+    assert places[athletes[0].id] == 1
+    # Drabinka sama przyznaje miejsca - przegrani pozostają zgłoszeni
+    assert tournament.athletes.count() == 5
+
+
+@pytest.mark.django_db
+def test_repechage_awards_two_bronzes(tournament, club):
+    from TurniejKarate.brackets import build_bracket
+
+    athletes = _division_athletes(club, 16)
+    tournament.athletes.set(athletes)
+    bracket = build_bracket(tournament, "M-0-0-0", kind='REPECHAGE')
+    while bracket.rounds.filter(winner__isnull=True).exists():
+        _decide(bracket)
+
+    # Repasaż każdej połówki: przegrany z 1. rundy z przegranym 1/4 finału, zwycięzca z przegranym półfinału
+    assert bracket.nodes.filter(section='REPECHAGE').count() == 4
+    places = sorted(Athlete.objects.exclude(place=None).values_list('place', flat=True))
+    assert places[:6] == [1, 2, 3, 3, 5, 5]
+    assert places.count(7) == 2
+
+
+@pytest.mark.django_db
+def test_double_elimination_progresses_incrementally(tournament, club, django_assert_max_num_queries):
+    from django.core.exceptions import ValidationError
+    from TurniejKarate.brackets import build_bracket
+
+    athletes = _division_athletes(club, 16)
+    tournament.athletes.set(athletes)
+    bracket = build_bracket(tournament, "M-0-0-0", kind='DOUBLE')
+    first = bracket.rounds.order_by('id').first()
+
+    # Jeden wynik dotyka tylko węzłów zwycięzcy i przegranego (plus dwa UPDATE liczników walk)
+    with django_assert_max_num_queries(42):
+        first.winner_id = first.athlete1_id
+        first.save()
+
+    while bracket.rounds.filter(winner__isnull=True).exists():
+        _decide(bracket)
+    final = bracket.nodes.get(section='FINAL')
+    assert final.decided and final.winner_id is not None
+    places = sorted(Athlete.objects.exclude(place=None).values_list('place', flat=True))
+    assert places[:4] == [1, 2, 3, 4]
+    assert len(places) == 16
+
+    # Wyniku z 1. rundy nie można już zmienić - kolejne walki są rozstrzygnięte
+    first.refresh_from_db()
+    first.winner_id = first.athlete2_id
+    with pytest.raises(ValidationError):
+        first.save()
+
+
+@pytest.mark.django_db
+def test_bout_log_records_correction_and_undo(client, user, tournament, club):
+    from TurniejKarate.bout_log import check_projections
+    from TurniejKarate.models import BoutEvent
+
+    first, second = _division_athletes(club, 2)
+    tournament.athletes.set([first, second])
+    round_instance = Round.objects.create(tournament=tournament, athlete1=first, athlete2=second, round_number=1)
+
+    round_instance.winner = first
+    round_instance.save()
+    round_instance.winner = second
+    round_instance.save()
+    assert list(tournament.athletes.all()) == [second]
+
+    client.login(username=user.username, password='password')
+    client.post(reverse('undo_round', args=[round_instance.id]))
+
+    assert list(BoutEvent.objects.order_by('id').values_list('kind', flat=True)) == [
+        'RECORDED', 'CORRECTED', 'WITHDRAWN',
+    ]
+    # Cofnięcie przywraca zgłoszenie i miejsce przegranego
+    assert set(tournament.athletes.all()) == {first, second}
+    assert not Athlete.objects.filter(place__isnull=False).exists()
+    assert check_projections() == []
+
+
+@pytest.mark.django_db
+def test_division_standings_resume_from_snapshot(tournament, club, monkeypatch, django_assert_num_queries):
+    from TurniejKarate import bout_log
+    from TurniejKarate.models import DivisionSnapshot, Pool
+
+    monkeypatch.setattr(bout_log, 'SNAPSHOT_INTERVAL', 3)
+    athletes = _division_athletes(club, 4)
+    pool = Pool.objects.create(tournament=tournament, name="Grupa A")
+    for number, (athlete1, athlete2) in enumerate([(0, 1), (2, 3), (0, 2), (1, 3)], start=1):
+        Round.objects.create(
+            tournament=tournament, pool=pool, athlete1=athletes[athlete1], athlete2=athletes[athlete2],
+            round_number=number, winner=athletes[athlete1],
+        )
+
+    standings = bout_log.division_standings(tournament.id, "M-0-0-0")
+    assert DivisionSnapshot.objects.count() == 1
+    assert standings.wins[athletes[0].id] == 2
+    assert standings.eliminated == set()  # W grupie nikt nie odpada
+
+    # Kolejne odczyty zaczynają od migawki
+    with django_assert_num_queries(2):
+        resumed = bout_log.division_standings(tournament.id, "M-0-0-0")
+    assert resumed.to_state() == bout_log.replay()[(tournament.id, "M-0-0-0")].to_state()
+
+
+@pytest.mark.django_db
+def test_check_projections_detects_direct_changes(tournament, club):
+    from TurniejKarate.bout_log import check_projections
+
+    first, second = _division_athletes(club, 2)
+    tournament.athletes.set([first, second])
+    round_instance = Round.objects.create(
+        tournament=tournament, athlete1=first, athlete2=second, round_number=1, winner=first,
+    )
+    assert check_projections() == []
+
+    # Zmiana z pominięciem Round.save nie trafia do dziennika
+    Round.objects.filter(id=round_instance.id).update(winner=second)
+    assert len(check_projections()) == 1
+
+
+@pytest.mark.django_db
+def test_check_projections_skips_events_of_deleted_rounds(tournament, club):
+    from TurniejKarate.bout_log import check_projections
+    from TurniejKarate.models import BoutEvent
+
+    first, second = _division_athletes(club, 2)
+    tournament.athletes.set([first, second])
+    # Wynik rundy usuniętej, zanim usuwanie dopisywało wycofanie - round_id wyzerowany przez SET_NULL
+    BoutEvent.objects.create(
+        kind='RECORDED', round=None, tournament=tournament, athlete1=first, athlete2=second, winner=second,
+    )
+    assert check_projections() == []
+
+
+@pytest.mark.django_db
+def test_bout_timing_updates_mat_and_division_stats(client, user, tournament, club):
+    from datetime import timedelta
+    from django.utils import timezone
+    from TurniejKarate.models import ThroughputStats
+    from TurniejKarate.throughput import end_bout, start_bout
+
+    athletes = _division_athletes(club, 4)
+    rounds = [
+        Round.objects.create(tournament=tournament, athlete1=athletes[0], athlete2=athletes[1], round_number=1),
+        Round.objects.create(tournament=tournament, athlete1=athletes[2], athlete2=athletes[3], round_number=1),
+    ]
+    start = timezone.now()
+    start_bout(rounds[0], 1, now=start)
+    end_bout(rounds[0], now=start + timedelta(seconds=120))
+    start_bout(rounds[1], 1, now=start + timedelta(seconds=150))
+    end_bout(rounds[1], now=start + timedelta(seconds=330))
+
+    mat = ThroughputStats.objects.get(tournament=tournament, scope='MAT', key='1')
+    assert mat.bouts_completed == 2
+    assert mat.total_seconds == 300
+    assert mat.recent_seconds == pytest.approx(120 * 0.8 + 180 * 0.2)
+    assert mat.last_ended_at - mat.first_started_at == timedelta(seconds=330)
+    assert ThroughputStats.objects.get(scope='DIVISION', key="M-0-0-0").bouts_completed == 2
+
+    # Drugie zakończenie z nieaktualnej kopii rundy (równoległe żądanie) nie dolicza walki
+    stale = Round.objects.get(pk=rounds[0].pk)
+    stale.ended_at = None
+    with pytest.raises(ValidationError):
+        end_bout(stale, now=start + timedelta(seconds=400))
+    assert ThroughputStats.objects.get(tournament=tournament, scope='MAT', key='1').bouts_completed == 2
+
+    client.login(username=user.username, password='password')
+    response = client.post(reverse('round_end', args=[rounds[0].id]))
+    assert response.status_code == 409
+
+
+@pytest.mark.django_db
+def test_dashboard_projects_finish_from_aggregates(client, user, tournament, club, django_assert_max_num_queries):
+    from datetime import timedelta
+    from django.utils import timezone
+    from TurniejKarate.throughput import end_bout, start_bout
+
+    athletes = _division_athletes(club, 2)
+    played = Round.objects.create(tournament=tournament, athlete1=athletes[0], athlete2=athletes[1], round_number=1)
+    start = timezone.now()
+    start_bout(played, 2, now=start)
+    end_bout(played, now=start + timedelta(seconds=100))
+    for number in range(3):
+        Round.objects.create(
+            tournament=tournament, athlete1=athletes[0], athlete2=athletes[1], round_number=2, mat=2,
+        )
+    # Wynik wpisany bez start/stop - walka nie jest już pozostała
+    Round.objects.create(
+        tournament=tournament, athlete1=athletes[0], athlete2=athletes[1], round_number=2, mat=2,
+        winner=athletes[0],
+    )
+
+    client.login(username=user.username, password='password')
+    client.get(reverse('tournament_dashboard_data', args=[tournament.id]))
+    with django_assert_max_num_queries(6):
+        data = client.get(reverse('tournament_dashboard_data', args=[tournament.id])).json()
+    assert data['mats'][0]['mat'] == 2
+    assert data['mats'][0]['remaining'] == 3
+    assert data['mats'][0]['average_seconds'] == 100
+    assert data['mats'][0]['projected_finish'] is not None
+
+    response = client.get(reverse('tournament_dashboard', args=[tournament.id]))
+    assert response.status_code == 200
+
+
+@pytest.mark.django_db
+def test_knockout_places_count_within_division(tournament, club):
+    from TurniejKarate.models import Placement
+
+    first, second = _division_athletes(club, 2)
+    women = [
+        Athlete.objects.create(
+            first_name=f"Zawodniczka{number}", last_name="Test", age=20, weight=60, gender="F",
+            belt_level="blue", karate_style="shotokan", club=club,
+        )
+        for number in range(3)
+    ]
+    tournament.athletes.set([first, second, *women])
+
+    # Inna dywizja nie zmienia tego, że to finał dywizji mężczyzn
+    Round.objects.create(tournament=tournament, athlete1=first, athlete2=second, round_number=1, winner=first)
+
+    assert dict(Placement.objects.values_list('athlete_id', 'place')) == {first.id: 1, second.id: 2}
+
+
+@pytest.mark.django_db
+def test_club_medals_follow_knockout_results(tournament, club):
+    from TurniejKarate.leaderboards import club_medal_table, rebuild_club_medals
+    from TurniejKarate.models import ClubMedals
+
+    first, second = _division_athletes(club, 2)
+    tournament.athletes.set([first, second])
+    final = Round.objects.create(tournament=tournament, athlete1=first, athlete2=second, round_number=1)
+    final.winner = first
+    final.save()
+
+    medals = ClubMedals.objects.get(club=club, tournament_type='CLUB')
+    assert (medals.gold, medals.silver, medals.bronze) == (1, 1, 0)
+
+    # Korekta wyniku finału zamienia medale, bilans klubu się nie zmienia
+    final.winner = second
+    final.save()
+    first.refresh_from_db()
+    second.refresh_from_db()
+    assert (first.place, second.place) == (2, 1)
+    row = list(club_medal_table())[0]
+    assert (row.gold, row.silver, row.bronze) == (1, 1, 0)
+
+    rebuild_club_medals()
+    rebuilt = ClubMedals.objects.get(club=club, tournament_type=ClubMedals.ALL_TYPES)
+    assert (rebuilt.gold, rebuilt.silver, rebuilt.bronze) == (1, 1, 0)
+
+
+@pytest.mark.django_db
+def test_correcting_result_recorded_before_aggregates_saves(tournament, club):
+    from TurniejKarate.models import AthleteSeasonStats, ClubMedals
+
+    other_club = Club.objects.create(name="Inny klub")
+    first, second = _division_athletes(club, 1) + _division_athletes(other_club, 1)
+    tournament.athletes.set([first, second])
+    final = Round.objects.create(tournament=tournament, athlete1=first, athlete2=second, round_number=1)
+    final.set_winner(first)
+    # Wynik zapisany, zanim istniały tabele zbiorcze
+    ClubMedals.objects.all().delete()
+    AthleteSeasonStats.objects.all().delete()
+
+    final.set_winner(second)
+
+    medals = dict(ClubMedals.objects.filter(tournament_type=ClubMedals.ALL_TYPES).values_list('club', 'gold'))
+    assert medals == {club.id: 0, other_club.id: 1}
+    assert AthleteSeasonStats.objects.get(athlete=first).wins == 0
+    assert AthleteSeasonStats.objects.get(athlete=second).wins == 1
+
+
+@pytest.mark.django_db
+def test_season_stats_incremental_matches_rebuild(client, tournament, club, django_assert_num_queries):
+    from TurniejKarate.leaderboards import rebuild_season_stats
+    from TurniejKarate.models import AthleteSeasonStats, Pool
+
+    athletes = _division_athletes(club, 3)
+    pool = Pool.objects.create(tournament=tournament, name="Grupa A")
+    for number, (winner, loser) in enumerate([(0, 1), (0, 2), (2, 1)], start=1):
+        Round.objects.create(
+            tournament=tournament, pool=pool, athlete1=athletes[winner], athlete2=athletes[loser],
+            round_number=number, winner=athletes[winner],
+        )
+
+    def snapshot():
+        return sorted(AthleteSeasonStats.objects.values_list('athlete_id', 'season', 'bouts', 'wins', 'losses'))
+
+    incremental = snapshot()
+    assert (athletes[0].id, 2024, 2, 2, 0) in incremental
+    rebuild_season_stats()
+    assert snapshot() == incremental
+
+    with django_assert_num_queries(1):
+        response = client.get(reverse('athlete_leaderboard', args=[2024]))
+    assert response.context['rows'][0].athlete == athletes[0]
+
+
+@pytest.mark.django_db
+def test_athlete_display_name_is_kept_on_save(tournament, athlete1):
+    assert athlete1.display_name == "John Doe - Blue Belt (Shotokan)"
+    Round.objects.create(tournament=tournament, athlete1=athlete1, athlete2=athlete1, round_number=1)
+    version = Tournament.objects.get().version
+
+    athlete1.first_name = "Johnny"
+    athlete1.save(update_fields=['first_name'])
+    athlete1.refresh_from_db()
+    assert athlete1.display_name == "Johnny Doe - Blue Belt (Shotokan)"
+    assert Tournament.objects.get().version == version + 1
+
+
+@pytest.mark.django_db
+def test_round_list_reuses_cached_fragments(
+        client, user, tournament, athlete1, athlete2, django_assert_max_num_queries, django_assert_num_queries,
+):
+    tournament.athletes.set([athlete1, athlete2])
+    finished = Round.objects.create(tournament=tournament, athlete1=athlete2, athlete2=athlete2, round_number=1)
+    Round.objects.filter(pk=finished.pk).update(winner=athlete2)
+    client.login(username=user.username, password='password')
+    client.get(reverse('round_list'))
+
+    # Bez zmian cała lista turnieju pochodzi z cache: zostają sesja, użytkownik i lista turniejów
+    with django_assert_num_queries(3):
+        response = client.get(reverse('round_list'))
+    assert "Jane Smith - Blue Belt (Shotokan)" in response.content.decode()
+
+    # Wynik w jednej dywizji odświeża tylko ją - zakończona dywizja nie jest pobierana ponownie
+    Round.objects.create(tournament=tournament, athlete1=athlete1, athlete2=athlete1, round_number=1, winner=athlete1)
+    with django_assert_max_num_queries(7):
+        response = client.get(reverse('round_list'))
+    content = response.content.decode()
+    assert "John Doe - Blue Belt (Shotokan)" in content
+    assert content.count("Cofnij wynik") == 2
+
+
+@pytest.mark.django_db
+def test_division_bracket_svg_is_cached_until_result(client, user, tournament, club, django_assert_max_num_queries):
+    from TurniejKarate.brackets import build_bracket
+
+    tournament.athletes.set(_division_athletes(club, 8))
+    bracket = build_bracket(tournament, "M-0-0-0")
+    client.login(username=user.username, password='password')
+    url = reverse('division_bracket', args=[tournament.id, "M-0-0-0", 'svg'])
+
+    response = client.get(url)
+    assert response['Content-Type'] == 'image/svg+xml'
+    assert response.content.count(b'<rect') == 4
+    assert b'Zawodnik0 Test' in response.content
+    # Bez zmian w dywizji rysunek pochodzi z cache: sesja, użytkownik, turniej i znaczniki dywizji
+    with django_assert_max_num_queries(5):
+        assert client.get(url).content == response.content
+
+    _decide(bracket)
+    updated = client.get(url).content
+    assert updated.count(b'<rect') == 6
+    assert updated.count(b'<polyline') == 4
+    assert client.get(reverse('division_bracket', args=[tournament.id, "M-0-0-0", 'png'])).status_code == 404
+
+
+@pytest.mark.django_db
+def test_render_brackets_writes_pdf_per_division(tournament, club, athlete2, tmp_path):
+    from django.core.management import call_command
+    from TurniejKarate.brackets import build_bracket
+
+    tournament.athletes.set([*_division_athletes(club, 4), athlete2])
+    build_bracket(tournament, "M-0-0-0")
+    Round.objects.create(tournament=tournament, athlete1=athlete2, athlete2=athlete2, round_number=1)
+
+    call_command('render_brackets', tournament.id, str(tmp_path), '--workers', '2')
+    files = sorted(path.name for path in tmp_path.iterdir())
+    assert files == ["F-0-0-0.pdf", "M-0-0-0.pdf"]
+    pdf = (tmp_path / "M-0-0-0.pdf").read_bytes()
+    assert pdf.startswith(b'%PDF-1.4') and pdf.rstrip().endswith(b'%%EOF')
+    assert b'(Zawodnik0 Test - Blue Belt \\(Shotokan\\)) Tj' in pdf
+
+
+def test_production_settings_profile(monkeypatch):
+    import importlib
+    import sys
+
+    monkeypatch.setenv('DJANGO_SECRET_KEY', 'test-secret')
+    monkeypatch.setenv('DJANGO_ALLOWED_HOSTS', 'turniej.example.com')
+    monkeypatch.delenv('DJANGO_REDIS_URL', raising=False)
+    monkeypatch.delenv('DJANGO_DB_POOL', raising=False)
+    monkeypatch.delitem(sys.modules, 'ProjektKoncowy.settings_production', raising=False)
+    production = importlib.import_module('ProjektKoncowy.settings_production')
+
+    assert production.DEBUG is False
+    assert production.DATABASES['default']['CONN_MAX_AGE'] > 0
+    assert production.DATABASES['default']['CONN_HEALTH_CHECKS'] is True
+    assert production.SESSION_ENGINE == 'django.contrib.sessions.backends.signed_cookies'
+    assert production.TEMPLATES[0]['OPTIONS']['loaders'][0][0] == 'django.template.loaders.cached.Loader'
+
+    # Pula połączeń wyklucza trwałe połączenia Django
+    monkeypatch.setenv('DJANGO_DB_POOL', '1')
+    monkeypatch.setenv('DJANGO_REDIS_URL', 'redis://localhost:6379/1')
+    production = importlib.reload(production)
+    assert production.DATABASES['default']['CONN_MAX_AGE'] == 0
+    assert production.DATABASES['default']['OPTIONS']['pool']['max_size'] == 10
+    assert production.SESSION_ENGINE == 'django.contrib.sessions.backends.cached_db'
+
+
+@pytest.mark.django_db
+def test_rating_follows_results_and_corrections(tournament, athlete1, athlete2):
+    from TurniejKarate.models import AthleteRating
+
+    def ratings():
+        return {row.athlete_id: (round(row.rating, 6), row.bouts) for row in AthleteRating.objects.all()}
+
+    round_instance = Round.objects.create(tournament=tournament, athlete1=athlete1, athlete2=athlete2, round_number=1)
+    round_instance.winner = athlete1
+    round_instance.save()
+    assert round_instance.rating_delta == 16
+    assert ratings() == {athlete1.id: (1516, 1), athlete2.id: (1484, 1)}
+
+    # Korekta zwraca dokładnie przeniesione punkty i rozlicza nowy wynik
+    round_instance.winner = athlete2
+    round_instance.save()
+    assert ratings() == {athlete1.id: (1484, 1), athlete2.id: (1516, 1)}
+
+    round_instance.winner = None
+    round_instance.save()
+    assert ratings() == {athlete1.id: (1500, 0), athlete2.id: (1500, 0)}
+    assert Round.objects.get().rating_delta is None
+
+
+@pytest.mark.django_db
+def test_rebuild_ratings_matches_incremental_updates(client, tournament, club, django_assert_max_num_queries):
+    from TurniejKarate.models import AthleteRating
+    from TurniejKarate.ratings import rebuild_ratings
+
+    athletes = _division_athletes(club, 4)
+    for number, (winner, loser) in enumerate([(0, 1), (2, 3), (0, 2), (1, 3), (3, 0)], start=1):
+        Round.objects.create(
+            tournament=tournament, athlete1=athletes[winner], athlete2=athletes[loser],
+            round_number=number, winner=athletes[winner],
+        )
+    incremental = dict(AthleteRating.objects.values_list('athlete_id', 'rating'))
+    deltas = dict(Round.objects.values_list('id', 'rating_delta'))
+
+    assert rebuild_ratings(batch_size=2) == 4
+    rebuilt = dict(AthleteRating.objects.values_list('athlete_id', 'rating'))
+    assert rebuilt == pytest.approx(incremental)
+    assert dict(Round.objects.values_list('id', 'rating_delta')) == pytest.approx(deltas)
+    assert sum(rebuilt.values()) == pytest.approx(4 * AthleteRating.INITIAL_RATING)
+
+    with django_assert_max_num_queries(1):
+        response = client.get(reverse('rating_leaderboard'))
+    rows = list(response.context['rows'])
+    assert rows[0].athlete_id == athletes[0].id
+    assert [row.rating for row in rows] == sorted(rebuilt.values(), reverse=True)
+
+
+@pytest.mark.django_db
+def test_eligibility_matrix_follows_registrations(tournament, club, django_capture_on_commit_callbacks):
+    from TurniejKarate import eligibility
+
+    athletes = _division_athletes(club, 3)
+    female = Athlete.objects.create(
+        first_name="Anna", last_name="Test", age=20, weight=70, gender="F",
+        belt_level="blue", karate_style="shotokan", club=club
+    )
+    with django_capture_on_commit_callbacks(execute=True):
+        tournament.athletes.add(*athletes, female)
+    matrix = eligibility.for_tournament(tournament.id)
+    assert sorted(matrix.opponents(athletes[0].id)) == [athletes[1].id, athletes[2].id]
+    assert matrix.opponents(female.id) == []
+    assert not matrix.can_fight(athletes[0].id, female.id)
+
+    # Odpadnięcie zawodnika zeruje jego bit w tej samej macierzy, bez ponownego odczytu z bazy
+    with django_capture_on_commit_callbacks(execute=True):
+        tournament.athletes.remove(athletes[1])
+    assert eligibility.for_tournament(tournament.id) is matrix
+    assert matrix.opponents(athletes[0].id) == [athletes[2].id]
+    assert matrix.suggestions() == [(athletes[0].id, athletes[2].id)]
+
+
+@pytest.mark.django_db
+def test_round_form_offers_only_eligible_opponents(tournament, club):
+    athletes = _division_athletes(club, 3)
+    tournament.athletes.add(athletes[0], athletes[1])
+
+    form = RoundForm(initial={'tournament': tournament.id, 'athlete1': athletes[0].id})
+    assert set(form.fields['athlete1'].queryset) == {athletes[0], athletes[1]}
+    assert list(form.fields['athlete2'].queryset) == [athletes[1]]
+
+    form = RoundForm(data={
+        'tournament': tournament.id, 'athlete1': athletes[0].id, 'athlete2': athletes[2].id, 'round_number': 1,
+    })
+    assert not form.is_valid()
+    assert 'athlete2' in form.errors
+
+
+@pytest.mark.django_db
+def test_pairing_suggestions_view(client, user, tournament, club):
+    client.login(username=user.username, password='password')
+    athletes = _division_athletes(club, 3)
+    tournament.athletes.add(*athletes)
+
+    response = client.get(reverse('pairing_suggestions', args=[tournament.id]), {'athlete': athletes[0].id})
+    assert response.status_code == 200
+    assert [row['id'] for row in response.json()['opponents']] == [athletes[1].id, athletes[2].id]
+    assert response.json()['opponents'][0]['name'] == athletes[1].display_name
+
+    response = client.get(reverse('pairing_suggestions', args=[tournament.id]))
+    assert [[row['id'] for row in pair] for pair in response.json()['pairs']] == [[athletes[0].id, athletes[1].id]]
+
+    response = client.get(reverse('pairing_suggestions', args=[tournament.id]), {'athlete': 'x'})
+    assert response.status_code == 400
+
+
+@pytest.mark.django_db
+def test_delete_in_batches_removes_club_history(tournament, club):
+    from TurniejKarate.deletion import count_rows, delete_in_batches
+    from TurniejKarate.models import Registration
+
+    athletes = _division_athletes(club, 4)
+    tournament.athletes.add(*athletes)
+    for number, (first, second) in enumerate([(0, 1), (2, 3), (0, 2)], start=1):
+        Round.objects.create(
+            tournament=tournament, athlete1=athletes[first], athlete2=athletes[second],
+            round_number=number, winner=athletes[first],
+        )
+    clubs = Club.objects.filter(pk=club.pk)
+    total = count_rows(clubs)
+
+    batches = []
+    assert delete_in_batches(clubs, batch_size=2, progress=batches.append) == sum(batches) <= total
+    assert max(batches) == 2
+    assert not Athlete.objects.exists()
+    assert not Round.objects.exists()
+    assert not Registration.objects.exists()
+    assert Tournament.objects.filter(pk=tournament.pk).exists()
+
+
+@pytest.mark.django_db
+def test_athlete_delete_view_soft_deletes_athletes_with_history(client, user, tournament, club):
+    client.login(username=user.username, password='password')
+    veteran, opponent, newcomer = _division_athletes(club, 3)
+    Round.objects.create(tournament=tournament, athlete1=veteran, athlete2=opponent, round_number=1, winner=veteran)
+
+    client.post(reverse('athlete_delete', args=[veteran.id]))
+    client.post(reverse('athlete_delete', args=[newcomer.id]))
+
+    veteran.refresh_from_db()
+    assert veteran.deleted_at is not None
+    assert Round.objects.filter(winner=veteran).exists()
+    assert not Athlete.objects.filter(pk=newcomer.pk).exists()
+    response = client.get(reverse('athlete_list'))
+    assert list(response.context['athletes']) == [opponent]
+    assert veteran not in RoundForm().fields['athlete1'].queryset
+
+
+@pytest.mark.django_db
+def test_background_deletion_job_reports_progress(client, user, tournament, club):
+    from django.core.management import call_command
+    from TurniejKarate.deletion import schedule_deletion
+    from TurniejKarate.models import BackgroundJob
+
+    athletes = _division_athletes(club, 2)
+    tournament.athletes.add(*athletes)
+    Round.objects.create(tournament=tournament, athlete1=athletes[0], athlete2=athletes[1], round_number=1)
+    job = schedule_deletion(Tournament.objects.filter(pk=tournament.pk))
+    assert job.status == 'QUEUED'
+
+    call_command('run_jobs', '--once')
+
+    job.refresh_from_db()
+    assert job.status == 'DONE', job.error
+    assert job.progress == job.total == 5  # Dwa zgłoszenia, licznik dywizji, runda i turniej
+    assert not Tournament.objects.exists()
+    assert Athlete.objects.count() == 2
+
+    client.login(username=user.username, password='password')
+    response = client.get(reverse('job_status', args=[job.id]))
+    assert response.json()['status'] == 'DONE'
+
+
+def test_interval_tree_matches_brute_force():
+    import random
+    from datetime import datetime, timedelta
+    from TurniejKarate.schedule import IntervalTree, Slot
+
+    rng = random.Random(7)
+    base = datetime(2025, 5, 1, 9)
+    slots = []
+    for round_id in range(200):
+        start = base + timedelta(minutes=rng.randrange(600))
+        slots.append(Slot(start, start + timedelta(minutes=rng.randrange(1, 30)), round_id))
+    tree = IntervalTree(slots)
+    for _ in range(100):
+        start = base + timedelta(minutes=rng.randrange(600))
+        end = start + timedelta(minutes=rng.randrange(1, 60))
+        expected = {slot for slot in slots if slot.start < end and slot.end > start}
+        assert set(tree.overlapping(start, end)) == expected
+
+
+@pytest.mark.django_db
+def test_event_conflicts_across_tournaments(tournament, club):
+    from datetime import datetime, timedelta
+    from django.utils import timezone
+    from TurniejKarate.schedule import ScheduleIndex, event_conflicts
+
+    tournament.refresh_from_db()  # Data z fikstury jest napisem
+    kata = Tournament.objects.create(name="Kata", date=tournament.date)
+    athletes = _division_athletes(club, 4)
+    nine = timezone.make_aware(datetime.combine(tournament.date, datetime.min.time())) + timedelta(hours=9)
+
+    def bout(event, first, second, minutes, number):
+        return Round.objects.create(
+            tournament=event, athlete1=athletes[first], athlete2=athletes[second], round_number=number,
+            scheduled_start=nine + timedelta(minutes=minutes), scheduled_end=nine + timedelta(minutes=minutes + 5),
+        )
+
+    kumite = bout(tournament, 0, 1, 0, 1)
+    overlapping = bout(kata, 0, 2, 3, 1)  # Zawodnik 0 na dwóch matach naraz
+    short_rest = bout(tournament, 1, 3, 8, 2)  # Zawodnik 1: 3 minuty przerwy
+    bout(tournament, 2, 3, 60, 3)
+
+    conflicts = event_conflicts(tournament.date)
+    assert [(c.athlete_id, c.round_id, c.other_round_id, c.kind) for c in conflicts] == [
+        (athletes[0].id, kumite.id, overlapping.id, 'OVERLAP'),
+        (athletes[1].id, kumite.id, short_rest.id, 'REST'),
+    ]
+    assert conflicts[1].gap_seconds == 180
+
+    # Przesunięcie walki sprawdza tylko drzewa jej zawodników
+    index = ScheduleIndex(Round.objects.values_list('id', 'athlete1_id', 'athlete2_id', 'scheduled_start', 'scheduled_end'))
+    assert index.move(overlapping.id, nine + timedelta(minutes=30), nine + timedelta(minutes=35)) == []
+    assert [c.athlete_id for c in index.conflicts()] == [athletes[1].id]
+
+
+@pytest.mark.django_db
+def test_schedule_round_rejects_short_rest(tournament, club):
+    from datetime import datetime, timedelta
+    from django.utils import timezone
+    from TurniejKarate.schedule import ScheduleConflict, ScheduleIndex, schedule_round
+
+    athletes = _division_athletes(club, 3)
+    nine = timezone.make_aware(datetime(2024, 6, 1, 9))
+    first = Round.objects.create(
+        tournament=tournament, athlete1=athletes[0], athlete2=athletes[1], round_number=1,
+        scheduled_start=nine, scheduled_end=nine + timedelta(minutes=5),
+    )
+    second = Round.objects.create(tournament=tournament, athlete1=athletes[0], athlete2=athletes[2], round_number=2)
+
+    with pytest.raises(ScheduleConflict) as error:
+        schedule_round(second, nine + timedelta(minutes=7), nine + timedelta(minutes=12))
+    assert [(c.athlete_id, c.round_id, c.other_round_id, c.kind, c.gap_seconds) for c in error.value.conflicts] == [
+        (athletes[0].id, first.id, second.id, 'REST', 120),
+    ]
+    second.refresh_from_db()
+    assert second.scheduled_start is None
+
+    # Walka zawodnika z samym sobą (np. po scaleniu) daje jeden konflikt, nie po jednym na stronę
+    index = ScheduleIndex([
+        (first.id, athletes[0].id, athletes[0].id, nine, nine + timedelta(minutes=5)),
+        (second.id, athletes[0].id, athletes[2].id, nine + timedelta(hours=1), nine + timedelta(hours=1, minutes=5)),
+    ])
+    moved = index.move(first.id, nine + timedelta(minutes=52), nine + timedelta(minutes=57))
+    assert [(c.round_id, c.other_round_id, c.kind) for c in moved] == [(first.id, second.id, 'REST')]
+
+
+@pytest.mark.django_db
+def test_round_schedule_view_rejects_conflicts(client, user, tournament, club):
+    client.login(username=user.username, password='password')
+    athletes = _division_athletes(club, 3)
+    first = Round.objects.create(tournament=tournament, athlete1=athletes[0], athlete2=athletes[1], round_number=1)
+    second = Round.objects.create(tournament=tournament, athlete1=athletes[0], athlete2=athletes[2], round_number=2)
+    day = Tournament.objects.get(pk=tournament.pk).date.isoformat()
+
+    response = client.post(reverse('round_schedule', args=[first.id]), {
+        'start': f'{day}T10:00', 'end': f'{day}T10:05', 'mat': '1',
+    })
+    assert response.status_code == 200
+    response = client.post(reverse('round_schedule', args=[second.id]), {
+        'start': f'{day}T10:04', 'end': f'{day}T10:09', 'mat': '2',
+    })
+    assert response.status_code == 409
+    assert response.json()['conflicts'][0]['kind'] == 'OVERLAP'
+    second.refresh_from_db()
+    assert second.scheduled_start is None
+
+    response = client.post(reverse('round_schedule', args=[second.id]), {
+        'start': f'{day}T10:04', 'end': f'{day}T10:09', 'mat': '2', 'force': '1',
+    })
+    assert response.status_code == 200
+    response = client.get(reverse('schedule_conflicts', args=[tournament.id]))
+    assert len(response.context['conflicts']) == 1
+    assert response.context['conflicts'][0]['athlete'] == athletes[0].display_name
+
+    # Strefa podana tylko przy jednym z końców
+    for start, end in ((f'{day}T11:00', f'{day}T11:05+00:00'), (f'{day}T11:00+00:00', f'{day}T11:05')):
+        response = client.post(reverse('round_schedule', args=[first.id]), {'start': start, 'end': end, 'mat': '1'})
+        assert response.status_code == 200
+
+
+@pytest.mark.django_db
+def test_counters_follow_registrations_and_results(tournament, club, django_assert_max_num_queries):
+    from TurniejKarate.models import DivisionCounter
+
+    athletes = _division_athletes(club, 4)
+    tournament.athletes.add(*athletes)
+    tournament.refresh_from_db()
+    assert (tournament.athletes_registered, tournament.athletes_remaining, tournament.bouts_decided) == (4, 4, 0)
+
+    bout = Round.objects.create(
+        tournament=tournament, athlete1=athletes[0], athlete2=athletes[1], round_number=1, winner=athletes[0],
+    )
+    athletes[1].refresh_from_db()
+    assert athletes[1].place == 4
+    tournament.refresh_from_db()
+    assert (tournament.athletes_registered, tournament.athletes_remaining, tournament.bouts_decided) == (4, 3, 1)
+
+    # Korekta wyniku: przegrany wraca, zwycięzca odpada - liczba zgłoszonych bez zmian
+    bout.winner = athletes[1]
+    bout.save()
+    tournament.athletes.remove(athletes[3])  # Wycofanie zgłoszenia
+    tournament.refresh_from_db()
+    assert (tournament.athletes_registered, tournament.athletes_remaining, tournament.bouts_decided) == (3, 2, 1)
+    counter = DivisionCounter.objects.get(tournament=tournament, division_key=bout.division_key)
+    assert (counter.athletes_registered, counter.athletes_remaining, counter.bouts_decided) == (3, 2, 1)
+
+    # Odczyt licznika to jedno zapytanie bez COUNT
+    with django_assert_max_num_queries(1):
+        assert Tournament.objects.get(pk=tournament.pk).athletes_remaining == 2
+
+
+@pytest.mark.django_db
+def test_reconcile_counters_fixes_drift(tournament, club):
+    from django.core.management import call_command
+    from TurniejKarate.counters import reconcile
+    from TurniejKarate.models import DivisionCounter
+
+    athletes = _division_athletes(club, 3)
+    tournament.athletes.add(*athletes)
+    Round.objects.create(
+        tournament=tournament, athlete1=athletes[0], athlete2=athletes[1], round_number=1, winner=athletes[0],
+    )
+    assert reconcile() == 0
+
+    Tournament.objects.filter(pk=tournament.pk).update(athletes_registered=10, athletes_remaining=0, bouts_decided=5)
+    DivisionCounter.objects.all().delete()
+    call_command('reconcile_counters', '--tournament', str(tournament.pk))
+    tournament.refresh_from_db()
+    assert (tournament.athletes_registered, tournament.athletes_remaining, tournament.bouts_decided) == (3, 2, 1)
+    assert DivisionCounter.objects.get().athletes_remaining == 2
+    assert reconcile() == 0
+
+
+
+@pytest.mark.django_db
+def test_tournament_save_keeps_counters_and_version(tournament, club):
+    # Egzemplarz wczytany przed walką ma nieaktualne liczniki i wersję
+    stale = Tournament.objects.get(pk=tournament.pk)
+    athletes = _division_athletes(club, 2)
+    tournament.athletes.add(*athletes)
+    Round.objects.create(
+        tournament=tournament, athlete1=athletes[0], athlete2=athletes[1], round_number=1, winner=athletes[0],
+    )
+    current = Tournament.objects.get(pk=tournament.pk)
+
+    stale.name = "Nowa nazwa"
+    stale.save()
+    saved = Tournament.objects.get(pk=tournament.pk)
+    assert saved.name == "Nowa nazwa"
+    assert (saved.athletes_registered, saved.athletes_remaining, saved.bouts_decided) == (2, 1, 1)
+    assert saved.version >= current.version
+    assert (stale.athletes_remaining, stale.version) == (saved.athletes_remaining, saved.version)
+
+@pytest.mark.django_db
+def test_generate_documents_resumes_partial_archive(tournament, club, monkeypatch, tmp_path):
+    import zipfile
+    from TurniejKarate import documents
+    from TurniejKarate.models import Placement
+
+    athletes = _division_athletes(club, 3)
+    tournament.athletes.add(*athletes)
+    Round.objects.create(tournament=tournament, athlete1=athletes[0], athlete2=athletes[1], round_number=1)
+    for place, athlete in enumerate(athletes, start=1):
+        Placement.objects.create(tournament=tournament, athlete=athlete, place=place)
+    tournament.refresh_from_db()
+    monkeypatch.setattr(documents, 'CHUNK_SIZE', 2)
+
+    names = [name for name, _ in documents.documents(tournament, 'certificates')]
+    assert names == [f"certificates/{place:03d}-{athlete.id}-test-zawodnik{place - 1}.pdf"
+                     for place, athlete in enumerate(athletes, start=1)]
+
+    # Przerwane generowanie: w archiwum .part jest już pierwszy dyplom
+    path = tmp_path / "certificates.zip"
+    with zipfile.ZipFile(tmp_path / "certificates.zip.part", 'w') as archive:
+        archive.writestr(names[0], b'zapisany wczesniej')
+    progress = []
+    assert documents.generate(tournament, 'certificates', path=path, workers=1, progress=progress.append) == path
+
+    assert progress == [1, 2]
+    assert not (tmp_path / "certificates.zip.part").exists()
+    with zipfile.ZipFile(path) as archive:
+        assert archive.namelist() == names
+        assert archive.read(names[0]) == b'zapisany wczesniej'
+        pdf = archive.read(names[1])
+    assert pdf.startswith(b'%PDF-1.4') and b'(Zawodnik1 Test) Tj' in pdf and b'(za zajecie 2. miejsca) Tj' in pdf
+
+
+@pytest.mark.django_db
+def test_documents_job_builds_archive_for_download(client, user, tournament, club, settings, tmp_path):
+    import io
+    import zipfile
+    from django.core.management import call_command
+    from TurniejKarate.models import BackgroundJob
+
+    settings.DOCUMENTS_ROOT = tmp_path
+    tournament.athletes.add(*_division_athletes(club, 3))
+    client.login(username=user.username, password='password')
+    url = reverse('tournament_documents', args=[tournament.id])
+    assert client.post(url, {'kind': 'badges'}).status_code == 302
+    client.post(url, {'kind': 'badges'})
+    job = BackgroundJob.objects.get(kind='DOCUMENTS')  # Czekające zadanie nie jest dublowane
+
+    call_command('run_jobs', '--once')
+    job.refresh_from_db()
+    assert job.status == 'DONE', job.error
+    assert job.progress == job.total == 3
+
+    assert reverse('tournament_documents_archive', args=[tournament.id, 'badges']) in client.get(url).content.decode()
+    response = client.get(reverse('tournament_documents_archive', args=[tournament.id, 'badges']))
+    with zipfile.ZipFile(io.BytesIO(b''.join(response.streaming_content))) as archive:
+        assert len(archive.namelist()) == 3
+        assert all(name.startswith("badges/") for name in archive.namelist())
+
+    call_command('generate_documents', tournament.id, 'start_lists', '--workers', '1')
+    with zipfile.ZipFile(tmp_path / f"tournament-{tournament.id}-start_lists.zip") as archive:
+        assert archive.namelist() == ["start-lists/M-0-0-0.pdf"]
+        assert b'(3. Zawodnik2 Test) Tj' in archive.read("start-lists/M-0-0-0.pdf")
+
+
+@pytest.mark.django_db
+def test_public_tournament_page_skips_session_and_sends_cache_headers(client, user, tournament, club):
+    client.login(username=user.username, password='password')
+    url = reverse('public_tournament_detail', args=[tournament.id])
+    response = client.get(url)
+
+    assert response.status_code == 200
+    assert not hasattr(response.wsgi_request, 'session') and not hasattr(response.wsgi_request, 'user')
+    assert not response.cookies and 'Cookie' not in response.get('Vary', '')
+    assert 'public' in response['Cache-Control'] and 's-maxage=86400' in response['Cache-Control']
+    assert response['Surrogate-Key'] == f"tournament-{tournament.id}"
+    etag = response['ETag']
+
+    not_modified = client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert not_modified.status_code == 304 and not_modified['Surrogate-Key'] == f"tournament-{tournament.id}"
+    assert client.post(url).status_code == 405
+
+    tournament.athletes.add(*_division_athletes(club, 2))
+    assert client.get(url, HTTP_IF_NONE_MATCH=etag).status_code == 200
+    assert client.get(reverse('public_tournament_list'))['Surrogate-Key'] == "tournaments"
+
+    # Zapis egzemplarza wczytanego przed zmianą nie cofa wersji, więc stary ETag nie wraca
+    etags = {etag, client.get(url)['ETag']}
+    tournament.name = "Nowa nazwa"
+    tournament.save()
+    renamed = client.get(url, HTTP_IF_NONE_MATCH=etag)
+    assert renamed.status_code == 200 and renamed['ETag'] not in etags
+
+
+class CachingProxy:
+    """Zastępczy cache pośredniczący: test trwa krócej niż s-maxage, więc wpis znika tylko po kluczu Surrogate-Key"""
+
+    def __init__(self, client):
+        self.client = client
+        self.entries = {}
+        self.hits = self.misses = 0
+
+    def get(self, path):
+        entry = self.entries.get(path)
+        if entry is not None:
+            self.hits += 1
+            return entry['content']
+        self.misses += 1
+        response = self.client.get(path)
+        self.entries[path] = {'content': response.content, 'keys': set(response['Surrogate-Key'].split())}
+        return response.content
+
+    def purge(self, sender, keys, **kwargs):
+        for path, entry in list(self.entries.items()):
+            if entry['keys'] & set(keys):
+                del self.entries[path]
+
+
+@pytest.mark.django_db
+def test_caching_proxy_absorbs_spectator_load(client, club, django_capture_on_commit_callbacks):
+    from TurniejKarate.signals import public_cache_purged
+
+    tournaments = [Tournament.objects.create(name=f"Turniej {number}", date="2024-01-01") for number in range(3)]
+    pending = {}
+    for tournament in tournaments:
+        athletes = _division_athletes(club, 6)
+        tournament.athletes.add(*athletes)
+        pending[tournament.id] = athletes
+    paths = [reverse('public_tournament_list')] + [
+        reverse('public_tournament_detail', args=[tournament.id]) for tournament in tournaments
+    ]
+
+    proxy = CachingProxy(client)
+    public_cache_purged.connect(proxy.purge)
+    try:
+        for step in range(400):
+            proxy.get(paths[step % len(paths)])
+            if step % 50 == 49:
+                # Wynik walki w jednym z turniejów - proxy usuwa tylko jego stronę
+                tournament = tournaments[step // 50 % len(tournaments)]
+                winner, loser = pending[tournament.id].pop(), pending[tournament.id].pop()
+                with django_capture_on_commit_callbacks(execute=True):
+                    Round.objects.create(
+                        tournament=tournament, athlete1=winner, athlete2=loser, round_number=1, winner=winner,
+                    )
+    finally:
+        public_cache_purged.disconnect(proxy.purge)
+
+    assert proxy.misses == len(paths) + 7  # Ostatni z 8 wyników pada już po ostatnim żądaniu
+    assert proxy.hits / (proxy.hits + proxy.misses) > 0.95
+    # Po każdym wyniku proxy podaje aktualną stronę
+    for path in paths[1:]:
+        assert proxy.get(path) == client.get(path).content
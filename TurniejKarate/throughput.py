@@ -0,0 +1,108 @@
+from datetime import timedelta
+
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Count, F, Value
+from django.db.models.functions import Coalesce, Greatest, Least
+from django.utils import timezone
+
+from .divisions import division_label
+from .models import Round, ThroughputStats
+
+RECENT_WEIGHT = 0.2  # Waga ostatniej walki w średniej wykładniczej czasu walki
+
+
+def start_bout(round_instance, mat, now=None):
+    if round_instance.started_at is not None:
+        raise ValidationError("Walka już się rozpoczęła.")
+    round_instance.mat = mat
+    round_instance.started_at = now or timezone.now()
+    round_instance.save(update_fields=['mat', 'started_at', 'updated_at'])
+
+
+@transaction.atomic
+def end_bout(round_instance, now=None):
+    """Kończy walkę i dolicza jej czas do agregatów maty i dywizji - dwa UPDATE z F()"""
+    # Stan z zablokowanego wiersza: dwa równoczesne zakończenia nie doliczą czasu walki dwa razy
+    locked = Round.objects.select_for_update().values('started_at', 'ended_at', 'mat').get(pk=round_instance.pk)
+    round_instance.started_at, round_instance.mat = locked['started_at'], locked['mat']
+    if locked['started_at'] is None:
+        raise ValidationError("Walka jeszcze się nie rozpoczęła.")
+    if locked['ended_at'] is not None:
+        round_instance.ended_at = locked['ended_at']
+        raise ValidationError("Walka już się zakończyła.")
+    round_instance.ended_at = now or timezone.now()
+    round_instance.save(update_fields=['ended_at', 'updated_at'])
+
+    duration = max((round_instance.ended_at - round_instance.started_at).total_seconds(), 0)
+    for scope, key in (('MAT', str(round_instance.mat)), ('DIVISION', round_instance.division_key)):
+        _record(round_instance, scope, key, duration)
+
+
+def _record(round_instance, scope, key, duration):
+    stats, _ = ThroughputStats.objects.get_or_create(tournament_id=round_instance.tournament_id, scope=scope, key=key)
+    started = Value(round_instance.started_at)
+    ended = Value(round_instance.ended_at)
+    ThroughputStats.objects.filter(pk=stats.pk).update(
+        bouts_completed=F('bouts_completed') + 1,
+        total_seconds=F('total_seconds') + duration,
+        # Pierwsza walka: NULL * waga daje NULL, więc Coalesce bierze jej czas
+        recent_seconds=Coalesce(
+            F('recent_seconds') * (1 - RECENT_WEIGHT) + duration * RECENT_WEIGHT, Value(float(duration)),
+        ),
+        first_started_at=Least(Coalesce('first_started_at', started), started),
+        last_ended_at=Greatest(Coalesce('last_ended_at', ended), ended),
+    )
+
+
+def _row(stats, remaining, now):
+    average = stats.total_seconds / stats.bouts_completed if stats and stats.bouts_completed else None
+    recent = stats.recent_seconds if stats else None
+    per_hour = None
+    if stats and stats.first_started_at and stats.last_ended_at and stats.last_ended_at > stats.first_started_at:
+        per_hour = stats.bouts_completed * 3600 / (stats.last_ended_at - stats.first_started_at).total_seconds()
+    return {
+        'completed': stats.bouts_completed if stats else 0,
+        'remaining': remaining,
+        'average_seconds': round(average, 1) if average is not None else None,
+        'recent_seconds': round(recent, 1) if recent is not None else None,
+        'bouts_per_hour': round(per_hour, 1) if per_hour is not None else None,
+        'projected_finish': now + timedelta(seconds=remaining * recent) if recent and remaining else None,
+    }
+
+
+def dashboard(tournament, now=None):
+    """
+    Stan mat i dywizji turnieju dla organizatora.
+
+    Czyta tylko gotowe agregaty i dwa zgrupowane liczniki pozostałych walk
+    (po indeksach turniej+mata i turniej+dywizja), więc częste odświeżanie
+    nie skanuje historii walk.
+    """
+    now = now or timezone.now()
+    stats = {(item.scope, item.key): item for item in ThroughputStats.objects.filter(tournament=tournament)}
+    # Walki rozstrzygnięte bez pomiaru czasu (wynik wpisany ręcznie) też nie czekają już na matę
+    pending = Round.objects.filter(tournament=tournament, ended_at__isnull=True, winner__isnull=True)
+    mats_remaining = dict(
+        pending.filter(mat__isnull=False).values('mat').annotate(bouts=Count('id')).values_list('mat', 'bouts')
+    )
+    divisions_remaining = dict(
+        pending.values('division_key').annotate(bouts=Count('id')).values_list('division_key', 'bouts')
+    )
+
+    mats = sorted({int(key) for scope, key in stats if scope == 'MAT' and key.isdigit()} | set(mats_remaining))
+    division_keys = sorted({key for scope, key in stats if scope == 'DIVISION'} | set(divisions_remaining))
+    return {
+        'mats': [
+            {'mat': mat, **_row(stats.get(('MAT', str(mat))), mats_remaining.get(mat, 0), now)}
+            for mat in mats
+        ],
+        # Prognoza dla dywizji zakłada walki jedna po drugiej na jednej macie
+        'divisions': [
+            {
+                'division': key, 'label': division_label(key),
+                **_row(stats.get(('DIVISION', key)), divisions_remaining.get(key, 0), now),
+            }
+            for key in division_keys
+        ],
+    }
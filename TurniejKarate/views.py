@@ -1,10 +1,35 @@
+import json
+
 from django.contrib.auth.decorators import login_required
+from django.views.decorators.http import require_POST
+from django.conf import settings
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseForbidden, HttpResponseRedirect, JsonResponse
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
 from django.utils.decorators import method_decorator
 from django.shortcuts import render, get_object_or_404, redirect
 from django.urls import reverse_lazy
 from django.views.generic import ListView, CreateView, UpdateView, DeleteView,TemplateView
-from .models import Athlete, Tournament, Round, WeightCategory
-from .forms import RoundForm
+from django.core.exceptions import ValidationError
+from .models import Athlete, Tournament, Round, Pool, Bracket, ClubMedals, BackgroundJob, Placement
+from .forms import RoundForm, PoolForm, PoolResultForm, TournamentCloneForm, BracketForm
+from .bout_log import undo_result
+from .bracket_drawing import CONTENT_TYPES
+from .deletion import delete_athlete
+from .brackets import bracket_nodes, build_bracket
+from .divisions import division_label, tournament_divisions
+from .fragments import tournament_fragments
+from .leaderboards import club_medal_table, season_leaderboard
+from .pools import create_pool, pool_standings
+from .ratings import rating_leaderboard
+from .rollover import clone_tournament
+from .schedule import ScheduleConflict, event_conflicts, schedule_round
+from .scoring import ingest_scores, parse_scores
+from .throughput import dashboard, end_bout, start_bout
+from . import bracket_render, documents, eligibility, head_to_head, http_cache
+from .metrics import registry
+from .reference import reference_data
+from .weigh_in import parse_measurements, record_weigh_ins
 class HomeView(TemplateView):
     template_name = 'home.html'  # Szablon strony głównej
 
@@ -13,6 +38,7 @@ class AthleteListView(ListView):
     model = Athlete
     template_name = 'athlete_list.html'  # Szablon listy zawodników
     context_object_name = 'athletes'
+    queryset = Athlete.objects.filter(deleted_at__isnull=True)  # Bez zawodników usuniętych z zachowaniem historii
 
 @method_decorator(login_required, name='dispatch')
 class AthleteCreateView(CreateView):
@@ -34,6 +60,11 @@ class AthleteDeleteView(DeleteView):
     template_name = 'athlete_confirm_delete.html'  # Szablon potwierdzenia usunięcia
     success_url = reverse_lazy('athlete_list')  # Po usunięciu wracamy na listę zawodników
 
+    def form_valid(self, form):
+        # Zawodnik z historią walk jest tylko ukrywany; bez historii - usuwany paczkami zamiast jednej kaskady
+        delete_athlete(self.object)
+        return HttpResponseRedirect(self.get_success_url())
+
 
 class TournamentListView(ListView):
     model = Tournament
@@ -50,32 +81,37 @@ class TournamentDetailView(TemplateView):
         tournament = get_object_or_404(Tournament, id=tournament_id)
         context['tournament'] = tournament
 
-        # Pobieramy wszystkie rundy dla danego turnieju
-        rounds = tournament.rounds.all()
-
-        male_athletes = set()
-        female_athletes = set()
-
-        for round_instance in rounds:
-            male_athletes.update([round_instance.athlete1, round_instance.athlete2])
-            female_athletes.update([round_instance.athlete1, round_instance.athlete2])
+        # Zawodnicy pogrupowani według dywizji jednym uporządkowanym zapytaniem
+        context['divisions'] = tournament_divisions([tournament.id])[tournament.id]
+        # Liczniki dywizji to gotowe wiersze - jedno zapytanie zamiast COUNT na dywizję
+        counters = {counter.division_key: counter for counter in tournament.division_counters.all()}
+        for division in context['divisions']:
+            division['counter'] = counters.get(division['key'])
+        return context
 
-        # Grupowanie zawodników według kategorii wagowych
-        male_categories = self.group_athletes_by_category(male_athletes)
-        female_categories = self.group_athletes_by_category(female_athletes)
+@http_cache.public_page(http_cache.tournament_list_etag, lambda request: [http_cache.LIST_KEY])
+def public_tournament_list(request):
+    # Strona dla kibiców: bez sesji i logowania, zapamiętywana przez cache pośredniczące
+    return render(request, 'public_tournament_list.html', {
+        'tournaments': Tournament.objects.order_by('-date', 'id').values('id', 'name', 'date', 'type'),
+    })
 
-        context['male_categories'] = male_categories
-        context['female_categories'] = female_categories
 
-        return context
+@http_cache.public_page(
+    http_cache.tournament_etag,
+    lambda request, tournament_id: [http_cache.tournament_key(tournament_id)],
+)
+def public_tournament_detail(request, tournament_id):
+    tournament = get_object_or_404(Tournament, id=tournament_id)
+    divisions = tournament_divisions([tournament.id])[tournament.id]
+    counters = {counter.division_key: counter for counter in tournament.division_counters.all()}
+    # Miejsca z tego turnieju - Athlete.place zmienia się także w innych turniejach zawodnika
+    places = dict(Placement.objects.filter(tournament=tournament).values_list('athlete_id', 'place'))
+    for division in divisions:
+        division['counter'] = counters.get(division['key'])
+        division['results'] = [(athlete, places.get(athlete.id)) for athlete in division['athletes']]
+    return render(request, 'public_tournament.html', {'tournament': tournament, 'divisions': divisions})
 
-    def group_athletes_by_category(self, athletes):
-        categories = {}
-        for category in WeightCategory.objects.all():
-            athletes_in_category = [athlete for athlete in athletes if athlete.weight_category == category]
-            if athletes_in_category:
-                categories[category] = athletes_in_category
-        return categories
 
 @method_decorator(login_required, name='dispatch')
 class RoundCreateView(CreateView):
@@ -83,6 +119,14 @@ class RoundCreateView(CreateView):
     template_name = 'round_form.html'
     form_class = RoundForm
 
+    def get_initial(self):
+        # ?tournament=&athlete1= zawęża listy zawodników do dopuszczonych przeciwników
+        initial = super().get_initial()
+        for field in ('tournament', 'athlete1'):
+            if self.request.GET.get(field):
+                initial[field] = self.request.GET[field]
+        return initial
+
     def get_form_kwargs(self):
         kwargs = super().get_form_kwargs()
         if self.request.method == 'POST':
@@ -100,41 +144,7 @@ class RoundCreateView(CreateView):
             form.add_error('winner', "Please select a winner.")
             return self.form_invalid(form)
 
-        # Usuwamy przegranego zawodnika z turnieju
-        athlete1 = form.cleaned_data['athlete1']
-        athlete2 = form.cleaned_data['athlete2']
-        tournament = form.cleaned_data['tournament']
-
-        loser = athlete1 if winner == athlete2 else athlete2
-        tournament.athletes.remove(loser)
-
-        # Zaktualizuj miejsce przegranego
-        loser_place = tournament.athletes.count() + 1  # Przyjmujemy, że miejsce to liczba pozostałych + 1
-        loser.place = loser_place
-        loser.save()
-
-        return super().form_valid(form)
-
-    success_url = reverse_lazy('round_results')
-
-    def form_valid(self, form):
-        winner = form.cleaned_data.get('winner')
-        if not winner:
-            form.add_error('winner', "Please select a winner.")
-            return self.form_invalid(form)
-
-        # Usuwamy przegranego zawodnika z turnieju
-        athlete1 = form.cleaned_data['athlete1']
-        athlete2 = form.cleaned_data['athlete2']
-        tournament = form.cleaned_data['tournament']
-
-        loser = athlete1 if winner == athlete2 else athlete2
-        tournament.athletes.remove(loser)
-
-        # Zaktualizuj miejsce przegranego (np. w zależności od turnieju)
-        loser_place = tournament.athletes.count() + 1  # Przyjmujemy, że miejsce to liczba pozostałych + 1
-        loser.save()  # Zakładamy, że przechowujesz miejsce zawodnika w osobnym polu
-
+        # Odpadnięcie przegranego i jego miejsce ustala Round.save (z licznika pozostałych zawodników)
         return super().form_valid(form)
 
     success_url = reverse_lazy('round_list')
@@ -148,60 +158,13 @@ class RoundListView(ListView):
     def get_context_data(self, **kwargs):
         context = super().get_context_data(**kwargs)
 
-        # Pobieramy wszystkie turnieje
-        tournaments = Tournament.objects.prefetch_related('rounds', 'rounds__athlete1', 'rounds__athlete2')
-
-        tournament_data = []
-        for tournament in tournaments:
-            # Pobierz rundy dla turnieju
-            rounds = tournament.rounds.all()
-
-            # Oddziel zawodników na podstawie płci
-            male_athletes = set()
-            female_athletes = set()
-
-            for round_instance in rounds:
-                if round_instance.athlete1.gender == 'M':
-                    male_athletes.add(round_instance.athlete1)
-                elif round_instance.athlete1.gender == 'F':
-                    female_athletes.add(round_instance.athlete1)
-
-                if round_instance.athlete2.gender == 'M':
-                    male_athletes.add(round_instance.athlete2)
-                elif round_instance.athlete2.gender == 'F':
-                    female_athletes.add(round_instance.athlete2)
-
-            # Kategorie wagowe dla mężczyzn
-            male_categories = {}
-            for category in WeightCategory.objects.all():
-                athletes_in_category = [athlete for athlete in male_athletes if athlete.weight_category == category]
-                if athletes_in_category:
-                    male_categories[category] = athletes_in_category
-
-            # Kategorie wagowe dla kobiet
-            female_categories = {}
-            for category in WeightCategory.objects.all():
-                athletes_in_category = [athlete for athlete in female_athletes if athlete.weight_category == category]
-                if athletes_in_category:
-                    female_categories[category] = athletes_in_category
-
-            # Dodaj brak kategorii
-            male_without_category = [athlete for athlete in male_athletes if athlete.weight_category is None]
-            female_without_category = [athlete for athlete in female_athletes if athlete.weight_category is None]
-
-            if male_without_category:
-                male_categories["Brak kategorii"] = male_without_category
-            if female_without_category:
-                female_categories["Brak kategorii"] = female_without_category
-
-            tournament_data.append({
-                'tournament': tournament,
-                'rounds': rounds,
-                'male_categories': male_categories,
-                'female_categories': female_categories
-            })
-
-        context['tournament_data'] = tournament_data
+        # Dywizje są liczone leniwie - przy trafieniu w cache fragmentu nie pada żadne zapytanie
+        context['tournament_data'] = [
+            {'tournament': tournament, 'divisions': tournament_fragments(tournament)}
+            for tournament in Tournament.objects.order_by('id')
+        ]
+        context['reference_version'] = reference_data.version()
+        context['fragment_timeout'] = settings.RESULTS_FRAGMENT_TIMEOUT
         return context
 
 
@@ -230,18 +193,416 @@ def add_athletes_to_tournament(request, tournament_id):
 
         # Iterujemy po wszystkich zawodnikach i przypisujemy im kategorię wagową
         for athlete, category_id in zip(athletes, weight_categories):
-            category = get_object_or_404(WeightCategory, id=category_id)
-            athlete.weight_category = category  # Przypisujemy kategorię wagową zawodnikowi
+            category = reference_data.category(int(category_id)) if category_id.isdigit() else None
+            if category is None:
+                raise Http404("Nie ma takiej kategorii wagowej.")
+            athlete.weight_category_id = category.id  # Przypisujemy kategorię wagową zawodnikowi
             athlete.save()  # Zapisujemy zmiany w zawodniku
             tournament.athletes.add(athlete)  # Dodajemy zawodnika do turnieju
 
         return redirect('tournament_detail', tournament_id=tournament.id)
 
     else:
-        all_athletes = Athlete.objects.all()
-        weight_categories = WeightCategory.objects.all()  # Pobieramy wszystkie kategorie wagowe
+        all_athletes = Athlete.objects.filter(deleted_at__isnull=True)
+        weight_categories = reference_data.categories()  # Pobieramy wszystkie kategorie wagowe
         return render(request, 'add_athletes.html', {
             'tournament': tournament,
             'athletes': all_athletes,
             'categories': weight_categories,
         })
+
+
+@login_required
+def weigh_in(request, tournament_id):
+    tournament = get_object_or_404(Tournament, id=tournament_id)
+
+    if request.method == 'POST':
+        # Stanowisko ważenia wysyła pomiary paczkami w formacie JSON
+        try:
+            payload = json.loads(request.body)
+            raw_measurements = payload['measurements']
+        except (ValueError, KeyError, TypeError):
+            return JsonResponse({'error': "Nieprawidłowe dane pomiarów."}, status=400)
+        if not isinstance(raw_measurements, list):
+            return JsonResponse({'error': "Nieprawidłowe dane pomiarów."}, status=400)
+
+        measurements, errors = parse_measurements(raw_measurements)
+        results = record_weigh_ins(tournament, measurements)
+        return JsonResponse({'results': results, 'errors': errors})
+
+    athletes = {
+        athlete['id']: f"{athlete['first_name']} {athlete['last_name']}"
+        for athlete in tournament.athletes.values('id', 'first_name', 'last_name')
+    }
+    return render(request, 'weigh_in.html', {
+        'tournament': tournament,
+        'athletes': athletes,
+    })
+
+
+@login_required
+def clone_tournament_view(request, tournament_id):
+    source = get_object_or_404(Tournament, id=tournament_id)
+
+    if request.method == 'POST':
+        form = TournamentCloneForm(request.POST)
+        if form.is_valid():
+            tournament, _ = clone_tournament(
+                source, form.cleaned_data['name'], form.cleaned_data['date'],
+                reclassify=form.cleaned_data['reclassify'],
+            )
+            return redirect('tournament_detail', tournament_id=tournament.id)
+    else:
+        form = TournamentCloneForm(initial={'name': source.name})
+    return render(request, 'tournament_clone.html', {'form': form, 'tournament': source})
+
+
+@login_required
+def add_pool(request, tournament_id):
+    tournament = get_object_or_404(Tournament, id=tournament_id)
+
+    if request.method == 'POST':
+        form = PoolForm(request.POST, tournament=tournament)
+        if form.is_valid():
+            pool = create_pool(tournament, form.cleaned_data['name'], form.cleaned_data['athletes'])
+            return redirect('pool_detail', pool_id=pool.id)
+    else:
+        form = PoolForm(tournament=tournament)
+    return render(request, 'pool_form.html', {'form': form, 'tournament': tournament})
+
+
+@login_required
+def pool_detail(request, pool_id):
+    pool = get_object_or_404(Pool.objects.select_related('tournament'), id=pool_id)
+    rounds = pool.rounds.select_related('athlete1', 'athlete2', 'winner').order_by('round_number', 'id')
+
+    if request.method == 'POST':
+        round_instance = get_object_or_404(rounds, id=request.POST.get('round'))
+        form = PoolResultForm(request.POST, instance=round_instance)
+        if form.is_valid():
+            form.save()
+            return redirect('pool_detail', pool_id=pool.id)
+    else:
+        form = None
+
+    return render(request, 'pool_detail.html', {
+        'pool': pool,
+        'rounds': rounds,
+        'standings': pool_standings([pool])[pool.id],
+        'form': form,
+    })
+
+
+@login_required
+def add_bracket(request, tournament_id):
+    tournament = get_object_or_404(Tournament, id=tournament_id)
+
+    if request.method == 'POST':
+        form = BracketForm(request.POST, tournament=tournament)
+        if form.is_valid():
+            try:
+                bracket = build_bracket(tournament, form.cleaned_data['division_key'], form.cleaned_data['kind'])
+            except ValidationError as error:
+                form.add_error(None, error)
+            else:
+                return redirect('bracket_detail', bracket_id=bracket.id)
+    else:
+        form = BracketForm(tournament=tournament)
+    return render(request, 'bracket_form.html', {'form': form, 'tournament': tournament})
+
+
+@login_required
+def bracket_detail(request, bracket_id):
+    bracket = get_object_or_404(Bracket.objects.select_related('tournament'), id=bracket_id)
+    form = None
+
+    if request.method == 'POST':
+        round_instance = get_object_or_404(bracket.rounds.all(), id=request.POST.get('round'))
+        form = PoolResultForm(request.POST, instance=round_instance)
+        if form.is_valid():
+            try:
+                form.save()
+            except ValidationError as error:
+                form.add_error(None, error)
+            else:
+                return redirect('bracket_detail', bracket_id=bracket.id)
+
+    sections = {}
+    for node in bracket_nodes(bracket):
+        sections.setdefault(node.get_section_display(), []).append(node)
+    return render(request, 'bracket_detail.html', {
+        'bracket': bracket,
+        'division': division_label(bracket.division_key),
+        'sections': sections,
+        'form': form,
+    })
+
+
+@login_required
+def pairing_suggestions(request, tournament_id):
+    """Dopuszczeni przeciwnicy zawodnika (?athlete=) albo propozycje par dla całego turnieju"""
+    tournament = get_object_or_404(Tournament, id=tournament_id)
+    matrix = eligibility.for_tournament(tournament.id)
+    athlete_id = request.GET.get('athlete')
+    if athlete_id:
+        try:
+            athlete_id = int(athlete_id)
+        except ValueError:
+            return JsonResponse({'error': "Nieprawidłowy zawodnik."}, status=400)
+        opponents = matrix.opponents(athlete_id)
+        names = dict(Athlete.objects.filter(id__in=opponents).values_list('id', 'display_name'))
+        return JsonResponse({
+            'athlete': athlete_id,
+            'opponents': [{'id': opponent, 'name': names[opponent]} for opponent in opponents if opponent in names],
+        })
+
+    pairs = matrix.suggestions()
+    names = dict(Athlete.objects.filter(id__in={athlete for pair in pairs for athlete in pair}).values_list(
+        'id', 'display_name',
+    ))
+    return JsonResponse({'pairs': [
+        [{'id': athlete, 'name': names[athlete]} for athlete in pair]
+        for pair in pairs if all(athlete in names for athlete in pair)
+    ]})
+
+
+@login_required
+def division_bracket_view(request, tournament_id, division_key, fmt):
+    tournament = get_object_or_404(Tournament, id=tournament_id)
+    if fmt not in bracket_render.FORMATS:
+        raise Http404("Nieobsługiwany format drabinki.")
+    output = bracket_render.division_bracket(tournament, division_key, fmt)
+    if output is None:
+        raise Http404("Dywizja nie istnieje.")
+    response = HttpResponse(output, content_type=CONTENT_TYPES[fmt])
+    if fmt == 'pdf':
+        response['Content-Disposition'] = f'inline; filename="{division_key}.pdf"'
+    return response
+
+
+@login_required
+@require_POST
+def undo_round(request, round_id):
+    round_instance = get_object_or_404(Round, id=round_id)
+    try:
+        undo_result(round_instance)
+    except ValidationError as error:
+        return HttpResponse(" ".join(error.messages), status=409)
+    return _back_to_round_page(round_instance)
+
+
+def _back_to_round_page(round_instance):
+    if round_instance.pool_id:
+        return redirect('pool_detail', pool_id=round_instance.pool_id)
+    if round_instance.bracket_id:
+        return redirect('bracket_detail', bracket_id=round_instance.bracket_id)
+    return redirect('round_list')
+
+
+@login_required
+@require_POST
+def round_start(request, round_id):
+    round_instance = get_object_or_404(Round, id=round_id)
+    mat = request.POST.get('mat', '')
+    if not mat.isdigit():
+        return HttpResponse("Podaj numer maty.", status=400)
+    try:
+        start_bout(round_instance, int(mat))
+    except ValidationError as error:
+        return HttpResponse(" ".join(error.messages), status=409)
+    return _back_to_round_page(round_instance)
+
+
+@login_required
+@require_POST
+def round_end(request, round_id):
+    round_instance = get_object_or_404(Round, id=round_id)
+    try:
+        end_bout(round_instance)
+    except ValidationError as error:
+        return HttpResponse(" ".join(error.messages), status=409)
+    return _back_to_round_page(round_instance)
+
+
+def _conflict_rows(conflicts):
+    """Konflikty z nazwami zawodników i danymi obu walk - dwa zapytania niezależnie od liczby konfliktów"""
+    round_ids = {conflict.round_id for conflict in conflicts} | {conflict.other_round_id for conflict in conflicts}
+    rounds = {row['id']: row for row in Round.objects.filter(id__in=round_ids).values(
+        'id', 'round_number', 'mat', 'scheduled_start', 'scheduled_end', 'tournament__name',
+    )}
+    names = dict(Athlete.objects.filter(id__in={conflict.athlete_id for conflict in conflicts}).values_list(
+        'id', 'display_name',
+    ))
+    return [
+        {
+            **conflict._asdict(),
+            'athlete': names.get(conflict.athlete_id, ''),
+            'round': rounds[conflict.round_id],
+            'other_round': rounds[conflict.other_round_id],
+        }
+        for conflict in conflicts
+    ]
+
+
+@login_required
+@require_POST
+def round_schedule(request, round_id):
+    """Planowanie walki (JSON): 409 z listą konfliktów, chyba że przesłano force=1"""
+    round_instance = get_object_or_404(Round, id=round_id)
+    start = parse_datetime(request.POST.get('start', ''))
+    end = parse_datetime(request.POST.get('end', ''))
+    mat = request.POST.get('mat', '')
+    if start is None or end is None or (mat and not mat.isdigit()):
+        return JsonResponse({'error': "Podaj początek, koniec i numer maty."}, status=400)
+    # Każdy z końców może przyjść z przesunięciem strefy albo bez niego
+    if timezone.is_naive(start):
+        start = timezone.make_aware(start)
+    if timezone.is_naive(end):
+        end = timezone.make_aware(end)
+    try:
+        conflicts = schedule_round(
+            round_instance, start, end, mat=int(mat) if mat else None, force=request.POST.get('force') == '1',
+        )
+    except ScheduleConflict as error:
+        return JsonResponse({'error': error.message, 'conflicts': [c._asdict() for c in error.conflicts]}, status=409)
+    except ValidationError as error:
+        return JsonResponse({'error': " ".join(error.messages)}, status=400)
+    return JsonResponse({'round': round_instance.id, 'conflicts': [c._asdict() for c in conflicts]})
+
+
+@login_required
+def schedule_conflicts(request, tournament_id):
+    # Konflikty całego dnia zawodów: zawodnik może startować w kilku turniejach (kata i kumite) naraz
+    tournament = get_object_or_404(Tournament, id=tournament_id)
+    return render(request, 'schedule_conflicts.html', {
+        'tournament': tournament,
+        'conflicts': _conflict_rows(event_conflicts(tournament.date)),
+    })
+
+
+@login_required
+def tournament_documents(request, tournament_id):
+    # Listy startowe, identyfikatory i dyplomy generowane w tle (manage.py run_jobs) do archiwów ZIP
+    tournament = get_object_or_404(Tournament, id=tournament_id)
+    if request.method == 'POST':
+        kind = request.POST.get('kind')
+        if kind not in documents.KINDS:
+            return HttpResponse("Nieznany rodzaj dokumentów.", status=400)
+        documents.schedule_documents(tournament, kind)
+        return redirect('tournament_documents', tournament_id=tournament.id)
+
+    latest = {}
+    for job in BackgroundJob.objects.filter(kind='DOCUMENTS', params__tournament_id=tournament.id).order_by('id'):
+        latest[job.params.get('document_kind')] = job
+    rows = [{
+        'kind': kind,
+        'job': latest.get(kind),
+        'ready': documents.archive_path(tournament, kind).exists(),
+    } for kind in documents.KINDS]
+    return render(request, 'tournament_documents.html', {'tournament': tournament, 'rows': rows})
+
+
+@login_required
+def tournament_documents_archive(request, tournament_id, kind):
+    tournament = get_object_or_404(Tournament, id=tournament_id)
+    if kind not in documents.KINDS:
+        raise Http404("Nieznany rodzaj dokumentów.")
+    path = documents.archive_path(tournament, kind)
+    if not path.exists():
+        raise Http404("Archiwum nie zostało jeszcze wygenerowane.")
+    return FileResponse(open(path, 'rb'), as_attachment=True, filename=path.name)
+
+
+@login_required
+def tournament_dashboard(request, tournament_id):
+    tournament = get_object_or_404(Tournament, id=tournament_id)
+    return render(request, 'tournament_dashboard.html', {
+        'tournament': tournament,
+        'data': dashboard(tournament),
+    })
+
+
+@login_required
+def tournament_dashboard_data(request, tournament_id):
+    # Lekkie dane do cyklicznego odświeżania panelu
+    tournament = get_object_or_404(Tournament, id=tournament_id)
+    return JsonResponse(dashboard(tournament))
+
+
+def club_medals(request):
+    # Strona publiczna: jeden odczyt z gotowej tabeli medalowej
+    tournament_type = request.GET.get('type', ClubMedals.ALL_TYPES)
+    if tournament_type != ClubMedals.ALL_TYPES and tournament_type not in dict(Tournament.TOURNAMENT_TYPES):
+        raise Http404("Nieznany typ turnieju.")
+    return render(request, 'club_medals.html', {
+        'rows': club_medal_table(tournament_type),
+        'tournament_type': tournament_type,
+        'tournament_types': Tournament.TOURNAMENT_TYPES,
+    })
+
+
+def athlete_leaderboard(request, season):
+    return render(request, 'athlete_leaderboard.html', {
+        'rows': season_leaderboard(season),
+        'season': season,
+    })
+
+
+def rating_leaderboard_view(request):
+    return render(request, 'rating_leaderboard.html', {'rows': rating_leaderboard()})
+
+
+@login_required
+@require_POST
+def kata_scores(request):
+    # Oceny wszystkich sędziów dla całego wylotu przychodzą w jednym zapytaniu
+    try:
+        payload = json.loads(request.body)
+        raw_scores = payload['scores']
+    except (ValueError, KeyError, TypeError):
+        return JsonResponse({'error': "Nieprawidłowe dane ocen."}, status=400)
+    if not isinstance(raw_scores, list):
+        return JsonResponse({'error': "Nieprawidłowe dane ocen."}, status=400)
+
+    scores, errors = parse_scores(raw_scores)
+    try:
+        results, ingest_errors = ingest_scores(scores)
+    except ValidationError as error:
+        # Np. korekta walki drabinki, po której rozstrzygnięto już kolejne walki - cała paczka jest wycofana
+        return JsonResponse({'error': " ".join(error.messages)}, status=409)
+    return JsonResponse({'results': results, 'errors': errors + ingest_errors})
+
+
+@login_required
+def round_head_to_head(request, round_id):
+    round_instance = get_object_or_404(Round, id=round_id)
+    # Poprzednie spotkania z perspektywy zawodnika 1
+    history = head_to_head.lookup(round_instance.athlete1_id, round_instance.athlete2_id)
+    return JsonResponse({
+        'round': round_instance.id,
+        'athlete1': round_instance.athlete1_id,
+        'athlete2': round_instance.athlete2_id,
+        **history,
+    })
+
+
+def metrics(request):
+    # Metryki są dostępne z adresów lokalnych (Prometheus na tym samym hoście) lub dla obsługi
+    allowed_ips = getattr(settings, 'METRICS_ALLOWED_IPS', ['127.0.0.1'])
+    if request.META.get('REMOTE_ADDR') not in allowed_ips and not request.user.is_staff:
+        return HttpResponseForbidden()
+    return HttpResponse(registry.render_prometheus(), content_type='text/plain; version=0.0.4; charset=utf-8')
+
+
+@login_required
+def job_status(request, job_id):
+    """Postęp zadania w tle (np. usuwania klubu lub turnieju)"""
+    job = get_object_or_404(BackgroundJob, id=job_id)
+    return JsonResponse({
+        'id': job.id,
+        'kind': job.kind,
+        'status': job.status,
+        'progress': job.progress,
+        'total': job.total,
+        'error': job.error,
+    })
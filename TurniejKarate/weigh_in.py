@@ -0,0 +1,84 @@
+from decimal import Decimal, InvalidOperation
+
+from . import counters, eligibility
+from .divisions import refresh_division_keys
+from .models import Athlete, Registration
+from .reference import reference_data
+
+
+def classify_weight(weight, categories):
+    """Zwraca pierwszą kategorię wagową obejmującą podaną wagę (lub None)"""
+    for category in categories:
+        if category.min_weight <= weight <= category.max_weight:
+            return category
+    return None
+
+
+def parse_measurements(raw_measurements):
+    """Zamienia listę pomiarów z przeglądarki na słownik {id zawodnika: waga}"""
+    measurements = {}
+    errors = []
+    for item in raw_measurements:
+        try:
+            athlete_id = int(item['athlete'])
+            weight = Decimal(str(item['weight'])).quantize(Decimal('0.01'))
+            if not weight.is_finite():
+                raise InvalidOperation
+        except (KeyError, TypeError, ValueError, InvalidOperation):
+            errors.append({'item': item, 'error': "Nieprawidłowy pomiar."})
+            continue
+        if weight <= 0 or weight >= 1000:
+            errors.append({'item': item, 'error': "Waga poza dopuszczalnym zakresem."})
+            continue
+        # Przy wielokrotnym ważeniu obowiązuje ostatni pomiar z paczki
+        measurements[athlete_id] = weight
+    return measurements, errors
+
+
+def record_weigh_ins(tournament, measurements):
+    """
+    Zapisuje paczkę pomiarów wagi dla zawodników turnieju.
+
+    Kategorie wagowe pochodzą z pamięci podręcznej procesu i są porównywane
+    w pamięci, a wszystkie zmiany trafiają do bazy jednym `bulk_update`.
+    Zawodnik bez kategorii dostaje kategorię wynikającą z wagi; zawodnik,
+    którego waga wypada poza zgłoszoną kategorię, jest oznaczany do decyzji
+    organizatora. Klucze dywizji zważonych zawodników są przeliczane jednym
+    zapytaniem UPDATE.
+    """
+    categories = reference_data.categories()
+    athletes = tournament.athletes.in_bulk(list(measurements))
+
+    results = []
+    for athlete_id, weight in measurements.items():
+        athlete = athletes.get(athlete_id)
+        if athlete is None:
+            results.append({'athlete': athlete_id, 'error': "Zawodnik nie jest zgłoszony do turnieju."})
+            continue
+
+        athlete.weight = weight
+        matched = classify_weight(weight, categories)
+        registered = reference_data.category(athlete.weight_category_id)
+        if registered is None:
+            athlete.weight_category_id = matched.id if matched else None
+        flagged = registered is not None and not (registered.min_weight <= weight <= registered.max_weight)
+
+        results.append({
+            'athlete': athlete.id,
+            'name': f"{athlete.first_name} {athlete.last_name}",
+            'weight': str(weight),
+            'category': matched.name if matched else None,
+            'registered_category': registered.name if registered else None,
+            'flagged': flagged,
+        })
+
+    to_update = [athletes[athlete_id] for athlete_id in measurements if athlete_id in athletes]
+    if to_update:
+        # Waga i kategoria należą do zawodnika, więc zmieniają jego dywizję we wszystkich turniejach;
+        # liczniki przenoszą tylko zgłoszenia zawodników z tej paczki
+        registrations = Registration.objects.filter(athlete_id__in=[athlete.id for athlete in to_update])
+        with counters.division_keys_changing(registrations):
+            Athlete.objects.bulk_update(to_update, ['weight', 'weight_category'])
+            refresh_division_keys(registrations)
+        eligibility.invalidate(registrations.values_list('tournament_id', flat=True).distinct())
+    return results
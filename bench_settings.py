@@ -0,0 +1,142 @@
+#!/usr/bin/env python
+"""
+Porównanie narzutu na żądanie dla profili ustawień (przed i po).
+
+Każdy profil jest mierzony w osobnym procesie: zalogowany sędzia wykonuje
+serię żądań do widoków listowych, a skrypt zlicza czas, zapytania SQL i
+nowe połączenia z bazą. Wyniki (średnia, p50, p99) trafiają na wyjście i do
+bench_output.txt.
+
+    python bench_settings.py                       # lokalny PostgreSQL z settings.py
+    python bench_settings.py --sqlite /tmp/b.db    # SQLite zamiast PostgreSQL
+"""
+import argparse
+import importlib
+import json
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+from wsgiref.util import setup_testing_defaults
+
+PROFILES = ['ProjektKoncowy.settings', 'ProjektKoncowy.settings_production']
+PATHS = ['/rounds/', '/athletes/', '/tournament/']
+
+
+def _configure(profile, sqlite):
+    """Podmienia bazę w module ustawień przed django.setup() - oba profile mierzymy na tej samej bazie"""
+    os.environ.setdefault('DJANGO_SECRET_KEY', 'benchmark-only-secret-key')
+    module = importlib.import_module(profile)
+    module.ALLOWED_HOSTS = [*module.ALLOWED_HOSTS, 'testserver']
+    if sqlite:
+        database = {**module.DATABASES['default'], 'ENGINE': 'django.db.backends.sqlite3', 'NAME': sqlite}
+        database.pop('OPTIONS', None)
+        module.DATABASES = {'default': database}
+    os.environ['DJANGO_SETTINGS_MODULE'] = profile
+
+
+def _percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def measure(profile, sqlite, requests):
+    _configure(profile, sqlite)
+    import django
+    django.setup()
+
+    from django.contrib.auth.models import User
+    from django.core.handlers.wsgi import WSGIHandler
+    from django.core.management import call_command
+    from django.db import connection
+    from django.db.backends.signals import connection_created
+    from django.test import Client
+
+    call_command('migrate', verbosity=0)
+    if not User.objects.filter(username='bench').exists():
+        User.objects.create_user(username='bench', password='bench-password')
+
+    opened = []
+    connection_created.connect(lambda sender, **kwargs: opened.append(1), weak=False)
+    queries = []
+
+    def count_query(execute, sql, params, many, context):
+        queries.append(sql)
+        return execute(sql, params, many, context)
+
+    # Klient testowy posłuży tylko do zalogowania: sam nie zamyka połączeń po żądaniu,
+    # więc pomiar idzie przez WSGIHandler - tak jak pod serwerem aplikacji
+    client = Client()
+    client.login(username='bench', password='bench-password')
+    cookies = '; '.join(f'{name}={morsel.value}' for name, morsel in client.cookies.items())
+    handler = WSGIHandler()
+
+    def get(path):
+        environ = {}
+        setup_testing_defaults(environ)
+        environ.update(PATH_INFO=path, HTTP_HOST='testserver', HTTP_COOKIE=cookies)
+        statuses = []
+        result = handler(environ, lambda status, headers, exc_info=None: statuses.append(status))
+        try:
+            b''.join(result)
+        finally:
+            result.close()
+        if not statuses[0].startswith('200'):
+            raise SystemExit(f"{path}: odpowiedź {statuses[0]}")
+
+    for path in PATHS:
+        get(path)  # Rozgrzewka: szablony, dane słownikowe
+
+    timings = []
+    opened.clear()
+    with connection.execute_wrapper(count_query):
+        for number in range(requests):
+            started = time.perf_counter()
+            get(PATHS[number % len(PATHS)])
+            timings.append((time.perf_counter() - started) * 1000)
+
+    return {
+        'profile': profile,
+        'requests': requests,
+        'mean_ms': sum(timings) / len(timings),
+        'p50_ms': _percentile(timings, 0.50),
+        'p99_ms': _percentile(timings, 0.99),
+        'queries_per_request': len(queries) / requests,
+        'connections_opened': len(opened),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--sqlite', help="Plik SQLite zamiast bazy PostgreSQL z ustawień.")
+    parser.add_argument('--requests', type=int, default=500)
+    parser.add_argument('--output', default=Path(__file__).resolve().parent / 'bench_output.txt')
+    parser.add_argument('--profile', help=argparse.SUPPRESS)  # Pomiar jednego profilu w procesie potomnym
+    options = parser.parse_args()
+
+    if options.profile:
+        print(json.dumps(measure(options.profile, options.sqlite, options.requests)))
+        return
+
+    results = []
+    for profile in PROFILES:
+        command = [sys.executable, __file__, '--profile', profile, '--requests', str(options.requests)]
+        if options.sqlite:
+            command += ['--sqlite', options.sqlite]
+        output = subprocess.run(command, check=True, stdout=subprocess.PIPE, text=True).stdout
+        results.append(json.loads(output.strip().splitlines()[-1]))
+
+    lines = [f"{'profil':<40} {'średnia ms':>10} {'p50 ms':>8} {'p99 ms':>8} {'zapytań/żądanie':>16} {'połączeń':>9}"]
+    for result in results:
+        lines.append(
+            f"{result['profile']:<40} {result['mean_ms']:>10.2f} {result['p50_ms']:>8.2f} {result['p99_ms']:>8.2f} "
+            f"{result['queries_per_request']:>16.2f} {result['connections_opened']:>9}"
+        )
+    report = '\n'.join(lines)
+    print(report)
+    Path(options.output).write_text(report + '\n', encoding='utf-8')
+
+
+if __name__ == '__main__':
+    main()